@@ -6,4 +6,5 @@ class TennisConfig(AppConfig):
     name = 'Tennis'
 
     def ready(self):
-        import Tennis.signals
\ No newline at end of file
+        import Tennis.signals
+        import Tennis.checks
\ No newline at end of file
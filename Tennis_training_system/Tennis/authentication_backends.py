@@ -1,19 +1,39 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 from .models import CustomUser
+from .user_cache import user_cache
+
+
+# For logging in users who were not authenticated, e.g. right after registration
+EMAIL_BACKEND = 'Tennis.authentication_backends.EmailBackend'
 
 
 class EmailBackend(ModelBackend):
+    """
+    Backend checking the email and password (USERNAME_FIELD is the email) and loading session
+    users through the user cache.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = CustomUser.objects.get(email=username)
-            if user.check_password(password):
-                return user
-        except CustomUser.DoesNotExist:
-            return None
+        """
+        Check the credentials like ModelBackend, which hashes the password once, also for unknown
+        addresses. A failed check ends the authentication, so the ModelBackend listed after this
+        backend does not hash the password a second time.
+        """
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
 
     def get_user(self, user_id):
-        try:
-            return CustomUser.objects.get(pk=user_id)
-        except CustomUser.DoesNotExist:
-            return None
-
+        """
+        Load the user of an authenticated session, from the user cache when possible.
+        """
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = CustomUser.objects.select_related('role').get(pk=user_id)
+            except CustomUser.DoesNotExist:
+                return None
+            user_cache.set(user)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+ASYNC_SETTINGS = ['CONFLICT_CHECKS_ASYNC', 'GEOCODING_ASYNC', 'PROFILE_PICTURES_ASYNC']
+
+
+@register()
+def check_shared_backends(app_configs, **kwargs):
+    """
+    Warn when work is left to the background job worker while the channel layer or the cache are
+    private to each process: the worker's schedule changes then never reach the WebSocket
+    connections, and its invalidations never reach the day events cache of the web process.
+    """
+    enabled = [name for name in ASYNC_SETTINGS if getattr(settings, name)]
+    if not enabled:
+        return []
+    warnings = []
+    if settings.CHANNEL_LAYERS['default']['BACKEND'] == 'channels.layers.InMemoryChannelLayer':
+        warnings.append(Warning(
+            f"{', '.join(enabled)} is enabled with the in-memory channel layer, so changes made by "
+            "the background job worker are not pushed to the browsers.",
+            hint="Set CHANNEL_LAYER_BACKEND to a shared layer, e.g. channels_redis.core.RedisChannelLayer.",
+            id='Tennis.W001',
+        ))
+    if settings.CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        warnings.append(Warning(
+            f"{', '.join(enabled)} is enabled with the local-memory cache, so the cached days the "
+            "background job worker invalidates stay stale in the web process until they expire.",
+            hint="Set CACHE_URL to a cache shared by the processes, e.g. redis://redis:6379/1.",
+            id='Tennis.W002',
+        ))
+    return warnings
@@ -0,0 +1,267 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from .models import Participant
+from . import metrics
+from django.utils.timezone import localdate
+from .utils import check_if_enough_time, prefetch_travel_times, get_days_filter
+from .schedule_changes import record_changes
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LegMemo:
+    """
+    Memo of travel time checks between two consecutive games.
+
+    The result of a leg only depends on the locations of the two courts, the end of the first game
+    and the start of the second, so it is keyed by exactly these values; once a court is moved, its
+    legs get new keys, just as its travel times are dropped from the travel time cache. Results are
+    kept for the current request and, for CONFLICT_MEMO_TIMEOUT seconds, in the shared cache, so the
+    dry run, the commit pass and the client's confirm re-post of the same save reuse one computation.
+    """
+
+    def __init__(self, timeout=None):
+        self._timeout = timeout
+        self._results = {}
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else settings.CONFLICT_MEMO_TIMEOUT
+
+    @classmethod
+    def make_key(cls, origin, destination):
+        """
+        Build the key of the leg from the origin game to the destination game.
+        """
+        return (f'conflict_leg:{cls._court_key(origin.court)}:{cls._court_key(destination.court)}:'
+                f'{origin.end_date_and_time.timestamp():.0f}:{destination.start_date_and_time.timestamp():.0f}')
+
+    @staticmethod
+    def _court_key(court):
+        return f'{court.court_id}@{court.latitude},{court.longitude}'
+
+    def get_many(self, keys):
+        """
+        Return the known results for the keys, looking in the request memo first and the shared cache second.
+
+        :param keys: Leg keys.
+        :return: A dictionary mapping keys to (travel_time, time_available, alert) tuples.
+        """
+        found = {key: self._results[key] for key in keys if key in self._results}
+        missing = [key for key in keys if key not in found]
+        if missing and self.timeout:
+            shared = {key: tuple(result) for key, result in cache.get_many(missing).items()}
+            self._results.update(shared)
+            found.update(shared)
+        metrics.increment('conflicts.memo_hits', len(found))
+        metrics.increment('conflicts.memo_misses', len(keys) - len(found))
+        return found
+
+    def set_many(self, results):
+        """
+        Remember the results of checked legs.
+
+        :param results: A dictionary mapping keys to (travel_time, time_available, alert) tuples.
+        """
+        self._results.update(results)
+        if results and self.timeout:
+            cache.set_many(results, self.timeout)
+
+
+def check_legs(legs, memo=None):
+    """
+    Check whether there is enough time for each leg between two games. Legs already known to the
+    memo are not checked again; the travel times of the others are resolved together.
+
+    :param legs: A list of (origin game, destination game) pairs.
+    :param memo: Optional LegMemo; a new one is used if not given.
+    :return: A list of (travel_time, time_available, alert) tuples in the order of the legs.
+    """
+    memo = memo if memo is not None else LegMemo()
+    keys = [memo.make_key(origin, destination) for origin, destination in legs]
+    known = memo.get_many(set(keys))
+
+    pending = {}
+    for (origin, destination), key in zip(legs, keys):
+        if key not in known:
+            pending[key] = (origin, destination)
+    prefetch_travel_times([
+        (origin.court, destination.court, origin.end_date_and_time, destination.start_date_and_time)
+        for origin, destination in pending.values()
+    ])
+
+    computed = {
+        key: check_if_enough_time(
+            origin.end_date_and_time,
+            destination.start_date_and_time,
+            origin.court,
+            destination.court,
+        )
+        for key, (origin, destination) in pending.items()
+    }
+    memo.set_many(computed)
+    known.update(computed)
+    return [known[key] for key in keys]
+
+
+def find_preceding_game(games, game):
+    """
+    Find the game that ends last before the given game starts.
+    :param games: The user's games on the same day.
+    :param game: The game to find the predecessor for.
+    :return: The preceding game or None if no such game exists.
+    """
+    preceding_game = None
+    for other in games:
+        if other.game_id == game.game_id or other.end_date_and_time >= game.start_date_and_time:
+            continue
+        if preceding_game is None or other.end_date_and_time > preceding_game.end_date_and_time:
+            preceding_game = other
+    return preceding_game
+
+
+def find_following_game(games, game):
+    """
+    Find the game that starts first after the given game ends.
+    :param games: The user's games on the same day.
+    :param game: The game to find the successor for.
+    :return: The following game or None if no such game exists.
+    """
+    following_game = None
+    for other in games:
+        if other.game_id == game.game_id or other.start_date_and_time <= game.end_date_and_time:
+            continue
+        if following_game is None or other.start_date_and_time < following_game.start_date_and_time:
+            following_game = other
+    return following_game
+
+
+def detect_game_conflicts(game, users, memo=None):
+    """
+    Check whether the given users can travel to the game from their preceding game and from the game
+    to their following game, without writing anything. The game may be unsaved or carry unsaved
+    changes; its stored version is left out of the schedules. All schedules of the day are loaded
+    with one query and the travel times of all trips are resolved together.
+
+    :param game: The game as it is about to be saved.
+    :param users: The users taking part in the game.
+    :param memo: Optional LegMemo shared with the following recompute_conflicts() call.
+    :return: A list of conflicts, dictionaries with participant, travel_time, time_available and alert.
+    """
+    users = {user.user_id: user for user in users}
+    if not users:
+        return []
+
+    participants = (
+        Participant.objects.filter(
+            get_days_filter('game__start_date_and_time', [localdate(game.start_date_and_time)]),
+            user_id__in=users,
+        )
+        .select_related('game__court')
+    )
+    if game.game_id:
+        participants = participants.exclude(game_id=game.game_id)
+
+    timelines = defaultdict(list)
+    for participant in participants:
+        timelines[participant.user_id].append(participant.game)
+
+    legs = []
+    for user_id, user in users.items():
+        preceding_game = find_preceding_game(timelines[user_id], game)
+        if preceding_game is not None:
+            legs.append((user, preceding_game, game))
+        following_game = find_following_game(timelines[user_id], game)
+        if following_game is not None:
+            legs.append((user, game, following_game))
+
+    results = check_legs([(origin, destination) for _, origin, destination in legs], memo)
+
+    conflicts = []
+    for (user, _, _), (travel_time, time_available, alert) in zip(legs, results):
+        if alert:
+            conflicts.append({
+                'participant': user.username,
+                'travel_time': travel_time,
+                'time_available': time_available,
+                'alert': alert,
+            })
+    return conflicts
+
+
+def recompute_conflicts(user_ids, days, memo=None):
+    """
+    Recalculate travel time, available time and alert of every Participant row of the given users
+    on the given days in one batched pass: one query loads all schedules, travel times for all
+    trips are resolved together, and the changed rows are written with bulk_update.
+    Each row describes the trip from the user's preceding game to the game of that row.
+
+    :param user_ids: IDs of the users whose schedules are recalculated.
+    :param days: The dates to recalculate.
+    :param memo: Optional LegMemo holding results of an earlier check in the same request.
+    :return: A list of Participant rows that ended up with an alert.
+    """
+    user_ids, days = set(user_ids), set(days)
+    if not user_ids or not days:
+        return []
+
+    participants = list(
+        Participant.objects.filter(get_days_filter('game__start_date_and_time', days), user_id__in=user_ids)
+        .select_related('game__court')
+        .order_by('game__start_date_and_time')
+    )
+
+    timelines = defaultdict(list)
+    for participant in participants:
+        timelines[(participant.user_id, localdate(participant.game.start_date_and_time))].append(participant.game)
+
+    preceding_games = {}
+    for participant in participants:
+        games = timelines[(participant.user_id, localdate(participant.game.start_date_and_time))]
+        preceding_games[participant.participant_id] = find_preceding_game(games, participant.game)
+
+    legs = [
+        (preceding_games[participant.participant_id], participant.game)
+        for participant in participants
+        if preceding_games[participant.participant_id] is not None
+    ]
+    results = dict(zip(legs, check_legs(legs, memo)))
+
+    changed = []
+    alerts = []
+    for participant in participants:
+        preceding_game = preceding_games[participant.participant_id]
+        if preceding_game is None:
+            travel_time, time_available, alert = None, None, False
+        else:
+            travel_time, time_available, alert = results[(preceding_game, participant.game)]
+
+        if (participant.travel_time, participant.time_available, participant.alert) != (travel_time, time_available, alert):
+            participant.travel_time = travel_time
+            participant.time_available = time_available
+            participant.alert = alert
+            changed.append(participant)
+        if alert:
+            alerts.append(participant)
+
+    if changed:
+        Participant.objects.bulk_update(changed, ['travel_time', 'time_available', 'alert'], batch_size=500)
+        record_changes(
+            (participant.user_id, participant.game_id, localdate(participant.game.start_date_and_time))
+            for participant in changed
+        )
+    logger.info(f"Recomputed conflicts of {len(user_ids)} user(s) on {len(days)} day(s): "
+                f"{len(changed)} changed, {len(alerts)} alerts")
+    return alerts
+
+
+def recompute_user_day(user_id, day):
+    """
+    Recalculate the Participant rows of a single user on a single day.
+    :param user_id: The ID of the user whose schedule is recalculated.
+    :param day: The date to recalculate.
+    :return: A list of Participant rows that ended up with an alert.
+    """
+    return recompute_conflicts([user_id], [day])
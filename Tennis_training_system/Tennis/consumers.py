@@ -0,0 +1,36 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .schedule_changes import get_schedule_group
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket pushing changes of the user's schedule to the browser. Every connection joins
+    the group of its user; messages published to that group by the schedule change log are
+    forwarded as JSON.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = get_schedule_group(user.user_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def schedule_changed(self, event):
+        """
+        Forward a schedule change: {'type': 'schedule.changed', 'game_ids': [...], 'cursor': N}.
+        """
+        await self.send_json({
+            'type': 'schedule.changed',
+            'game_ids': event['game_ids'],
+            'cursor': event['cursor'],
+        })
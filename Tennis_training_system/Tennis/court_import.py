@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import Court
+from .geocoding import (ADDRESS_FIELDS, format_address, normalize_address, get_cached_locations, store_locations,
+                        lookup)
+from .log import SAMPLED
+from .tasks import enqueue_geocoding
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['name'] + ADDRESS_FIELDS
+
+
+def read_rows(path, file_format=None):
+    """
+    Stream court rows from a CSV file with a header row, or from a JSON file holding an array
+    of objects or one object per line. Rows are read one at a time, the file is never loaded whole.
+
+    :param path: Path of the input file.
+    :param file_format: 'csv' or 'json'; guessed from the file extension if not given.
+    :return: An iterator of dictionaries.
+    """
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'json')
+    with open(path, newline='', encoding='utf-8-sig') as input_file:
+        if file_format == 'csv':
+            yield from csv.DictReader(input_file)
+        else:
+            yield from _iter_json_objects(input_file)
+
+
+def _iter_json_objects(input_file, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    end_of_file = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if end_of_file:
+                return
+            chunk = input_file.read(chunk_size)
+            end_of_file = not chunk
+            buffer += chunk
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # The object continues in the next chunk
+            chunk = input_file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield row
+        buffer = buffer[end:]
+
+
+def make_court_key(name, address):
+    """
+    Key under which two courts count as the same: the same name at the same normalised address.
+    """
+    return normalize_address(name), normalize_address(address)
+
+
+class ImportState:
+    """
+    Progress of an import kept in a small JSON file, so an interrupted import resumes after the
+    last committed batch. The file is replaced atomically after every batch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, input_path):
+        """
+        :return: The number of input rows already processed, 0 if the state belongs to another input.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return 0
+        return state['processed'] if state.get('input') == os.path.abspath(input_path) else 0
+
+    def save(self, input_path, processed):
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as state_file:
+            json.dump({'input': os.path.abspath(input_path), 'processed': processed}, state_file)
+        os.replace(temporary_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CourtImporter:
+    """
+    Import courts in batches. Every batch is checked for duplicates against the existing courts
+    and the rows imported before, its addresses are looked up in the geocoding cache with one
+    query, the rest are geocoded in parallel by a worker pool (the provider rate limit is shared
+    by all workers) and the courts are written with one bulk insert in a transaction.
+    Bulk inserts bypass the Court signals, so no court is geocoded twice; courts left without
+    coordinates (address not found or the lookup failed) are queued for the geocoding job instead.
+    """
+
+    def __init__(self, batch_size=50, workers=4, dry_run=False):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dry_run = dry_run
+        self.stats = dict.fromkeys(
+            ['created', 'duplicates', 'invalid', 'cached', 'geocoded', 'not_found', 'errors', 'queued_for_geocoding'], 0)
+        self._known = None
+
+    def run(self, rows, skip=0, on_batch=None):
+        """
+        Import the rows.
+
+        :param rows: An iterable of dictionaries with the Court address fields, a name and
+                     optionally latitude and longitude.
+        :param skip: The number of leading rows processed by an earlier run.
+        :param on_batch: Called with the number of rows processed so far after every committed batch.
+        :return: The import statistics.
+        """
+        self._known = {
+            make_court_key(court.name, format_address(court))
+            for court in Court.objects.only('name', *ADDRESS_FIELDS)
+        }
+        processed = 0
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for row in rows:
+                processed += 1
+                if processed <= skip:
+                    continue
+                court = self._build_court(processed, row)
+                if court is not None:
+                    batch.append(court)
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, pool)
+                    batch = []
+                    if on_batch is not None:
+                        on_batch(processed)
+            if batch:
+                self._import_batch(batch, pool)
+            if on_batch is not None:
+                on_batch(processed)
+        return self.stats
+
+    def _build_court(self, line, row):
+        row = {key.strip(): (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            logger.warning(f"Row {line} skipped, missing {', '.join(missing)}", extra=SAMPLED)
+            self.stats['invalid'] += 1
+            return None
+        try:
+            latitude, longitude = (
+                Decimal(str(row[field])) if row.get(field) not in (None, '') else None
+                for field in ('latitude', 'longitude')
+            )
+        except InvalidOperation:
+            logger.warning(f"Row {line} skipped, invalid coordinates", extra=SAMPLED)
+            self.stats['invalid'] += 1
+            return None
+
+        court = Court(latitude=latitude, longitude=longitude, **{field: str(row[field]) for field in REQUIRED_FIELDS})
+        key = make_court_key(court.name, format_address(court))
+        if key in self._known:
+            self.stats['duplicates'] += 1
+            return None
+        self._known.add(key)
+        return court
+
+    def _import_batch(self, courts, pool):
+        pending = [court for court in courts if court.latitude is None or court.longitude is None]
+        addresses = list(dict.fromkeys(format_address(court) for court in pending))
+
+        locations = get_cached_locations(addresses)
+        self.stats['cached'] += len(locations)
+        missing = [address for address in addresses if address not in locations]
+        fetched = {}
+        for address, (found, location) in zip(missing, pool.map(lookup, missing)):
+            if found:
+                fetched[address] = location
+                self.stats['geocoded' if location is not None else 'not_found'] += 1
+            else:
+                self.stats['errors'] += 1
+            locations[address] = location
+
+        for court in pending:
+            location = locations.get(format_address(court))
+            if location is not None:
+                court.latitude, court.longitude = location
+
+        if self.dry_run:
+            self.stats['created'] += len(courts)
+            return
+        store_locations(fetched)
+        with transaction.atomic():
+            Court.objects.bulk_create(courts)
+            for court in pending:
+                if court.latitude is None:
+                    enqueue_geocoding(court.pk)
+                    self.stats['queued_for_geocoding'] += 1
+        self.stats['created'] += len(courts)
+        logger.info(f"Imported {len(courts)} court(s)")
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DayEventsCache:
+    """
+    Cache of the serialised day-view payload, keyed by (user, date).
+
+    An entry holds the user's events of one day together with the schedule version they were
+    read at, so an unchanged day is answered without touching the database. Entries are deleted
+    by the schedule change log for exactly the users and dates a change affects, and expire after
+    a timeout as a safety net.
+    """
+
+    def __init__(self, timeout=None):
+        self._timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else settings.DAY_EVENTS_CACHE_TIMEOUT
+
+    @staticmethod
+    def make_key(user_id, day):
+        """
+        Build the cache key for a user's day.
+
+        :param user_id: The ID of the user.
+        :param day: The date.
+        :return: The cache key.
+        """
+        return f'day_events:{user_id}:{day.isoformat()}'
+
+    def get(self, user_id, day):
+        """
+        Return the cached entry ({'events', 'cursor', 'last_modified'}) or None on a miss.
+        """
+        entry = cache.get(self.make_key(user_id, day))
+        metrics.increment('day_events_cache.hits' if entry is not None else 'day_events_cache.misses')
+        return entry
+
+    def set(self, user_id, day, events, cursor, last_modified):
+        """
+        Store the events of a user's day.
+
+        :param user_id: The ID of the user.
+        :param day: The date.
+        :param events: The serialised events.
+        :param cursor: The schedule version the events were read at.
+        :param last_modified: Timestamp of that version, or None.
+        """
+        cache.set(
+            self.make_key(user_id, day),
+            {'events': events, 'cursor': cursor, 'last_modified': last_modified},
+            self.timeout,
+        )
+
+    def invalidate(self, user_days):
+        """
+        Delete the entries of the given users' days.
+
+        :param user_days: Iterable of (user_id, date) pairs.
+        """
+        keys = {self.make_key(user_id, day) for user_id, day in user_days}
+        if keys:
+            cache.delete_many(list(keys))
+            metrics.increment('day_events_cache.invalidations', len(keys))
+
+
+day_events_cache = DayEventsCache()
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Up to `size` connections are kept open between uses. When all of them are taken, up to
+    `max_overflow` extra connections are opened and closed again when they are returned. Beyond
+    that, callers wait up to `timeout` seconds for a connection to be returned. Connections idle
+    for longer than `recycle` seconds are replaced, and returned connections that are broken or
+    cannot be reset are discarded.
+    """
+
+    def __init__(self, connect, size=10, max_overflow=5, timeout=10.0, recycle=1800.0, check=None, reset=None):
+        """
+        :param connect: Callable opening a new connection.
+        :param check: Optional callable telling whether an idle connection is still usable.
+        :param reset: Optional callable preparing a returned connection for the next user,
+                      returning False if the connection has to be discarded.
+        """
+        self.connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.check = check
+        self.reset = reset
+        self._idle = []
+        self._in_use = 0
+        self._max_in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Take a connection from the pool, opening a new one if no idle connection is usable.
+
+        :return: A connection.
+        :raises PoolTimeout: If no connection became available within the timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            waited = False
+            while not self._idle and self._in_use >= self.size + self.max_overflow:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.increment('db.pool.timeouts')
+                    raise PoolTimeout(f"No database connection available within {self.timeout} seconds")
+                if not waited:
+                    metrics.increment('db.pool.waits')
+                    waited = True
+                self._condition.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+
+        try:
+            if entry is not None:
+                connection, idle_since = entry
+                if time.monotonic() - idle_since <= self.recycle and (self.check is None or self.check(connection)):
+                    metrics.increment('db.pool.reused')
+                    return connection
+                self._close(connection)
+            connection = self.connect()
+            metrics.increment('db.pool.opened')
+            return connection
+        except BaseException:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, connection):
+        """
+        Return a connection to the pool. Overflow connections and connections that cannot be
+        reset are closed.
+        """
+        reusable = not getattr(connection, 'closed', False)
+        if reusable and self.reset is not None:
+            try:
+                reusable = self.reset(connection)
+            except Exception:
+                logger.warning("Discarding a database connection that could not be reset", exc_info=True)
+                reusable = False
+
+        with self._condition:
+            self._in_use -= 1
+            keep = reusable and len(self._idle) < self.size
+            if keep:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+        if not keep:
+            self._close(connection)
+
+    def close_idle(self):
+        """
+        Close all idle connections.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        """
+        Return the utilisation of the pool: connections in use, idle and the most ever in use at once.
+        """
+        with self._condition:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_in_use': self._max_in_use,
+                'utilisation': self._in_use / self.size if self.size else None,
+            }
+
+    @staticmethod
+    def _close(connection):
+        metrics.increment('db.pool.closed')
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Error while closing a database connection", exc_info=True)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory=None):
+    """
+    Return the pool of the given database alias in the current process, creating it with the
+    factory on first use. A forked process gets its own pool instead of sharing the parent's sockets.
+
+    :return: The pool, or None if it does not exist and no factory was given.
+    """
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None and factory is not None:
+            pool = _pools[key] = factory()
+        return pool
+
+
+def pool_stats():
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {alias: pool for (pool_pid, alias), pool in _pools.items() if pool_pid == pid}
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+metrics.register_gauge('db.pool', pool_stats)
@@ -1,6 +1,7 @@
 from datetime import timedelta
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from .models import CustomUser, Game, Category, Court, RecurringGroup, RECURRENCE_CHOICES
 from django.contrib.auth.forms import AuthenticationForm
@@ -16,15 +17,13 @@ class DateTimeLocalInput(forms.DateTimeInput):
 
 
 class ParticipantsWidget(ModelSelect2MultipleWidget):
-    search_fields = [
-        'username__icontains',
-        'email__icontains',
-    ]
+    # Searched by ParticipantSearchView instead of django_select2's generic view
+    data_view = 'participant_search'
 
     def build_attrs(self, *args, **kwargs):
         attrs = super().build_attrs(*args, **kwargs)
-        attrs['data-minimum-input-length'] = 2
-        attrs['data-ajax--cache'] = 'false'
+        attrs['data-minimum-input-length'] = settings.PARTICIPANT_SEARCH_MIN_LENGTH
+        attrs['data-ajax--cache'] = 'true'
         attrs['data-ajax--delay'] = 250
         return attrs
 
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils.timezone import now
+from .models import Court, GeocodeCache
+from .travel_time_cache import travel_time_cache
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_FIELDS = ['building_number', 'street', 'city', 'postal_code', 'country']
+LOCATION_FIELDS = ADDRESS_FIELDS + ['latitude', 'longitude']
+
+
+class NominatimProvider:
+    """
+    Geocoding with the OpenStreetMap Nominatim service. One geopy client is shared by the process.
+    """
+    rate_limited = True
+
+    def __init__(self):
+        from geopy.geocoders import Nominatim
+        self._geolocator = Nominatim(user_agent=settings.GEOCODING_USER_AGENT, timeout=settings.GEOCODING_TIMEOUT)
+
+    def geocode(self, address):
+        """
+        :param address: The address to look up.
+        :return: A tuple (latitude, longitude) or None if the address was not found.
+        """
+        location = self._geolocator.geocode(address)
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class GazetteerProvider:
+    """
+    Geocoding from a local JSON file mapping addresses to [latitude, longitude], for tests and
+    deployments without access to an external service. Addresses are matched after normalisation.
+    """
+    rate_limited = False
+
+    def __init__(self, path=None):
+        path = path or settings.GEOCODING_GAZETTEER_PATH
+        with open(path, encoding='utf-8') as gazetteer_file:
+            entries = json.load(gazetteer_file)
+        self._locations = {
+            normalize_address(address): (latitude, longitude) for address, (latitude, longitude) in entries.items()
+        }
+
+    def geocode(self, address):
+        return self._locations.get(normalize_address(address))
+
+
+class RateLimiter:
+    """
+    Spaces out calls so that no more than `rate` of them start per second, across all threads.
+    """
+
+    def __init__(self, rate=None):
+        self._rate = rate
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate if self._rate is not None else settings.GEOCODING_RATE_LIMIT
+
+    def wait(self):
+        """
+        Block until the caller may make the next call.
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            current = time.monotonic()
+            start_at = max(current, self._next_at)
+            self._next_at = start_at + 1 / self.rate
+        if start_at > current:
+            time.sleep(start_at - current)
+
+
+PROVIDERS = {
+    'nominatim': NominatimProvider,
+    'gazetteer': GazetteerProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+rate_limiter = RateLimiter()
+
+
+def get_provider():
+    """
+    Return the process-wide provider selected by GEOCODING_PROVIDER, created on first use.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None or _provider.__class__ is not PROVIDERS[settings.GEOCODING_PROVIDER]:
+            _provider = PROVIDERS[settings.GEOCODING_PROVIDER]()
+        return _provider
+
+
+def format_address(court):
+    """
+    Build the address of a court the way it is sent to the provider.
+    """
+    return f"{court.building_number} {court.street}, {court.city}, {court.postal_code}, {court.country}"
+
+
+def normalize_address(address):
+    """
+    Normalise an address so spelling variants of the same place share one cache entry:
+    Unicode is composed, letters are lower-cased, punctuation is dropped and whitespace collapsed.
+    """
+    address = unicodedata.normalize('NFKC', address).casefold()
+    address = re.sub(r'[^\w\s-]', ' ', address)
+    return ' '.join(address.split())
+
+
+def make_cache_key(address):
+    """
+    Build the GeocodeCache key of an address, a hash of its normalised form.
+    """
+    return hashlib.sha1(normalize_address(address).encode('utf-8')).hexdigest()
+
+
+def get_cached_location(address):
+    """
+    Look the address up in the geocoding cache only.
+
+    :param address: The address to look up.
+    :return: A tuple (found, location); location is (latitude, longitude), or None for an address
+             the provider recently did not know. found is False if the cache cannot answer.
+    """
+    locations = get_cached_locations([address])
+    return address in locations, locations.get(address)
+
+
+def get_cached_locations(addresses):
+    """
+    Look up many addresses in the geocoding cache with one query.
+
+    :param addresses: The addresses to look up.
+    :return: A dictionary mapping the addresses the cache can answer to (latitude, longitude),
+             or to None for addresses the provider recently did not know.
+    """
+    keys = {}
+    for address in addresses:
+        keys.setdefault(make_cache_key(address), []).append(address)
+    not_found_before = now() - timedelta(seconds=settings.GEOCODING_NOT_FOUND_TTL)
+
+    locations = {}
+    for entry in GeocodeCache.objects.filter(address_key__in=keys):
+        if entry.latitude is None and entry.fetched_at < not_found_before:
+            continue
+        location = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+        for address in keys[entry.address_key]:
+            locations[address] = location
+
+    metrics.increment('geocoding.cache_hits', len(locations))
+    metrics.increment('geocoding.cache_misses', sum(len(group) for group in keys.values()) - len(locations))
+    return locations
+
+
+def store_locations(locations):
+    """
+    Store provider results in the geocoding cache with one upsert.
+
+    :param locations: A dictionary mapping addresses to (latitude, longitude), or to None if the
+                      provider did not find the address.
+    """
+    fetched_at = now()
+    entries = {}
+    for address, location in locations.items():
+        latitude, longitude = location if location is not None else (None, None)
+        entries[make_cache_key(address)] = GeocodeCache(
+            address_key=make_cache_key(address), address=address,
+            latitude=latitude, longitude=longitude, fetched_at=fetched_at)
+    if not entries:
+        return
+    try:
+        GeocodeCache.objects.bulk_create(
+            entries.values(),
+            update_conflicts=True,
+            unique_fields=['address_key'],
+            update_fields=['address', 'latitude', 'longitude', 'fetched_at'],
+        )
+    except DatabaseError:
+        logger.exception(f"Failed to cache the locations of {len(entries)} address(es)")
+
+
+def lookup(address):
+    """
+    Ask the provider for the coordinates of an address, bypassing the cache. Safe to call from
+    worker threads, it does not touch the database.
+
+    :param address: The address to look up.
+    :return: A tuple (found, location); found is False if the provider failed, so the result must not be cached.
+    """
+    provider = get_provider()
+    if provider.rate_limited:
+        rate_limiter.wait()
+    try:
+        location = provider.geocode(address)
+    except Exception:
+        logger.exception(f"Geocoding failed for address: {address}")
+        metrics.increment('geocoding.errors')
+        return False, None
+    metrics.increment('geocoding.lookups')
+    if location is None:
+        logger.warning(f"Geolocation not found for address: {address}")
+    return True, location
+
+
+def geocode(address):
+    """
+    Get the coordinates of an address, asking the provider only when the address is not cached.
+    Results, including addresses the provider does not know, are stored in the GeocodeCache table.
+
+    :param address: The address to look up.
+    :return: A tuple (latitude, longitude) or None if the address could not be geocoded.
+    """
+    found, location = get_cached_location(address)
+    if found:
+        return location
+
+    found, location = lookup(address)
+    # Provider errors are not cached, the next save tries again
+    if found:
+        store_locations({address: location})
+    return location
+
+
+def address_changed(court):
+    """
+    Check whether the address of a court differs from the one it was loaded or created with,
+    using the values remembered by the post_init signal instead of reading the stored row.
+    """
+    return _changed(court, ADDRESS_FIELDS)
+
+
+def location_changed(court):
+    """
+    Check whether the address or the coordinates of a court differ from the remembered ones.
+    """
+    return _changed(court, LOCATION_FIELDS)
+
+
+def remember_location(court):
+    # Read from __dict__ so deferred fields are not loaded just for this
+    court._original_location = {field: court.__dict__.get(field) for field in LOCATION_FIELDS}
+
+
+def _changed(court, fields):
+    original = getattr(court, '_original_location', None)
+    return original is None or any(original[field] != getattr(court, field) for field in fields)
+
+
+def update_court_location(court_id):
+    """
+    Geocode the current address of a saved court and store its coordinates with a single UPDATE,
+    without firing the Court signals again. Travel times of the court are invalidated.
+
+    :param court_id: The ID of the court.
+    """
+    court = Court.objects.filter(pk=court_id).only(*ADDRESS_FIELDS).first()
+    if court is None:
+        return
+    location = geocode(format_address(court))
+    if location is None:
+        return
+    latitude, longitude = location
+    Court.objects.filter(pk=court_id).update(latitude=latitude, longitude=longitude)
+    travel_time_cache.invalidate_court(court_id)
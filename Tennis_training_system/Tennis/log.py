@@ -0,0 +1,111 @@
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from . import metrics
+
+# Pass as `extra` to log calls inside loops; only every LOG_SAMPLE_EVERY-th record of the call site is kept
+SAMPLED = {'sample': True}
+
+_RECORD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'sample'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line: time, level, logger, message, source location,
+    any `extra` fields of the call and the formatted exception.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        entry.update((key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep the first and then every `every`-th record logged with `extra=SAMPLED` from the same
+    call site, so a message inside a loop over thousands of items costs a counter increment
+    instead of a line each. Kept records carry the rate as `sample_rate`; other records pass.
+    """
+
+    def __init__(self, every=100):
+        super().__init__()
+        self.every = every
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or self.every <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(site, 0)
+            self._counts[site] = count + 1
+        if count % self.every:
+            return False
+        record.sample_rate = self.every
+        return True
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Handler putting records on a bounded queue, from which a background thread formats and writes
+    them with the target handler (a stream handler on stderr by default). Logging thus costs the
+    calling thread only the message interpolation; when the writer falls behind and the queue is
+    full, records are dropped and counted as 'logging.dropped' rather than blocking the request.
+    The formatter set on this handler is used by the target.
+    """
+
+    def __init__(self, target=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = target if target is not None else logging.StreamHandler()
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        self._running = True
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Unlike QueueHandler, leaves formatting to the writer thread; the arguments are merged
+        # now, as they may be changed by the caller once it continues
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment('logging.dropped')
+
+    def flush(self):
+        """
+        Wait until the records queued so far are written.
+        """
+        if self._running:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self._running:
+            self._running = False
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,121 @@
+import hashlib
+import ipaddress
+import math
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LoginThrottle:
+    """
+    Token buckets limiting login attempts per client IP and per email address.
+
+    Each bucket holds up to `burst` attempts and refills at `per_minute` attempts per minute.
+    An attempt takes one token from both buckets of the request; if either is empty the attempt
+    is rejected before the password is hashed. Buckets live in the shared cache, so the limits
+    apply across processes. Reading and writing a bucket are separate cache calls, so concurrent
+    attempts may occasionally be admitted a token early, which is fine for this purpose.
+    """
+
+    def __init__(self, limits=None):
+        self._limits = limits
+
+    @property
+    def limits(self):
+        if self._limits is not None:
+            return self._limits
+        return {
+            'ip': (settings.LOGIN_THROTTLE_IP_PER_MINUTE, settings.LOGIN_THROTTLE_IP_BURST),
+            'email': (settings.LOGIN_THROTTLE_EMAIL_PER_MINUTE, settings.LOGIN_THROTTLE_EMAIL_BURST),
+        }
+
+    @staticmethod
+    def make_key(kind, value):
+        # Hashed, so any address or IP is a valid cache key
+        return f'login_throttle:{kind}:{hashlib.sha1(value.encode("utf-8")).hexdigest()}'
+
+    def _buckets(self, ip, email):
+        buckets = {}
+        if ip:
+            buckets[self.make_key('ip', ip)] = self.limits['ip']
+        if email:
+            buckets[self.make_key('email', email.strip().lower())] = self.limits['email']
+        return buckets
+
+    def attempt(self, ip, email):
+        """
+        Take a token for a login attempt.
+
+        :param ip: The client IP address.
+        :param email: The email address the attempt is made for.
+        :return: None if the attempt is admitted, otherwise the number of seconds until it would be.
+        """
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return None
+        buckets = self._buckets(ip, email)
+        current = time.time()
+        states = cache.get_many(list(buckets))
+
+        tokens = {}
+        retry_after = 0
+        for key, (per_minute, burst) in buckets.items():
+            available, updated_at = states.get(key, (burst, current))
+            available = min(burst, available + (current - updated_at) * per_minute / 60)
+            if available < 1:
+                retry_after = max(retry_after, math.ceil((1 - available) * 60 / per_minute))
+            tokens[key] = available
+
+        if retry_after:
+            metrics.increment('login_throttle.rejected')
+            logger.warning(f"Login attempt from {ip} rejected by the throttle, retry after {retry_after}s")
+            return retry_after
+
+        for key, (per_minute, burst) in buckets.items():
+            # Kept until the bucket would be full again, after which a missing entry means the same
+            cache.set(key, (tokens[key] - 1, current), math.ceil(burst * 60 / per_minute) + 1)
+        metrics.increment('login_throttle.admitted')
+        return None
+
+    def reset_email(self, email):
+        """
+        Refill the bucket of an email address after a successful login.
+        """
+        cache.delete(self.make_key('email', email.strip().lower()))
+
+
+@lru_cache
+def _trusted_networks(proxies):
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def is_trusted_proxy(address):
+    """
+    Tell whether a connection comes from one of the TRUSTED_PROXIES (addresses or networks).
+    """
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def get_client_ip(request):
+    """
+    Get the IP address of the client. The CLIENT_IP_HEADER is only believed on connections from
+    a trusted proxy, as anyone reaching the application directly can set it to any value; of
+    a list of addresses the last one is taken, the one the proxy added.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    if settings.CLIENT_IP_HEADER and is_trusted_proxy(remote_addr):
+        ip = request.META.get(settings.CLIENT_IP_HEADER, '').split(',')[-1].strip()
+        if ip:
+            return ip
+    return remote_addr
+
+
+login_throttle = LoginThrottle()
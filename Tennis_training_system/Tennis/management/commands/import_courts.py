@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from Tennis.court_import import CourtImporter, ImportState, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import courts from a CSV or JSON file (columns name, building_number, street, city, postal_code, '
+            'country and optionally latitude, longitude), skipping courts that already exist.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The CSV or JSON file to import.')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format, guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Courts written per transaction.')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel geocoding requests.')
+        parser.add_argument('--state', help='Progress file used to resume an interrupted import (default: <path>.progress).')
+        parser.add_argument('--restart', action='store_true', help='Ignore the progress of an earlier run.')
+        parser.add_argument('--dry-run', action='store_true', help='Geocode and check the rows without saving courts.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        state = ImportState(options['state'] or f'{path}.progress')
+        skip = 0 if options['restart'] or options['dry_run'] else state.load(path)
+        if skip:
+            self.stdout.write(f"Resuming after row {skip}")
+
+        def on_batch(processed):
+            if not options['dry_run']:
+                state.save(path, processed)
+            self.stdout.write(f"Processed {processed} row(s)")
+
+        importer = CourtImporter(batch_size=options['batch_size'], workers=options['workers'],
+                                 dry_run=options['dry_run'])
+        try:
+            stats = importer.run(read_rows(path, options['format']), skip=skip, on_batch=on_batch)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        if not options['dry_run']:
+            state.clear()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f"{count} {name.replace('_', ' ')}" for name, count in stats.items())))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from Tennis.schedule_changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete old entries of the schedule change log used by the day-view poll (run periodically, e.g. from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.SCHEDULE_CHANGES_RETENTION_HOURS,
+                            help='Keep changes from this many most recent hours.')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(now() - timedelta(hours=options['hours']))
+        self.stdout.write(f"Deleted {deleted} schedule change(s)")
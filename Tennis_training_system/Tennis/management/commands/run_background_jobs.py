@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from Tennis.tasks import run_pending_jobs
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (conflict checks and other deferred work).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due and exit.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Maximum number of jobs claimed at once.')
+        parser.add_argument('--max-backoff', type=float, default=60.0,
+                            help='Maximum seconds to wait after consecutive failures to reach the queue.')
+
+    def handle(self, *args, **options):
+        failures = 0
+        while True:
+            # Like at the end of a request: drops connections that broke or outlived CONN_MAX_AGE
+            close_old_connections()
+            try:
+                processed = run_pending_jobs(limit=options['batch_size'])
+            except Exception:
+                if options['once']:
+                    raise
+                failures += 1
+                delay = min(options['interval'] * 2 ** failures, options['max_backoff'])
+                logger.exception(f"Could not run background jobs ({failures} failure(s) in a row), retrying in {delay:.0f}s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s)")
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
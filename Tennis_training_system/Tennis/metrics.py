@@ -0,0 +1,58 @@
+import threading
+from collections import defaultdict
+
+_counters = defaultdict(int)
+_gauges = {}
+_lock = threading.Lock()
+
+
+def increment(name, amount=1):
+    """
+    Increase a process-wide counter.
+
+    :param name: Dotted counter name, e.g. 'routing.retries'.
+    :param amount: The value to add to the counter.
+    """
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name):
+    """
+    Return the current value of a counter, 0 if it was never incremented.
+    """
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def register_gauge(name, callback):
+    """
+    Register a callable whose return value is reported under the given name in every snapshot.
+    Used for values that are read from another object, e.g. connection pool statistics.
+    """
+    with _lock:
+        _gauges[name] = callback
+
+
+def snapshot(prefix=''):
+    """
+    Return all counters and gauges whose name starts with the prefix.
+
+    :param prefix: Optional name prefix used to filter the metrics.
+    :return: A dictionary mapping metric names to their current values.
+    """
+    with _lock:
+        values = {name: value for name, value in _counters.items() if name.startswith(prefix)}
+        gauges = {name: callback for name, callback in _gauges.items() if name.startswith(prefix)}
+    for name, callback in gauges.items():
+        values[name] = callback()
+    return values
+
+
+def reset(prefix=''):
+    """
+    Set every counter whose name starts with the prefix back to zero.
+    """
+    with _lock:
+        for name in [name for name in _counters if name.startswith(prefix)]:
+            del _counters[name]
@@ -0,0 +1,24 @@
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.utils.cache import patch_vary_headers
+
+
+def skip_session_save(request):
+    """
+    Mark a request whose response must not write the session, e.g. a frequent poll that only
+    reads data. Nothing the view changes in the session is stored and the cookie is not refreshed.
+    """
+    request.skip_session_save = True
+
+
+class SessionMiddleware(BaseSessionMiddleware):
+    """
+    Session middleware that leaves the session untouched for requests marked with skip_session_save().
+    The response still varies on the session cookie if the session was read.
+    """
+
+    def process_response(self, request, response):
+        if getattr(request, 'skip_session_save', False):
+            if request.session.accessed:
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return super().process_response(request, response)
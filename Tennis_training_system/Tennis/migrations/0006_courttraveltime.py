@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0005_alter_customuser_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourtTravelTime',
+            fields=[
+                ('travel_time_id', models.AutoField(primary_key=True, serialize=False)),
+                ('departure_hour', models.PositiveSmallIntegerField()),
+                ('travel_time', models.FloatField()),
+                ('fetched_at', models.DateTimeField()),
+                ('destination_court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='travel_times_to', to='Tennis.court')),
+                ('origin_court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='travel_times_from', to='Tennis.court')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fetched_at'], name='court_travel_time_fetched_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origin_court', 'destination_court', 'departure_hour'), name='unique_court_travel_time')],
+            },
+        ),
+    ]
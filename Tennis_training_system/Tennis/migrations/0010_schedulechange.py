@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0009_participant_user_game_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleChange',
+            fields=[
+                ('change_id', models.AutoField(primary_key=True, serialize=False)),
+                ('game_id', models.IntegerField()),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'change_id'], name='schedule_change_user_idx'),
+                    models.Index(fields=['changed_at'], name='schedule_change_changed_idx'),
+                ],
+            },
+        ),
+    ]
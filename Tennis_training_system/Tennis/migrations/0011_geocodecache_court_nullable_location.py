@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0010_schedulechange'),
+    ]
+
+    operations = [
+        # The baseline models had required coordinates without a migration, so databases the
+        # entrypoint's makemigrations used to migrate have the columns already
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql='ALTER TABLE "Tennis_court" ADD COLUMN IF NOT EXISTS latitude numeric(9, 6) NULL, '
+                        'ADD COLUMN IF NOT EXISTS longitude numeric(9, 6) NULL;'
+                        'ALTER TABLE "Tennis_court" ALTER COLUMN latitude DROP NOT NULL, '
+                        'ALTER COLUMN longitude DROP NOT NULL;',
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='court',
+                    name='latitude',
+                    field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+                ),
+                migrations.AddField(
+                    model_name='court',
+                    name='longitude',
+                    field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('geocode_id', models.AutoField(primary_key=True, serialize=False)),
+                ('address_key', models.CharField(max_length=40, unique=True)),
+                ('address', models.TextField()),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
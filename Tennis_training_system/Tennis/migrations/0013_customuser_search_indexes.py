@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:40
+
+from django.db import migrations
+
+
+# Pattern indexes answering the participants autocomplete (lower(column) LIKE 'prefix%') regardless
+# of the database collation; written as SQL because the operator class is PostgreSQL-specific
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0012_customuser_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX customuser_username_prefix_idx ON "Tennis_customuser" (lower(username) text_pattern_ops);',
+            reverse_sql='DROP INDEX customuser_username_prefix_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX customuser_email_prefix_idx ON "Tennis_customuser" (lower(email) text_pattern_ops);',
+            reverse_sql='DROP INDEX customuser_email_prefix_idx;',
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+# Fields and models the models have changed since 0005 without a migration, which the entrypoint's
+# makemigrations used to generate on every deployment. Databases migrated that way have these changes
+# already, so the schema is changed with IF [NOT] EXISTS statements and the models only in the state.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0013_customuser_search_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql='ALTER TABLE "Tennis_category" ADD COLUMN IF NOT EXISTS color varchar(7) NOT NULL DEFAULT \'#3788d8\';'
+                        'ALTER TABLE "Tennis_category" ALTER COLUMN color DROP DEFAULT;',
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+                migrations.RunSQL(
+                    sql='ALTER TABLE "Tennis_participant" DROP COLUMN IF EXISTS is_trainer, '
+                        'ADD COLUMN IF NOT EXISTS alert boolean NOT NULL DEFAULT false, '
+                        'ADD COLUMN IF NOT EXISTS time_available double precision NULL, '
+                        'ADD COLUMN IF NOT EXISTS travel_time double precision NULL;'
+                        'ALTER TABLE "Tennis_participant" ALTER COLUMN alert DROP DEFAULT;',
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+                migrations.RunSQL(
+                    sql='DROP TABLE IF EXISTS "Tennis_participantreceiver", "Tennis_participantrequest", '
+                        '"Tennis_creategamerequest";',
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='category',
+                    name='color',
+                    field=models.CharField(default='#3788d8', max_length=7),
+                    preserve_default=False,
+                ),
+                migrations.RemoveField(
+                    model_name='participant',
+                    name='is_trainer',
+                ),
+                migrations.AddField(
+                    model_name='participant',
+                    name='alert',
+                    field=models.BooleanField(default=False),
+                ),
+                migrations.AddField(
+                    model_name='participant',
+                    name='time_available',
+                    field=models.FloatField(blank=True, null=True),
+                ),
+                migrations.AddField(
+                    model_name='participant',
+                    name='travel_time',
+                    field=models.FloatField(blank=True, null=True),
+                ),
+                migrations.RemoveField(
+                    model_name='participantreceiver',
+                    name='request',
+                ),
+                migrations.RemoveField(
+                    model_name='participantreceiver',
+                    name='receiver',
+                ),
+                migrations.RemoveField(
+                    model_name='participantrequest',
+                    name='game',
+                ),
+                migrations.RemoveField(
+                    model_name='participantrequest',
+                    name='sender',
+                ),
+                migrations.DeleteModel(
+                    name='CreateGameRequest',
+                ),
+                migrations.DeleteModel(
+                    name='ParticipantReceiver',
+                ),
+                migrations.DeleteModel(
+                    name='ParticipantRequest',
+                ),
+            ],
+        ),
+        # Unique in 0003; altering it again finds no unique constraint to drop and leaves the column as is
+        migrations.AlterField(
+            model_name='game',
+            name='name',
+            field=models.CharField(default='Tennis game', max_length=20),
+        ),
+    ]
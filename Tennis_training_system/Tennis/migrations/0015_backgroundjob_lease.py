@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tennis', '0014_sync_category_participant_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='backgroundjob',
+            name='unique_background_job',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('claimed_at__isnull', True)), fields=('kind', 'dedupe_key'), name='unique_waiting_background_job'),
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.db import DatabaseError, models
+from django.templatetags.static import static
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db.models.signals import post_migrate
+from django.utils.timezone import now
 import logging
 logger = logging.getLogger(__name__)
 
@@ -25,9 +28,20 @@ class Role(models.Model):
     def __str__(self):
         return self.role_name
 
+    _default_role_id = None
+
     @classmethod
     def get_default_role(cls):
-        return cls.objects.get_or_create(role_name='regular')[0]
+        """
+        Return the ID of the 'regular' role, looked up once per process (the default of CustomUser.role).
+        """
+        if cls._default_role_id is None:
+            try:
+                cls._default_role_id = cls.objects.get_or_create(role_name='regular')[0].pk
+            except DatabaseError:
+                # No role table yet: the system checks instantiate the user model before the first migrate
+                return None
+        return cls._default_role_id
 
 
 class CustomUserManager(BaseUserManager):
@@ -68,6 +82,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     password = models.CharField(max_length=128)
     created_at = models.DateTimeField(auto_now_add=True)
     profile_picture = models.CharField(max_length=255, null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     role = models.ForeignKey(Role, on_delete=models.CASCADE, default=Role.get_default_role)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -80,6 +95,31 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def get_session_auth_hash(self):
+        # Users from the user cache carry the hash instead of the password hash
+        if 'password' not in self.__dict__ and hasattr(self, '_session_auth_hash'):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
+    @property
+    def profile_picture_url(self):
+        return self.build_profile_picture_url(self.profile_picture, self.profile_picture_variants, 'medium')
+
+    @staticmethod
+    def build_profile_picture_url(profile_picture, variants, size):
+        """
+        Get the URL of a profile picture in the given size, falling back to the uploaded original
+        while the resized variants are not ready and to the default picture if there is none.
+
+        :param profile_picture: The stored path of the uploaded picture.
+        :param variants: Dictionary mapping the PROFILE_PICTURE_SIZES names to stored paths.
+        :param size: The wanted size, e.g. 'small' for event tiles.
+        :return: The URL of the picture.
+        """
+        if not profile_picture:
+            return static('images/Ola.png')
+        return settings.MEDIA_URL + ((variants or {}).get(size) or profile_picture)
+
 
 class Category(models.Model):
     category_id = models.AutoField(primary_key=True)
@@ -98,8 +138,8 @@ class Court(models.Model):
     city = models.CharField(max_length=255)
     postal_code = models.CharField(max_length=20)
     country = models.CharField(max_length=255)
-    latitude = models.DecimalField(max_digits=9, decimal_places=6)
-    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -129,6 +169,12 @@ class Game(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     group = models.ForeignKey(RecurringGroup, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date_and_time'], name='game_start_idx'),
+            models.Index(fields=['end_date_and_time'], name='game_end_idx'),
+        ]
+
     def __str__(self):
         return f"Game {self.game_id} by {self.creator}"
 
@@ -141,5 +187,90 @@ class Participant(models.Model):
     time_available = models.FloatField(null=True, blank=True)
     alert = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'game'], name='participant_user_game_idx'),
+        ]
+
     def __str__(self):
         return f"Participant {self.user} in game {self.game}"
+
+
+class CourtTravelTime(models.Model):
+    travel_time_id = models.AutoField(primary_key=True)
+    origin_court = models.ForeignKey(Court, on_delete=models.CASCADE, related_name='travel_times_from')
+    destination_court = models.ForeignKey(Court, on_delete=models.CASCADE, related_name='travel_times_to')
+    departure_hour = models.PositiveSmallIntegerField()
+    travel_time = models.FloatField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origin_court', 'destination_court', 'departure_hour'],
+                name='unique_court_travel_time',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fetched_at'], name='court_travel_time_fetched_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.origin_court} -> {self.destination_court} at {self.departure_hour}:00"
+
+
+class GeocodeCache(models.Model):
+    geocode_id = models.AutoField(primary_key=True)
+    address_key = models.CharField(max_length=40, unique=True)
+    address = models.TextField()
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.address
+
+
+class BackgroundJob(models.Model):
+    job_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=50)
+    dedupe_key = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Only one waiting job per key; the same work can be queued again while a job is running
+            models.UniqueConstraint(
+                fields=['kind', 'dedupe_key'],
+                condition=models.Q(claimed_at__isnull=True),
+                name='unique_waiting_background_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['run_after'], name='background_job_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.dedupe_key}"
+
+
+class ScheduleChange(models.Model):
+    change_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='schedule_changes')
+    game_id = models.IntegerField()
+    changed_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_id'], name='schedule_change_user_idx'),
+            models.Index(fields=['changed_at'], name='schedule_change_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.change_id} of game {self.game_id} for {self.user}"
@@ -0,0 +1,162 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+from .models import CustomUser, Participant
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParticipantSearch:
+    """
+    Prefix search of the users that can be added to a game, for the participants autocomplete.
+
+    Users are matched by the start of their username or email, which the lower(username) and
+    lower(email) pattern indexes answer without scanning the users table. The matches of every
+    searched prefix are cached, and as the prefix grows while typing it is answered by filtering
+    the cached matches of a shorter prefix, as long as those were not cut off at `candidates`.
+    The searching user's frequent co-players are ranked first.
+
+    Cached entries belong to a generation that is replaced whenever a user is added, removed or
+    renamed, so a change is visible to the next search instead of after the timeout.
+    """
+
+    GENERATION_KEY = 'participant_search:generation'
+
+    def __init__(self, timeout=None, candidates=None):
+        self._timeout = timeout
+        self._candidates = candidates
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else settings.PARTICIPANT_SEARCH_CACHE_TIMEOUT
+
+    @property
+    def candidates(self):
+        return self._candidates if self._candidates is not None else settings.PARTICIPANT_SEARCH_CANDIDATES
+
+    @staticmethod
+    def normalize(term):
+        return ' '.join(term.split()).lower()
+
+    def _generation(self):
+        return cache.get_or_set(self.GENERATION_KEY, time.time_ns(), None)
+
+    @staticmethod
+    def make_key(generation, prefix):
+        # Hashed, so any typed text is a valid cache key
+        return f'participant_search:{generation}:{hashlib.sha1(prefix.encode("utf-8")).hexdigest()}'
+
+    def search(self, term, user_id):
+        """
+        Find the users whose username or email starts with the term.
+
+        :param term: The text typed into the autocomplete.
+        :param user_id: The ID of the searching user, whose co-players are ranked first.
+        :return: A list of Select2 results ({'id', 'text'}), at most PARTICIPANT_SEARCH_RESULTS long.
+        """
+        prefix = self.normalize(term)
+        if len(prefix) < settings.PARTICIPANT_SEARCH_MIN_LENGTH:
+            return []
+        generation = self._generation()
+        users = self.get_matches(prefix, generation)
+        coplayers = self.get_coplayers(user_id, generation)
+
+        ranked = [user for user in coplayers if self._matches(user, prefix)]
+        ranked_ids = {user_id for user_id, _, _ in ranked}
+        ranked += [user for user in users if user[0] not in ranked_ids]
+        # Same label as the selected options get from the widget, i.e. str(user)
+        return [{'id': user_id, 'text': email} for user_id, _, email in ranked[:settings.PARTICIPANT_SEARCH_RESULTS]]
+
+    @staticmethod
+    def _matches(user, prefix):
+        _, username, email = user
+        return username.lower().startswith(prefix) or email.lower().startswith(prefix)
+
+    def get_matches(self, prefix, generation):
+        """
+        Return the users matching a prefix, ordered by username, from the cache if possible.
+
+        :param prefix: The normalised prefix.
+        :param generation: The current cache generation.
+        :return: A list of (user_id, username, email) tuples.
+        """
+        key = self.make_key(generation, prefix)
+        entry = cache.get(key)
+        if entry is not None:
+            metrics.increment('participant_search.hits')
+            return entry['users']
+
+        entry = self._narrow(prefix, generation)
+        if entry is not None:
+            metrics.increment('participant_search.narrowed')
+        else:
+            entry = self._query(prefix)
+            metrics.increment('participant_search.misses')
+        cache.set(key, entry, self.timeout)
+        return entry['users']
+
+    def _narrow(self, prefix, generation):
+        """
+        Build the entry of a prefix from the longest cached shorter prefix whose matches are complete.
+        """
+        keys = {self.make_key(generation, prefix[:length]): length
+                for length in range(settings.PARTICIPANT_SEARCH_MIN_LENGTH, len(prefix))}
+        cached = cache.get_many(list(keys))
+        for key in sorted(cached, key=keys.get, reverse=True):
+            if cached[key]['complete']:
+                return {
+                    'complete': True,
+                    'users': [user for user in cached[key]['users'] if self._matches(user, prefix)],
+                }
+        return None
+
+    def _query(self, prefix):
+        users = list(
+            CustomUser.objects
+            .annotate(username_lower=Lower('username'), email_lower=Lower('email'))
+            .filter(Q(username_lower__startswith=prefix) | Q(email_lower__startswith=prefix))
+            .order_by('username_lower')
+            .values_list('user_id', 'username', 'email')[:self.candidates + 1]
+        )
+        return {'complete': len(users) <= self.candidates, 'users': users[:self.candidates]}
+
+    def get_coplayers(self, user_id, generation):
+        """
+        Return the users the given user has most often played with, most frequent first.
+
+        :param user_id: The ID of the user.
+        :param generation: The current cache generation.
+        :return: A list of (user_id, username, email) tuples.
+        """
+        key = f'participant_search:{generation}:coplayers:{user_id}'
+        coplayers = cache.get(key)
+        if coplayers is None:
+            coplayers = [
+                (row['user_id'], row['user__username'], row['user__email'])
+                for row in Participant.objects
+                .filter(game__participant__user_id=user_id)
+                .exclude(user_id=user_id)
+                .values('user_id', 'user__username', 'user__email')
+                .annotate(games=Count('game', distinct=True))
+                .order_by('-games', 'user__username')[:settings.PARTICIPANT_SEARCH_COPLAYERS]
+            ]
+            cache.set(key, coplayers, self.timeout)
+        return coplayers
+
+    def invalidate(self):
+        """
+        Start a new generation of cached results, now and again when the current transaction
+        commits, so a search running before the commit cannot keep the old users cached.
+        """
+        cache.set(self.GENERATION_KEY, time.time_ns(), None)
+        transaction.on_commit(lambda: cache.set(self.GENERATION_KEY, time.time_ns(), None))
+        metrics.increment('participant_search.invalidations')
+
+
+participant_search = ParticipantSearch()
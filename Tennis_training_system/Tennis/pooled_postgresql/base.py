@@ -0,0 +1,79 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions, extras
+from Tennis.db_pool import ConnectionPool, PoolTimeout, get_pool
+
+
+def is_connection_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+def reset_connection(connection):
+    """
+    Roll back whatever the previous user left open, so the next one starts on a clean connection.
+
+    :return: False if the connection is broken.
+    """
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking its connections from a per-process ConnectionPool instead of opening
+    one per request. Closing the connection at the end of a request returns it to the pool.
+    The pool is configured by the POOL entry of the database settings (SIZE, MAX_OVERFLOW,
+    TIMEOUT, RECYCLE); with CONN_HEALTH_CHECKS idle connections are pinged before they are reused.
+    """
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, lambda: self._create_pool(conn_params))
+        try:
+            connection = pool.acquire()
+        except PoolTimeout as e:
+            raise base.Database.OperationalError(str(e)) from e
+        # Normally set while connecting, which a reused connection skips
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED))
+        return connection
+
+    def _create_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+
+        def connect():
+            # What the PostgreSQL backend does for a new connection, without touching this wrapper,
+            # as the pool opens connections for every thread
+            connection = base.Database.connect(**conn_params)
+            if isolation_level is not None:
+                connection.isolation_level = IsolationLevel(isolation_level)
+            extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+            return connection
+
+        return ConnectionPool(
+            connect=connect,
+            size=options.get('SIZE', 10),
+            max_overflow=options.get('MAX_OVERFLOW', 5),
+            timeout=options.get('TIMEOUT', 10.0),
+            recycle=options.get('RECYCLE', 1800.0),
+            check=is_connection_usable if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+            reset=reset_connection,
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            pool = get_pool(self.alias)
+            with self.wrap_database_errors:
+                if pool is None:
+                    # Opened by the pool of a parent process
+                    return self.connection.close()
+                pool.release(self.connection)
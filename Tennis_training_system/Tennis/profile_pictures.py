@@ -0,0 +1,99 @@
+import hashlib
+import os
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .models import CustomUser, Participant
+from .schedule_changes import record_participant_changes
+from .user_cache import user_cache
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = 'profile_pictures/originals'
+VARIANTS_DIR = 'profile_pictures/variants'
+
+
+def content_name(directory, content, extension):
+    """
+    Build a content-addressed file name, so a stored file never changes and can be cached forever.
+
+    :param directory: Directory inside the media storage.
+    :param content: The file content.
+    :param extension: File extension including the dot.
+    :return: The storage path.
+    """
+    return f"{directory}/{hashlib.sha256(content).hexdigest()[:32]}{extension}"
+
+
+def store(path, content):
+    """
+    Save the content under the path unless a file with this (content-derived) name already exists.
+    """
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(content))
+    return path
+
+
+def save_original(upload):
+    """
+    Store an uploaded profile picture as it is, under a name derived from its content.
+
+    :param upload: The uploaded file.
+    :return: The storage path of the original.
+    """
+    content = b''.join(upload.chunks())
+    extension = os.path.splitext(upload.name)[1].lower()[:10]
+    return store(content_name(ORIGINALS_DIR, content, extension), content)
+
+
+def create_variants(original_path):
+    """
+    Downscale a stored original to every size in PROFILE_PICTURE_SIZES. Variants are square crops
+    (the avatars are round), re-encoded as WebP and stored under content-addressed names.
+
+    :param original_path: The storage path of the original.
+    :return: A dictionary mapping size names to storage paths.
+    """
+    sizes = settings.PROFILE_PICTURE_SIZES
+    with default_storage.open(original_path, 'rb') as original_file:
+        image = Image.open(original_file)
+        # Lets JPEG decoding skip straight to a reduced scale when the original is much larger
+        image.draft('RGB', (max(sizes.values()) * 2,) * 2)
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+    variants = {}
+    for name, size in sizes.items():
+        size = min(size, *image.size)  # never upscale
+        # Biased to the top, where the face usually is, like the background-position of the avatars
+        variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS, centering=(0.5, 0.3))
+        buffer = BytesIO()
+        variant.save(buffer, 'WEBP', quality=settings.PROFILE_PICTURE_QUALITY, method=6)
+        variants[name] = store(content_name(VARIANTS_DIR, buffer.getvalue(), '.webp'), buffer.getvalue())
+    return variants
+
+
+def process_profile_picture(user_id):
+    """
+    Create the resized variants of the user's current profile picture and store their paths.
+    The user is only updated if the picture was not replaced in the meantime; the events showing
+    the picture are recorded as changed, so cached days pick up the small variant.
+
+    :param user_id: The ID of the user.
+    """
+    profile_picture = CustomUser.objects.filter(pk=user_id).values_list('profile_picture', flat=True).first()
+    if not profile_picture:
+        return
+    variants = create_variants(profile_picture)
+    updated = CustomUser.objects.filter(pk=user_id, profile_picture=profile_picture).update(
+        profile_picture_variants=variants)
+    if updated:
+        user_cache.invalidate(user_id)
+        record_participant_changes(Participant.objects.filter(game__creator_id=user_id))
+        metrics.increment('profile_pictures.processed')
+        logger.info(f"Created profile picture variants of user {user_id}: {variants}")
@@ -0,0 +1,127 @@
+from datetime import timedelta, datetime, time
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.utils.timezone import make_aware, now, localdate
+from .models import Game, Participant
+from .schedule_changes import record_changes, record_game_changes
+
+
+def get_recurrence_delta(recurrence_type, idx):
+    """
+    Return the offset of the idx-th occurrence from the first game of a series.
+    """
+    if recurrence_type == 'daily':
+        return timedelta(days=idx)
+    elif recurrence_type == 'weekly':
+        return timedelta(weeks=idx)
+    elif recurrence_type == 'biweekly':
+        return timedelta(weeks=2 * idx)
+    elif recurrence_type == 'monthly':
+        return relativedelta(months=idx)
+    return timedelta(0)
+
+
+def expand_occurrences(start, end, recurrence_type, until):
+    """
+    Compute the start and end of every occurrence that follows the first game of a series.
+    Offsets are always taken from the first game, so monthly series do not drift
+    (e.g. Jan 31 -> Feb 29 -> Mar 31).
+
+    :param start: Start of the first game.
+    :param end: End of the first game.
+    :param recurrence_type: daily, weekly, biweekly or monthly.
+    :param until: The last moment an occurrence may start.
+    :return: A list of (start, end) tuples, not including the first game.
+    """
+    occurrences = []
+    idx = 1
+    while True:
+        delta = get_recurrence_delta(recurrence_type, idx)
+        if not delta:
+            break
+        occurrence_start = start + delta
+        if occurrence_start > until:
+            break
+        occurrences.append((occurrence_start, end + delta))
+        idx += 1
+    return occurrences
+
+
+def create_recurring_games(game, participants, recurrence_type, end_date_of_recurrence):
+    """
+    Create all further games of a series and their participants with two bulk inserts in one transaction.
+
+    :param game: The first, already saved game of the series.
+    :param participants: The users taking part in every game.
+    :param recurrence_type: daily, weekly, biweekly or monthly.
+    :param end_date_of_recurrence: The last date on which a game may take place.
+    :return: The list of created games.
+    """
+    until = make_aware(datetime.combine(end_date_of_recurrence, time(23, 59)))
+    occurrences = expand_occurrences(game.start_date_and_time, game.end_date_and_time, recurrence_type, until)
+    if not occurrences:
+        return []
+
+    with transaction.atomic():
+        games = Game.objects.bulk_create([
+            Game(
+                name=game.name,
+                category_id=game.category_id,
+                court_id=game.court_id,
+                creator_id=game.creator_id,
+                start_date_and_time=start,
+                end_date_and_time=end,
+                group_id=game.group_id,
+            )
+            for start, end in occurrences
+        ])
+        Participant.objects.bulk_create([
+            Participant(user=user, game=new_game)
+            for new_game in games
+            for user in participants
+        ])
+        record_changes(
+            (user.pk, new_game.game_id, localdate(new_game.start_date_and_time))
+            for new_game in games
+            for user in participants
+        )
+    return games
+
+
+def update_recurring_games(game, participants):
+    """
+    Move every game of the series to the new schedule of the given game and replace their
+    participants, using one bulk update, one delete and one bulk insert in a single transaction.
+
+    :param game: The updated game, whose start defines the schedule of the series.
+    :param participants: The users taking part in every game.
+    :return: A tuple of the updated games and the dates the games took place on before the update.
+    """
+    games = list(Game.objects.filter(group_id=game.group_id).order_by('start_date_and_time'))
+    previous_days = {localdate(group_game.start_date_and_time) for group_game in games}
+
+    for idx, group_game in enumerate(games):
+        delta = get_recurrence_delta(game.group.recurrence_type, idx)
+        group_game.start_date_and_time = game.start_date_and_time + delta
+        group_game.end_date_and_time = game.end_date_and_time + delta
+        group_game.court_id = game.court_id
+        group_game.name = game.name
+        group_game.updated_at = now()
+
+    with transaction.atomic():
+        Game.objects.bulk_update(
+            games, ['start_date_and_time', 'end_date_and_time', 'court', 'name', 'updated_at'], batch_size=500)
+        # Recorded for the current participants on the old and new days before they are replaced
+        record_game_changes(games)
+        Participant.objects.filter(game__in=games).delete()
+        Participant.objects.bulk_create([
+            Participant(user=user, game=group_game)
+            for group_game in games
+            for user in participants
+        ])
+        record_changes(
+            (user.pk, group_game.game_id, localdate(group_game.start_date_and_time))
+            for group_game in games
+            for user in participants
+        )
+    return games, previous_days
@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingClient:
+    """
+    Shared HTTP client for routing requests (MapBox Directions and Matrix APIs).
+
+    A single requests.Session keeps TLS connections to the provider alive between calls.
+    Every request is bounded by connect/read timeouts, transient failures are retried a limited
+    number of times with jittered exponential backoff, and a circuit breaker stops calling the
+    provider for a while after repeated failures, so the caller can fall back to
+    "travel time unknown" immediately instead of waiting for timeouts.
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=None, backoff_max=None, breaker_threshold=None, breaker_reset_timeout=None):
+        self.pool_size = pool_size if pool_size is not None else settings.ROUTING_POOL_SIZE
+        self.connect_timeout = connect_timeout if connect_timeout is not None else settings.ROUTING_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout if read_timeout is not None else settings.ROUTING_READ_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else settings.ROUTING_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else settings.ROUTING_BACKOFF
+        self.backoff_max = backoff_max if backoff_max is not None else settings.ROUTING_BACKOFF_MAX
+        self.breaker_threshold = breaker_threshold if breaker_threshold is not None else settings.ROUTING_BREAKER_THRESHOLD
+        self.breaker_reset_timeout = breaker_reset_timeout if breaker_reset_timeout is not None else settings.ROUTING_BREAKER_RESET_TIMEOUT
+
+        self._session = None
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def is_open(self):
+        """
+        True while the circuit breaker rejects requests without calling the provider.
+        """
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.breaker_reset_timeout
+
+    def get(self, url, params=None):
+        """
+        Send a GET request to the routing provider.
+
+        :param url: The URL to request.
+        :param params: Query string parameters.
+        :return: The response (which may still carry a 4xx status), or None if the provider could not
+                 be reached, kept failing, or the circuit breaker is open.
+        """
+        if self.is_open:
+            metrics.increment('routing.short_circuited')
+            return None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.increment('routing.retries')
+                time.sleep(self._backoff_delay(attempt))
+
+            metrics.increment('routing.requests')
+            try:
+                response = self.session.get(url, params=params, timeout=(self.connect_timeout, self.read_timeout))
+            except requests.RequestException as e:
+                logger.warning(f"Routing request failed (attempt {attempt + 1}): {e.__class__.__name__}")
+                metrics.increment('routing.errors')
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                logger.warning(f"Routing provider answered {response.status_code} (attempt {attempt + 1})")
+                metrics.increment('routing.errors')
+                continue
+
+            self._record_success()
+            return response
+
+        self._record_failure()
+        return None
+
+    def stats(self):
+        """
+        Return connection pool statistics: connections opened, requests sent and how many
+        of those requests reused an already open connection.
+        """
+        connections = requests_sent = 0
+        if self._session is not None:
+            for adapter in self._session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+                        requests_sent += pool.num_requests
+        return {
+            'connections': connections,
+            'requests': requests_sent,
+            'reused': max(requests_sent - connections, 0),
+            'breaker_open': self.is_open,
+        }
+
+    def reset(self):
+        """
+        Close the circuit breaker and drop the pooled connections.
+        """
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def _record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+
+    def _record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.breaker_threshold:
+                if self._opened_at is None:
+                    metrics.increment('routing.breaker_trips')
+                    logger.warning(
+                        f"Routing circuit breaker opened after {self._consecutive_failures} failed requests")
+                self._opened_at = time.monotonic()
+
+
+routing_client = RoutingClient()
+metrics.register_gauge('routing.pool', routing_client.stats)
@@ -0,0 +1,202 @@
+from collections import defaultdict
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils.timezone import localdate
+from .models import Game, Participant, ScheduleChange
+from .day_events_cache import day_events_cache
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _ChangeBatch:
+    """
+    Changes recorded during one transaction, applied when it commits: the cached days are
+    invalidated, the log is written with a single insert and the users are notified.
+    """
+
+    def __init__(self):
+        self.changes = set()
+        self.written = False
+
+    def days_of(self, game_id):
+        return {day for _, changed_game_id, day in self.changes if changed_game_id == game_id}
+
+    def __call__(self):
+        self.written = True
+        day_events_cache.invalidate((user_id, day) for user_id, _, day in self.changes if day is not None)
+        changes = ScheduleChange.objects.bulk_create([
+            ScheduleChange(user_id=user_id, game_id=game_id)
+            for user_id, game_id in {(user_id, game_id) for user_id, game_id, _ in self.changes}
+        ])
+        publish_changes(changes)
+
+
+def record_changes(changes):
+    """
+    Record that games changed for the given users. Changes made within a transaction are collected
+    and applied once it commits (at once outside a transaction), so neither the log nor the cache
+    can point at data other requests cannot see yet, and changes of a rolled back transaction are dropped.
+
+    :param changes: Iterable of (user_id, game_id, date) triples; the date is the day of the user's
+                    schedule the change is visible on, or None if it is unknown.
+    """
+    changes = set(changes)
+    if not changes:
+        return
+    batch = _current_batch()
+    if batch is None:
+        batch = _ChangeBatch()
+        batch.changes.update(changes)
+        transaction.on_commit(batch, robust=True)
+    else:
+        batch.changes.update(changes)
+
+
+def record_game_changes(games):
+    """
+    Record a change of the given games for all of their current participants, on the day the
+    game takes place and, if it was moved, on the day it took place before.
+
+    :param games: The changed Game instances.
+    """
+    days = {game.game_id: get_game_days(game) for game in games}
+    if days:
+        record_changes(
+            (user_id, game_id, day)
+            for user_id, game_id in Participant.objects.filter(game_id__in=days).values_list('user_id', 'game_id')
+            for day in days[game_id]
+        )
+
+
+def record_participant_changes(participants):
+    """
+    Record a change for every row of a Participant queryset, e.g. all games of a category.
+
+    :param participants: A Participant queryset.
+    """
+    record_changes(
+        (user_id, game_id, localdate(start))
+        for user_id, game_id, start in participants.values_list('user_id', 'game_id', 'game__start_date_and_time')
+    )
+
+
+def get_game_days(game):
+    """
+    Get the days a game is shown on: the current one and the one it was loaded with.
+    """
+    days = {localdate(game.start_date_and_time)}
+    original_start = getattr(game, '_original_start_date_and_time', None)
+    if original_start is not None:
+        days.add(localdate(original_start))
+    return days
+
+
+def get_participant_days(participant):
+    """
+    Get the days a Participant row is shown on, without a query when the game is at hand.
+    """
+    if Participant.game.is_cached(participant):
+        return get_game_days(participant.game)
+    batch = _current_batch()
+    days = batch.days_of(participant.game_id) if batch is not None else set()
+    if not days:
+        start = Game.objects.filter(pk=participant.game_id).values_list('start_date_and_time', flat=True).first()
+        if start is not None:
+            days.add(localdate(start))
+    return days
+
+
+def _current_batch():
+    # The batch lives in the connection's on-commit queue, so it disappears together with the
+    # queue when the transaction (or the savepoint it was created in) is rolled back
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], _ChangeBatch) and not entry[1].written:
+            return entry[1]
+    return None
+
+
+def get_schedule_group(user_id):
+    """
+    Name of the channel layer group joined by the WebSocket connections of the user.
+    """
+    return f'schedule_{user_id}'
+
+
+def publish_changes(changes):
+    """
+    Notify the WebSocket connections of every affected user with one compact message per user,
+    carrying the changed game IDs and the cursor to fetch them with. Publishing is best effort:
+    a client that misses a message catches up with its next request.
+
+    :param changes: Saved ScheduleChange rows.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    changes_by_user = defaultdict(list)
+    for change in changes:
+        changes_by_user[change.user_id].append(change)
+
+    for user_id, user_changes in changes_by_user.items():
+        message = {
+            'type': 'schedule.changed',
+            'game_ids': sorted({change.game_id for change in user_changes}),
+            'cursor': max((change.change_id or 0) for change in user_changes),
+        }
+        try:
+            async_to_sync(channel_layer.group_send)(get_schedule_group(user_id), message)
+            metrics.increment('schedule_changes.published')
+        except Exception:
+            logger.exception(f"Failed to publish schedule changes of user {user_id}")
+            metrics.increment('schedule_changes.publish_errors')
+
+
+def get_latest_change(user_id):
+    """
+    Get the newest change of the user's schedule, used as the version of all of the user's events.
+
+    :param user_id: The ID of the user.
+    :return: A tuple (change_id, changed_at), or (0, None) if nothing was recorded yet.
+    """
+    latest = (
+        ScheduleChange.objects.filter(user_id=user_id)
+        .order_by('-change_id')
+        .values_list('change_id', 'changed_at')
+        .first()
+    )
+    return latest or (0, None)
+
+
+def get_changed_game_ids(user_id, since):
+    """
+    Get the games that changed for the user after the given cursor.
+
+    :param user_id: The ID of the user.
+    :param since: A change_id previously returned as the cursor.
+    :return: A set of game IDs, or None if changes after the cursor may already have been pruned.
+    """
+    oldest = ScheduleChange.objects.order_by('change_id').values_list('change_id', flat=True).first()
+    if oldest is not None and since < oldest - 1:
+        return None
+    return set(
+        ScheduleChange.objects.filter(user_id=user_id, change_id__gt=since).values_list('game_id', flat=True)
+    )
+
+
+def prune_changes(older_than):
+    """
+    Delete changes recorded before the given moment.
+
+    :param older_than: Aware datetime; older changes are deleted.
+    :return: The number of deleted changes.
+    """
+    deleted, _ = ScheduleChange.objects.filter(changed_at__lt=older_than).delete()
+    logger.info(f"Pruned {deleted} schedule changes older than {older_than}")
+    return deleted
@@ -1,7 +1,39 @@
-from django.db.models.signals import post_migrate, pre_save
+from django.db.models.signals import post_migrate, pre_save, post_save, post_delete, pre_delete, post_init
+from django.conf import settings
 from django.dispatch import receiver
-from .models import Role, Court
-from geopy.geocoders import Nominatim
+from .models import Role, Court, Game, Participant, Category, CustomUser
+from .travel_time_cache import travel_time_cache
+from .user_cache import user_cache
+from .participant_search import participant_search
+from .schedule_changes import (record_changes, record_game_changes, record_participant_changes,
+                               get_participant_days)
+from .geocoding import remember_location, address_changed, location_changed, format_address, geocode, get_cached_location
+from .tasks import enqueue_geocoding
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def forget_default_role(sender, **kwargs):
+    Role._default_role_id = None
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Covers password changes and profile picture uploads, which save the user
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_participant_search(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only save last_login, which the search does not show
+    if created or update_fields is None or {'username', 'email'} & set(update_fields):
+        participant_search.invalidate()
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_participant_search_on_delete(sender, instance, **kwargs):
+    participant_search.invalidate()
+
 
 @receiver(post_migrate)
 def insert_initial_data(sender, **kwargs):
@@ -11,25 +43,85 @@ def insert_initial_data(sender, **kwargs):
             Role.objects.get_or_create(role_name=role_name)
 
 
+@receiver(post_init, sender=Court)
+def remember_court_location(sender, instance, **kwargs):
+    remember_location(instance)
+
+
 @receiver(pre_save, sender=Court)
 def set_lat_lon(sender, instance, **kwargs):
-    geolocator = Nominatim(user_agent="Tennis")
-
-    if instance.pk:
-        old_instance = Court.objects.get(pk=instance.pk)
-        address_fields = ['building_number', 'street', 'city', 'postal_code', 'country']
-        if any(getattr(old_instance, field) != getattr(instance, field) for field in address_fields):
-            address = f"{instance.building_number} {instance.street}, {instance.city}, {instance.postal_code}, {instance.country}"
-            location = geolocator.geocode(address)
-            if location:
-                instance.latitude = location.latitude
-                instance.longitude = location.longitude
-
-    if not instance.latitude or not instance.longitude:
-        address = f"{instance.building_number} {instance.street}, {instance.city}, {instance.postal_code}, {instance.country}"
-        location = geolocator.geocode(address)
-        if location:
-            instance.latitude = location.latitude
-            instance.longitude = location.longitude
-        else:
-            print(f"Error: Geolocation not found for address: {address}")
\ No newline at end of file
+    if instance.latitude is not None and instance.longitude is not None and not address_changed(instance):
+        return
+
+    address = format_address(instance)
+    if settings.GEOCODING_ASYNC:
+        # Only a cached address is applied during the save, anything else is geocoded by a background job
+        found, location = get_cached_location(address)
+        if not found:
+            instance._geocoding_pending = True
+            return
+    else:
+        location = geocode(address)
+
+    if location:
+        instance.latitude, instance.longitude = location
+
+
+@receiver(post_save, sender=Court)
+def invalidate_court_travel_times(sender, instance, created, **kwargs):
+    # Renaming a court keeps its travel times
+    if not created and location_changed(instance):
+        travel_time_cache.invalidate_court(instance.pk)
+    remember_location(instance)
+    if getattr(instance, '_geocoding_pending', False):
+        # Queued in the same transaction, so the job only becomes visible with the saved address
+        instance._geocoding_pending = False
+        enqueue_geocoding(instance.pk)
+
+
+@receiver(post_init, sender=Game)
+def remember_game_start(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred field is not loaded just for this
+    instance._original_start_date_and_time = instance.__dict__.get('start_date_and_time')
+
+
+@receiver(post_save, sender=Game)
+def record_game_change(sender, instance, created, **kwargs):
+    # A new game has no participants yet; they are recorded when they are added
+    if not created:
+        record_game_changes([instance])
+    instance._original_start_date_and_time = instance.start_date_and_time
+
+
+@receiver(pre_delete, sender=Game)
+def record_game_removal(sender, instance, **kwargs):
+    # Recorded before the participants are deleted with the game, so their days are known
+    record_game_changes([instance])
+
+
+@receiver(post_save, sender=Participant)
+@receiver(post_delete, sender=Participant)
+def record_participant_change(sender, instance, **kwargs):
+    days = get_participant_days(instance) or {None}
+    record_changes((instance.user_id, instance.game_id, day) for day in days)
+
+
+@receiver(post_save, sender=Category)
+def record_category_change(sender, instance, created, **kwargs):
+    if not created:
+        record_participant_changes(Participant.objects.filter(game__category=instance))
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_profile_picture(sender, instance, **kwargs):
+    instance._original_profile_picture = instance.__dict__.get('profile_picture')
+
+
+@receiver(post_save, sender=CustomUser)
+def record_profile_picture_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'profile_picture' not in update_fields):
+        return
+    if instance.profile_picture != instance._original_profile_picture:
+        # The picture is shown on every game the user created
+        record_participant_changes(Participant.objects.filter(game__creator=instance))
+        instance._original_profile_picture = instance.profile_picture
@@ -0,0 +1,65 @@
+import gzip
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage that stores content-hashed copies of the files (e.g. events.1a2b3c4d5e6f.js)
+    and writes precompressed .gz siblings of the text assets at collectstatic time, plus .br siblings
+    when the optional brotli package is installed. Web servers serve the siblings as they are
+    (nginx gzip_static) and can cache the hashed names forever, as their content never changes.
+    """
+
+    compressible_extensions = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico')
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        compressed = 0
+        for name in set(self.hashed_files.values()):
+            if name.endswith(self.compressible_extensions):
+                compressed += self.compress(name)
+        logger.info(f"Precompressed {compressed} static file(s)")
+
+    def compress(self, name):
+        """
+        Write the compressed siblings of a stored file. Siblings that would not be noticeably
+        smaller than the file are skipped, the server then sends the file itself.
+
+        :param name: The stored (hashed) name of the file.
+        :return: The number of siblings written.
+        """
+        with self.open(name) as source:
+            content = source.read()
+        encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+        written = 0
+        for suffix, encode in encoders:
+            compressed = encode(content)
+            if len(compressed) >= len(content) * settings.STATIC_COMPRESSION_MIN_RATIO:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            written += 1
+        return written
+
+    def stored_name(self, name):
+        # Before collectstatic has written a manifest (tests, a fresh checkout) the plain names are used;
+        # once it exists, a missing entry is an error as usual
+        if not self.hashed_files and not self.manifest_storage.exists(self.manifest_name):
+            return name
+        return super().stored_name(name)
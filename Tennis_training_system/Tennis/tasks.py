@@ -0,0 +1,151 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from .models import BackgroundJob
+from .conflicts import recompute_user_day
+from .geocoding import update_court_location
+from .profile_pictures import process_profile_picture
+import logging
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def task(kind):
+    """
+    Register the decorated function as the handler for background jobs of the given kind.
+    The job payload is passed to the handler as keyword arguments.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, dedupe_key, payload=None):
+    """
+    Add a job to the queue unless an identical job (same kind and dedupe key) is already waiting.
+    A job that is already running does not count, as it may have read its data before the change.
+
+    :param kind: The registered job kind.
+    :param dedupe_key: Jobs with the same kind and key are merged into one.
+    :param payload: JSON-serialisable keyword arguments for the handler.
+    :return: True if a new job was queued, False if it was merged into a waiting one.
+    """
+    _, created = BackgroundJob.objects.get_or_create(
+        kind=kind,
+        dedupe_key=dedupe_key,
+        claimed_at__isnull=True,
+        defaults={'payload': payload or {}},
+    )
+    return created
+
+
+def run_pending_jobs(limit=100):
+    """
+    Claim and run up to `limit` jobs whose run_after time has passed.
+    Claimed jobs are leased for BACKGROUND_JOBS_LEASE seconds and removed only once their handler
+    succeeded, so the jobs of a worker that died are claimed again when the lease runs out. The same
+    work requested while a job is running is queued as a new job instead of being lost. Failed jobs
+    are retried with exponential backoff until BACKGROUND_JOBS_MAX_ATTEMPTS is reached.
+
+    :param limit: The maximum number of jobs to run.
+    :return: The number of jobs that were run.
+    """
+    claimed_at = now()
+    with transaction.atomic():
+        jobs = list(
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(run_after__lte=claimed_at)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=claimed_at))
+            .order_by('run_after', 'job_id')[:limit]
+        )
+        BackgroundJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            claimed_at=claimed_at,
+            locked_until=claimed_at + timedelta(seconds=settings.BACKGROUND_JOBS_LEASE),
+        )
+
+    for job in jobs:
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            logger.error(f"No handler registered for background job kind '{job.kind}'")
+            job.delete()
+            continue
+        try:
+            handler(**job.payload)
+        except Exception as e:
+            logger.exception(f"Background job {job} failed")
+            _retry(job, e)
+        else:
+            job.delete()
+
+    return len(jobs)
+
+
+def _retry(job, error):
+    attempts = job.attempts + 1
+    if attempts >= settings.BACKGROUND_JOBS_MAX_ATTEMPTS:
+        logger.error(f"Giving up on background job {job} after {attempts} attempts")
+        job.delete()
+        return
+    try:
+        with transaction.atomic():
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                attempts=attempts,
+                last_error=str(error),
+                run_after=now() + timedelta(seconds=2 ** attempts),
+                claimed_at=None,
+                locked_until=None,
+            )
+    except IntegrityError:
+        # The same work was queued again while the job ran; the waiting job does it
+        job.delete()
+
+
+@task('conflicts')
+def check_conflicts(user_id, day):
+    recompute_user_day(user_id, date.fromisoformat(day))
+
+
+def enqueue_conflict_checks(user_ids, days):
+    """
+    Queue a conflict recalculation for every combination of user and day.
+    Requests for the same user and day are deduplicated.
+
+    :param user_ids: IDs of the users whose schedules changed.
+    :param days: The dates on which their schedules changed.
+    """
+    for day in set(days):
+        for user_id in set(user_ids):
+            enqueue('conflicts', f"{user_id}:{day.isoformat()}", {'user_id': user_id, 'day': day.isoformat()})
+
+
+@task('geocode_court')
+def geocode_court(court_id):
+    update_court_location(court_id)
+
+
+def enqueue_geocoding(court_id):
+    """
+    Queue geocoding of a court's current address. Requests for the same court are deduplicated.
+
+    :param court_id: The ID of the court whose address changed.
+    """
+    enqueue('geocode_court', str(court_id), {'court_id': court_id})
+
+
+@task('profile_picture')
+def create_profile_picture_variants(user_id):
+    process_profile_picture(user_id)
+
+
+def enqueue_profile_picture(user_id):
+    """
+    Queue creation of the resized variants of a user's profile picture.
+
+    :param user_id: The ID of the user who uploaded a new picture.
+    """
+    enqueue('profile_picture', str(user_id), {'user_id': user_id})
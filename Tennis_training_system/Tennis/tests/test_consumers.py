@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, override_settings
+import logging
+from Tennis.checks import check_shared_backends
+from Tennis.consumers import ScheduleConsumer
+from Tennis.models import ScheduleChange
+from Tennis.schedule_changes import publish_changes
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class ScheduleConsumerTestCase(SimpleTestCase):
+
+    def _communicator(self, user):
+        communicator = WebsocketCommunicator(ScheduleConsumer.as_asgi(), '/ws/schedule/')
+        communicator.scope['user'] = user
+        return communicator
+
+    async def test_anonymous_user_is_rejected(self):
+        connected, _ = await self._communicator(AnonymousUser()).connect()
+        self.assertFalse(connected)
+
+    async def test_changes_are_pushed_to_the_users_group(self):
+        player = SimpleNamespace(user_id=7, is_authenticated=True)
+        other = SimpleNamespace(user_id=8, is_authenticated=True)
+        communicator = self._communicator(player)
+        other_communicator = self._communicator(other)
+        self.assertTrue((await communicator.connect())[0])
+        self.assertTrue((await other_communicator.connect())[0])
+
+        await sync_to_async(publish_changes)([
+            ScheduleChange(change_id=11, user_id=7, game_id=3),
+            ScheduleChange(change_id=12, user_id=7, game_id=2),
+        ])
+
+        message = await communicator.receive_json_from()
+        logger.debug(f"Wiadomość z gniazda: {message}")
+        self.assertEqual(message, {'type': 'schedule.changed', 'game_ids': [2, 3], 'cursor': 12})
+        self.assertTrue(await other_communicator.receive_nothing())
+
+        await communicator.disconnect()
+        await other_communicator.disconnect()
+
+
+class SharedBackendsCheckTestCase(SimpleTestCase):
+
+    @override_settings(CONFLICT_CHECKS_ASYNC=True, GEOCODING_ASYNC=False, PROFILE_PICTURES_ASYNC=False,
+                       CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_worker_with_process_local_backends_is_reported(self):
+        warnings = check_shared_backends(None)
+        logger.debug(f"Ostrzeżenia: {warnings}")
+        self.assertEqual([warning.id for warning in warnings], ['Tennis.W001', 'Tennis.W002'])
+
+        with override_settings(CONFLICT_CHECKS_ASYNC=False):
+            self.assertEqual(check_shared_backends(None), [])
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+import logging
+from Tennis import geocoding
+from Tennis.models import BackgroundJob, Court, GeocodeCache
+
+logger = logging.getLogger('Tennis.tests')
+
+CSV_ROWS = """name,building_number,street,city,postal_code,country,latitude,longitude
+Centre,1,Marszałkowska,Warszawa,00-001,Poland,,
+Old town,2,Floriańska,Kraków,31-019,Poland,,
+Centre,1, marszałkowska ,WARSZAWA,00-001,Poland,,
+Lake,3,Nad Jeziorem,Giżycko,11-500,Poland,54.0381,21.7640
+Broken,,Street,City,00-000,Poland,,
+Nowhere,9,Unknown,Nowhere,00-000,Poland,,
+"""
+
+
+class ImportCourtsTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        gazetteer_path = self._write('gazetteer.json', json.dumps({
+            '1 Marszałkowska, Warszawa, 00-001, Poland': [52.2297, 21.0122],
+            '2 Floriańska, Kraków, 31-019, Poland': [50.0647, 19.9450],
+        }))
+        settings_override = override_settings(GEOCODING_PROVIDER='gazetteer', GEOCODING_GAZETTEER_PATH=gazetteer_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        geocoding._provider = None
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output_file:
+            output_file.write(content)
+        return path
+
+    def _import(self, path, *args):
+        output = StringIO()
+        call_command('import_courts', path, *args, stdout=output)
+        logger.debug(f"Wynik importu: {output.getvalue()}")
+        return output.getvalue()
+
+    def test_csv_is_deduplicated_geocoded_and_imported_in_batches(self):
+        Court.objects.create(
+            name='Old town', building_number='2', street='Floriańska', city='Kraków', postal_code='31-019',
+            country='Poland', latitude=50.0647, longitude=19.9450)
+        path = self._write('courts.csv', CSV_ROWS)
+
+        with patch.object(geocoding.GazetteerProvider, 'geocode', wraps=geocoding.get_provider().geocode) as mock_geocode:
+            output = self._import(path, '--batch-size', '2')
+
+        self.assertIn('3 created, 2 duplicates, 1 invalid', output)
+        self.assertEqual(mock_geocode.call_count, 2)  # the Lake court came with coordinates
+        centre = Court.objects.get(name='Centre')
+        self.assertEqual(float(centre.latitude), 52.2297)
+        nowhere = Court.objects.get(name='Nowhere')
+        self.assertIsNone(nowhere.latitude)
+        self.assertIn('1 queued for geocoding', output)
+        self.assertEqual(list(BackgroundJob.objects.filter(kind='geocode_court').values_list('dedupe_key', flat=True)),
+                         [str(nowhere.pk)])
+        self.assertEqual(GeocodeCache.objects.count(), 2)
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+        # Running the same file again creates nothing
+        self.assertIn('0 created, 5 duplicates', self._import(path))
+
+    def test_json_import_resumes_after_the_last_committed_batch(self):
+        rows = [
+            {'name': f'Court {i}', 'building_number': str(i), 'street': 'Marszałkowska', 'city': 'Warszawa',
+             'postal_code': '00-001', 'country': 'Poland', 'latitude': 52.2297, 'longitude': 21.0122}
+            for i in range(5)
+        ]
+        path = self._write('courts.json', json.dumps(rows, indent=2))
+        self._write('courts.json.progress', json.dumps({'input': os.path.abspath(path), 'processed': 3}))
+
+        output = self._import(path)
+        self.assertIn('Resuming after row 3', output)
+        self.assertEqual(list(Court.objects.order_by('name').values_list('name', flat=True)), ['Court 3', 'Court 4'])
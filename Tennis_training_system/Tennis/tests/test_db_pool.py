@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+import logging
+from Tennis.db_pool import ConnectionPool, PoolTimeout
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def _connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def test_connections_are_reused_and_overflow_is_closed(self):
+        pool = ConnectionPool(self._connect, size=2, max_overflow=1, timeout=0.05)
+        connections = [pool.acquire() for _ in range(3)]
+        logger.debug(f"Stan puli: {pool.stats()}")
+        self.assertEqual(pool.stats()['in_use'], 3)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        for connection in connections:
+            pool.release(connection)
+        self.assertEqual(pool.stats()['idle'], 2)
+        self.assertEqual(sum(connection.closed for connection in connections), 1)
+
+        self.assertIn(pool.acquire(), connections)
+        self.assertEqual(len(self.opened), 3)
+
+    def test_broken_connections_are_replaced(self):
+        pool = ConnectionPool(self._connect, size=1, reset=lambda connection: False)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertTrue(first.closed)
+
+        pool = ConnectionPool(self._connect, size=1, check=lambda connection: False)
+        second = pool.acquire()
+        pool.release(second)
+        third = pool.acquire()
+        self.assertIsNot(third, second)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['max_in_use'], 1)
@@ -0,0 +1,88 @@
+import json
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+import logging
+from Tennis import geocoding, tasks
+from Tennis.models import BackgroundJob, Court, GeocodeCache
+
+logger = logging.getLogger('Tennis.tests')
+
+GAZETTEER = {
+    '1 Marszałkowska, Warszawa, 00-001, Poland': [52.2297, 21.0122],
+    '2 Floriańska, Kraków, 31-019, Poland': [50.0647, 19.9450],
+}
+
+
+class GeocodingTestCase(TestCase):
+
+    def setUp(self):
+        gazetteer_file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8')
+        json.dump(GAZETTEER, gazetteer_file)
+        gazetteer_file.close()
+        settings_override = override_settings(
+            GEOCODING_PROVIDER='gazetteer', GEOCODING_GAZETTEER_PATH=gazetteer_file.name, GEOCODING_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        geocoding._provider = None
+
+    def _new_court(self, **address):
+        # Built field by field like CourtForm does
+        court = Court()
+        court.name = 'Centre'
+        for field, value in {'building_number': '1', 'street': 'Marszałkowska', 'city': 'Warszawa',
+                             'postal_code': '00-001', 'country': 'Poland', **address}.items():
+            setattr(court, field, value)
+        return court
+
+    def test_address_is_geocoded_once_and_unchanged_saves_skip_it(self):
+        with patch.object(geocoding.GazetteerProvider, 'geocode', wraps=geocoding.get_provider().geocode) as mock_geocode:
+            court = self._new_court()
+            court.save()
+            other = self._new_court(street='  MARSZAŁKOWSKA ', city='warszawa')
+            other.save()
+
+            court = Court.objects.get(pk=court.pk)
+            court.name = 'Centre court'
+            with self.assertNumQueries(1):  # the UPDATE only
+                court.save()
+
+        logger.debug(f"Współrzędne kortów: {court.latitude}, {court.longitude} / {other.latitude}, {other.longitude}")
+        self.assertEqual(mock_geocode.call_count, 1)
+        self.assertEqual((court.latitude, court.longitude), (Decimal('52.229700'), Decimal('21.012200')))
+        self.assertEqual((float(other.latitude), float(other.longitude)), (52.2297, 21.0122))
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+        court.building_number, court.street, court.city, court.postal_code = '2', 'Floriańska', 'Kraków', '31-019'
+        court.save()
+        self.assertEqual((float(court.latitude), float(court.longitude)), (50.0647, 19.9450))
+
+    def test_unknown_address_is_remembered_as_not_found(self):
+        with patch.object(geocoding.GazetteerProvider, 'geocode', return_value=None) as mock_geocode:
+            self._new_court(street='Nowhere').save()
+            court = self._new_court(street='Nowhere')
+            court.save()
+
+        self.assertEqual(mock_geocode.call_count, 1)
+        self.assertIsNone(court.latitude)
+
+    @override_settings(GEOCODING_ASYNC=True)
+    def test_async_save_leaves_geocoding_to_a_background_job(self):
+        with patch.object(geocoding.GazetteerProvider, 'geocode') as mock_geocode:
+            court = self._new_court()
+            court.save()
+        mock_geocode.assert_not_called()
+        self.assertIsNone(court.latitude)
+        self.assertEqual(list(BackgroundJob.objects.values_list('kind', 'dedupe_key')),
+                         [('geocode_court', str(court.pk))])
+
+        tasks.run_pending_jobs()
+        court.refresh_from_db()
+        self.assertEqual((court.latitude, court.longitude), (Decimal('52.229700'), Decimal('21.012200')))
+
+        # A cached address is applied during the save itself
+        cached = self._new_court()
+        cached.save()
+        self.assertEqual(cached.latitude, Decimal('52.229700'))
+        self.assertFalse(BackgroundJob.objects.exists())
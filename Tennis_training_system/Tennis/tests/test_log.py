@@ -0,0 +1,49 @@
+import io
+import json
+from django.test import SimpleTestCase
+import logging
+from Tennis.log import SAMPLED, BackgroundHandler, SamplingFilter, StructuredFormatter
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class BackgroundHandlerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = BackgroundHandler(target=logging.StreamHandler(self.stream))
+        self.addCleanup(self.handler.close)
+        self.handler.setFormatter(StructuredFormatter())
+        self.handler.addFilter(SamplingFilter(every=10))
+        self.log = logging.getLogger('Tennis.tests.background')
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(self.handler)
+        self.addCleanup(self.log.removeHandler, self.handler)
+
+    def _written(self):
+        self.handler.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_written_as_json_by_the_writer_thread(self):
+        players = ['Ola']
+        self.log.info("Players: %s", players, extra={'game_id': 7})
+        players.append('Piotr')  # changed after the call, must not affect the message
+        self.log.debug("Not written")
+
+        records = self._written()
+        logger.debug(f"Zapisane rekordy: {records}")
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['message'], "Players: ['Ola']")
+        self.assertEqual(records[0]['game_id'], 7)
+        self.assertEqual(records[0]['level'], 'INFO')
+
+    def test_loop_messages_are_sampled_per_call_site(self):
+        for i in range(25):
+            self.log.warning(f"Item {i} skipped", extra=SAMPLED)
+        self.log.warning("Done")
+
+        records = self._written()
+        self.assertEqual([record['message'] for record in records], ['Item 0 skipped', 'Item 10 skipped', 'Item 20 skipped', 'Done'])
+        self.assertEqual(records[0]['sample_rate'], 10)
+        self.assertNotIn('sample_rate', records[-1])
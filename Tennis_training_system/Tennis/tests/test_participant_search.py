@@ -0,0 +1,51 @@
+from datetime import datetime
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+import logging
+from Tennis.models import Category, Court, CustomUser, Game, Participant
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class ParticipantSearchTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = CustomUser.objects.create(email='me@example.com', username='me')
+            self.users = {
+                name: CustomUser.objects.create(email=f'{name}@example.com', username=name)
+                for name in ['paula', 'pawel', 'piotr', 'zofia']
+            }
+            game = Game.objects.create(
+                name='Match', category=Category.objects.create(name='Match', color='#ff0000'),
+                court=Court.objects.create(
+                    name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+                    country='Poland', latitude=52.2297, longitude=21.0122),
+                creator=self.user, start_date_and_time=make_aware(datetime(2024, 9, 2, 10)),
+                end_date_and_time=make_aware(datetime(2024, 9, 2, 11)))
+            Participant.objects.create(user=self.user, game=game)
+            Participant.objects.create(user=self.users['pawel'], game=game)
+        self.client.force_login(self.user)
+
+    def _search(self, term):
+        response = self.client.get(reverse('participant_search'), {'term': term})
+        return [result['text'] for result in response.json()['results']]
+
+    def test_co_players_first_and_longer_prefixes_served_from_cache(self):
+        self.assertEqual(self._search('Pa'), ['pawel@example.com', 'paula@example.com'])
+
+        with self.assertNumQueries(0):
+            results = self._search('paw')
+        logger.debug(f"Wyniki dla dłuższego prefiksu: {results}")
+        self.assertEqual(results, ['pawel@example.com'])
+        self.assertEqual(self._search('zofia@'), ['zofia@example.com'])
+        self.assertEqual(self._search('p'), [])
+
+    def test_new_users_are_found_by_the_next_search(self):
+        self.assertEqual(self._search('pi'), ['piotr@example.com'])
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create(email='pia@example.com', username='pia')
+        self.assertEqual(self._search('pi'), ['pia@example.com', 'piotr@example.com'])
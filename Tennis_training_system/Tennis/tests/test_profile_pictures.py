@@ -0,0 +1,74 @@
+import tempfile
+from datetime import datetime
+from io import BytesIO
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import make_aware
+import logging
+from Tennis import tasks
+from Tennis.models import BackgroundJob, Category, Court, CustomUser, Game, Participant
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class ProfilePictureTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, PROFILE_PICTURES_ASYNC=True, PROFILE_PICTURE_SIZES={'small': 60, 'medium': 200})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        with self.captureOnCommitCallbacks(execute=True):
+            game = Game.objects.create(
+                name='Match', category=Category.objects.create(name='Match', color='#ff0000'), court=court,
+                creator=self.user, start_date_and_time=make_aware(datetime(2024, 9, 2, 10)),
+                end_date_and_time=make_aware(datetime(2024, 9, 2, 11)))
+            Participant.objects.create(user=self.user, game=game)
+        self.client.force_login(self.user)
+
+    def _upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 900), '#3366aa').save(buffer, 'JPEG')
+        upload = SimpleUploadedFile('holiday photo.JPG', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('users_profile'), {'profile_picture': upload})
+        self.user.refresh_from_db()
+
+    def _event_picture_url(self):
+        response = self.client.get(reverse('day'), {'date': '2024-09-02'}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        return response.json()['events'][0]['profile_picture_url']
+
+    def test_upload_is_resized_off_the_request_into_content_addressed_variants(self):
+        self._upload()
+        logger.debug(f"Zapisany oryginał: {self.user.profile_picture}")
+        self.assertRegex(self.user.profile_picture, r'^profile_pictures/originals/[0-9a-f]{32}\.jpg$')
+        self.assertEqual(self.user.profile_picture_variants, {})
+        self.assertTrue(BackgroundJob.objects.filter(kind='profile_picture').exists())
+        self.assertTrue(self._event_picture_url().endswith(self.user.profile_picture))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.run_pending_jobs()
+        self.user.refresh_from_db()
+        variants = self.user.profile_picture_variants
+        logger.debug(f"Warianty zdjęcia: {variants}")
+        for name, size in [('small', 60), ('medium', 200)]:
+            self.assertRegex(variants[name], r'^profile_pictures/variants/[0-9a-f]{32}\.webp$')
+            with default_storage.open(variants[name]) as variant_file:
+                image = Image.open(variant_file)
+                self.assertEqual((image.format, image.size), ('WEBP', (size, size)))
+
+        # The cached day is invalidated and the tiles switch to the small variant
+        self.assertTrue(self._event_picture_url().endswith(variants['small']))
+        self.assertTrue(self.user.profile_picture_url.endswith(variants['medium']))
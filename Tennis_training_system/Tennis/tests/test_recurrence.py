@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware
+import logging
+from Tennis.conflicts import recompute_conflicts
+from Tennis.models import Category, Court, CustomUser, Game, Participant, RecurringGroup
+from Tennis.recurrence import create_recurring_games, expand_occurrences
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class RecurrenceTestCase(TestCase):
+
+    def setUp(self):
+        self.start = make_aware(datetime(2024, 1, 31, 10, 0))
+        self.end = make_aware(datetime(2024, 1, 31, 11, 30))
+
+    def test_expand_occurrences(self):
+        until = make_aware(datetime(2024, 2, 14, 23, 59))
+
+        daily = expand_occurrences(self.start, self.end, 'daily', until)
+        weekly = expand_occurrences(self.start, self.end, 'weekly', until)
+        biweekly = expand_occurrences(self.start, self.end, 'biweekly', until)
+        logger.debug(f"Liczba wystąpień: dziennie {len(daily)}, tygodniowo {len(weekly)}, co dwa tygodnie {len(biweekly)}")
+        self.assertEqual(len(daily), 14)
+        self.assertEqual(daily[0], (self.start + timedelta(days=1), self.end + timedelta(days=1)))
+        self.assertEqual([start.day for start, _ in weekly], [7, 14])
+        self.assertEqual([start.day for start, _ in biweekly], [14])
+        self.assertEqual(expand_occurrences(self.start, self.end, None, until), [])
+
+    def test_monthly_occurrences_do_not_drift(self):
+        until = make_aware(datetime(2024, 4, 30, 23, 59))
+
+        monthly = expand_occurrences(self.start, self.end, 'monthly', until)
+        self.assertEqual([start.date() for start, _ in monthly], [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+
+    @patch('Tennis.conflicts.prefetch_travel_times')
+    def test_year_long_series_uses_bulk_queries(self, mock_prefetch):
+        users = [CustomUser.objects.create(email=f'player{i}@example.com', username=f'player{i}') for i in range(4)]
+        court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        category = Category.objects.create(name='Training', color='#00ff00')
+        group = RecurringGroup.objects.create(recurrence_type='daily', start_date=self.start, end_date=self.start)
+        game = Game.objects.create(
+            category=category, court=court, creator=users[0], group=group,
+            start_date_and_time=self.start, end_date_and_time=self.end)
+
+        with CaptureQueriesContext(connection) as queries:
+            games = create_recurring_games(game, users, 'daily', date(2025, 1, 29))
+        logger.debug(f"Liczba zapytań przy tworzeniu serii na rok: {len(queries)}")
+        self.assertEqual(len(games), 364)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(Participant.objects.count(), 364 * 4)
+
+        with self.assertNumQueries(1):
+            alerts = recompute_conflicts([user.user_id for user in users], {g.start_date_and_time.date() for g in games})
+        self.assertEqual(alerts, [])
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import logging
+import requests
+from Tennis import metrics
+from Tennis.routing_client import RoutingClient
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class RoutingClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset('routing.')
+        self.client = RoutingClient(
+            pool_size=2, connect_timeout=1, read_timeout=2, max_retries=2,
+            backoff=0, backoff_max=0, breaker_threshold=2, breaker_reset_timeout=60,
+        )
+        self.session = MagicMock()
+        self.client._session = self.session
+
+    def test_success_uses_timeouts(self):
+        response = MagicMock(status_code=200)
+        self.session.get.return_value = response
+
+        self.assertIs(self.client.get('https://example.com', params={'a': 1}), response)
+        self.session.get.assert_called_once_with('https://example.com', params={'a': 1}, timeout=(1, 2))
+        self.assertEqual(metrics.get('routing.retries'), 0)
+
+    def test_retries_transient_errors(self):
+        ok = MagicMock(status_code=200)
+        self.session.get.side_effect = [requests.ConnectionError(), MagicMock(status_code=503), ok]
+
+        self.assertIs(self.client.get('https://example.com'), ok)
+        logger.debug(f"Liczniki po ponownych próbach: {metrics.snapshot('routing.')}")
+        self.assertEqual(self.session.get.call_count, 3)
+        self.assertEqual(metrics.get('routing.retries'), 2)
+        self.assertEqual(metrics.get('routing.errors'), 2)
+
+    def test_client_errors_are_not_retried(self):
+        self.session.get.return_value = MagicMock(status_code=422)
+
+        self.assertEqual(self.client.get('https://example.com').status_code, 422)
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_circuit_breaker_fails_fast(self):
+        self.session.get.side_effect = requests.Timeout()
+
+        self.assertIsNone(self.client.get('https://example.com'))
+        self.assertFalse(self.client.is_open)
+        self.assertIsNone(self.client.get('https://example.com'))
+        self.assertTrue(self.client.is_open)
+        self.assertEqual(metrics.get('routing.breaker_trips'), 1)
+
+        calls = self.session.get.call_count
+        self.assertIsNone(self.client.get('https://example.com'))
+        self.assertEqual(self.session.get.call_count, calls)
+        self.assertEqual(metrics.get('routing.short_circuited'), 1)
+
+    @patch('Tennis.routing_client.time.monotonic')
+    def test_circuit_breaker_closes_after_reset_timeout(self, mock_monotonic):
+        mock_monotonic.return_value = 1000
+        self.session.get.side_effect = requests.Timeout()
+        self.client.get('https://example.com')
+        self.client.get('https://example.com')
+        self.assertTrue(self.client.is_open)
+
+        mock_monotonic.return_value = 1061
+        ok = MagicMock(status_code=200)
+        self.session.get.side_effect = None
+        self.session.get.return_value = ok
+        self.assertIs(self.client.get('https://example.com'), ok)
+        self.assertFalse(self.client.is_open)
+
+    def test_zero_reset_timeout_keeps_the_breaker_closed(self):
+        client = RoutingClient(max_retries=0, breaker_threshold=1, breaker_reset_timeout=0)
+        client._session = self.session
+        self.session.get.side_effect = requests.Timeout()
+
+        self.assertIsNone(client.get('https://example.com'))
+        self.assertEqual(client.breaker_reset_timeout, 0)
+        self.assertFalse(client.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import io
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils.timezone import make_aware, now
+import logging
+from Tennis import tasks
+from Tennis.models import BackgroundJob, Category, Court, CustomUser, Game, Participant
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class BackgroundJobsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        self.category = Category.objects.create(name='Match', color='#ff0000')
+        self.court_a = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.court_b = Court.objects.create(
+            name='B', building_number='2', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2400, longitude=21.0300)
+
+    def _create_game(self, court, start_hour, end_hour):
+        game = Game.objects.create(
+            category=self.category, court=court, creator=self.user,
+            start_date_and_time=make_aware(datetime(2024, 9, 2, start_hour)),
+            end_date_and_time=make_aware(datetime(2024, 9, 2, end_hour)))
+        Participant.objects.create(user=self.user, game=game)
+        return game
+
+    def test_conflict_jobs_are_deduplicated_per_user_and_day(self):
+        tasks.enqueue_conflict_checks([self.user.user_id], [date(2024, 9, 2)])
+        tasks.enqueue_conflict_checks([self.user.user_id, self.user.user_id], [date(2024, 9, 2), date(2024, 9, 3)])
+
+        keys = sorted(BackgroundJob.objects.values_list('dedupe_key', flat=True))
+        logger.debug(f"Zadania w kolejce: {keys}")
+        self.assertEqual(keys, [f'{self.user.user_id}:2024-09-02', f'{self.user.user_id}:2024-09-03'])
+
+    @override_settings(TRAVEL_TIME_PREFILTER_ENABLED=False)
+    @patch('Tennis.conflicts.prefetch_travel_times')
+    @patch('Tennis.utils.get_travel_time', return_value=90)
+    def test_worker_fills_in_participant_fields(self, mock_travel_time, mock_prefetch):
+        first_game = self._create_game(self.court_a, 10, 11)
+        second_game = self._create_game(self.court_b, 12, 13)
+        tasks.enqueue_conflict_checks([self.user.user_id], [date(2024, 9, 2)])
+
+        self.assertEqual(tasks.run_pending_jobs(), 1)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+        first = Participant.objects.get(game=first_game)
+        second = Participant.objects.get(game=second_game)
+        self.assertFalse(first.alert)
+        self.assertIsNone(first.travel_time)
+        self.assertTrue(second.alert)
+        self.assertEqual(second.travel_time, 90)
+        self.assertEqual(second.time_available, 60)
+
+    @override_settings(BACKGROUND_JOBS_MAX_ATTEMPTS=2)
+    @patch('Tennis.tasks.recompute_user_day', side_effect=RuntimeError('MapBox down'))
+    def test_failed_jobs_are_retried_later(self, mock_recompute):
+        tasks.enqueue_conflict_checks([self.user.user_id], [date(2024, 9, 2)])
+
+        tasks.run_pending_jobs()
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, 'MapBox down')
+        self.assertEqual(tasks.run_pending_jobs(), 0)
+
+        BackgroundJob.objects.update(run_after=job.run_after - timedelta(minutes=1))
+        tasks.run_pending_jobs()
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_running_job_is_kept_and_can_be_queued_again(self):
+        tasks.enqueue_conflict_checks([self.user.user_id], [date(2024, 9, 2)])
+        states = []
+
+        def recompute(user_id, day):
+            job = BackgroundJob.objects.get()
+            states.append((job.claimed_at is not None, job.locked_until > job.claimed_at))
+            tasks.enqueue_conflict_checks([user_id], [day])
+
+        with patch('Tennis.tasks.recompute_user_day', side_effect=recompute):
+            self.assertEqual(tasks.run_pending_jobs(), 1)
+        logger.debug(f"Stan zadania w trakcie: {states}")
+        self.assertEqual(states, [(True, True)])
+        job = BackgroundJob.objects.get()
+        self.assertIsNone(job.claimed_at)
+        self.assertEqual(job.attempts, 0)
+
+    @patch('Tennis.tasks.recompute_user_day')
+    def test_jobs_of_a_dead_worker_run_after_the_lease(self, mock_recompute):
+        tasks.enqueue_conflict_checks([self.user.user_id], [date(2024, 9, 2)])
+        claimed_at = now() - timedelta(minutes=1)
+        BackgroundJob.objects.update(claimed_at=claimed_at, locked_until=claimed_at + timedelta(minutes=5))
+        self.assertEqual(tasks.run_pending_jobs(), 0)
+
+        BackgroundJob.objects.update(locked_until=claimed_at)
+        self.assertEqual(tasks.run_pending_jobs(), 1)
+        mock_recompute.assert_called_once_with(self.user.user_id, date(2024, 9, 2))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    @patch('Tennis.management.commands.run_background_jobs.time.sleep')
+    @patch('Tennis.management.commands.run_background_jobs.close_old_connections')
+    def test_worker_survives_database_errors(self, mock_close, mock_sleep):
+        outcomes = [OperationalError('server closed the connection'), OperationalError('still down'), 2, KeyboardInterrupt]
+        with patch('Tennis.management.commands.run_background_jobs.run_pending_jobs', side_effect=outcomes):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('run_background_jobs', interval=1, max_backoff=3, stdout=io.StringIO())
+
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        logger.debug(f"Przerwy workera: {delays}")
+        self.assertEqual(delays, [2, 3])
+        self.assertEqual(mock_close.call_count, 4)
@@ -2,8 +2,18 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timedelta
 import logging
-from Tennis.utils import ask_MapBox_for_travel_time, check_if_enough_time
-from Tennis.models import Game, Court
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware
+from Tennis import metrics
+from Tennis.utils import (ask_MapBox_for_travel_time, ask_MapBox_for_travel_time_matrix, check_if_enough_time,
+                          chunk_court_pairs, get_travel_time, haversine_distance, prefetch_travel_times,
+                          prefilter_enough_time, get_previous_event, get_following_event,
+                          get_day_bounds, get_days_filter)
+from Tennis.models import Game, Court, Category, CustomUser, Participant
+from Tennis.travel_time_cache import TravelTimeCache, travel_time_cache
+from Tennis.models import CourtTravelTime
 
 # Set up logger
 logger = logging.getLogger('Tennis.tests')
@@ -20,9 +30,10 @@ if not logger.hasHandlers():
 class UtilsTestCase(unittest.TestCase):
 
     def setUp(self):
+        travel_time_cache.clear()
         logger.debug(f"\n----------------------------------------------------------------------\nPoczątek testu: {self._testMethodName}\n----------------------------------------------------------------------")
 
-    @patch('Tennis.utils.requests.get')
+    @patch('Tennis.utils.routing_client.get')
     def test_ask_MapBox_for_travel_time(self, mock_get):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -50,7 +61,24 @@ class UtilsTestCase(unittest.TestCase):
         logger.info("No routes returned, which is expected due to an empty response from the API.")
         logger.debug(f"Oczekiwano: None, otrzymano: {travel_time}\n")
         self.assertIsNone(travel_time)
+
+        mock_response.status_code = 403
+        mock_response.json.side_effect = ValueError('Expecting value: line 1 column 1 (char 0)')
+        mock_get.return_value = mock_response
+
+        travel_time = ask_MapBox_for_travel_time(52.2297, 21.0122, 51.5074, -0.1278, 'mock-api-key')
+        logger.info("A proxy answered with an HTML page instead of JSON.")
+        logger.debug(f"Oczekiwano: None, otrzymano: {travel_time}\n")
+        self.assertIsNone(travel_time)
+
+        mock_get.return_value = None
+
+        travel_time = ask_MapBox_for_travel_time(52.2297, 21.0122, 51.5074, -0.1278, 'mock-api-key')
+        logger.info("MapBox unreachable or circuit breaker open, travel time is unknown.")
+        logger.debug(f"Oczekiwano: None, otrzymano: {travel_time}\n")
+        self.assertIsNone(travel_time)
     # #
+    @override_settings(TRAVEL_TIME_PREFILTER_ENABLED=False)
     @patch('Tennis.utils.ask_MapBox_for_travel_time', return_value=15)
     def test_check_if_enough_time(self, mock_travel_time):
         event_end_time = datetime.now()
@@ -87,5 +115,213 @@ class UtilsTestCase(unittest.TestCase):
         self.assertEqual(time_available, 10)
         self.assertFalse(alert)
 
+    @patch.object(travel_time_cache, '_db_set')
+    @patch.object(travel_time_cache, '_db_get', return_value=(None, None))
+    @patch('Tennis.utils.ask_MapBox_for_travel_time', return_value=20)
+    def test_get_travel_time_is_cached(self, mock_travel_time, mock_db_get, mock_db_set):
+        origin_court = MagicMock(court_id=1, latitude=52.2297, longitude=21.0122)
+        destination_court = MagicMock(court_id=2, latitude=52.2400, longitude=21.0300)
+        departure_time = datetime(2024, 9, 2, 10, 15)
+
+        self.assertEqual(get_travel_time(origin_court, destination_court, departure_time), 20)
+        self.assertEqual(get_travel_time(origin_court, destination_court, departure_time + timedelta(minutes=30)), 20)
+        logger.debug(f"Liczba zapytań do MapBox: {mock_travel_time.call_count}, zapytań do bazy: {mock_db_get.call_count}")
+        self.assertEqual(mock_travel_time.call_count, 1)
+        self.assertEqual(mock_db_get.call_count, 1)
+        mock_db_set.assert_called_once_with((1, 2, 10), 20)
+
+        get_travel_time(origin_court, destination_court, departure_time + timedelta(hours=1))
+        self.assertEqual(mock_travel_time.call_count, 2)
+
+    @patch.object(travel_time_cache, '_db_get', return_value=(25, None))
+    @patch('Tennis.utils.ask_MapBox_for_travel_time')
+    def test_get_travel_time_from_database(self, mock_travel_time, mock_db_get):
+        mock_db_get.return_value = (25, datetime.now().astimezone())
+        origin_court = MagicMock(court_id=3)
+        destination_court = MagicMock(court_id=4)
+
+        travel_time = get_travel_time(origin_court, destination_court, datetime(2024, 9, 2, 18, 0))
+        self.assertEqual(travel_time, 25)
+        mock_travel_time.assert_not_called()
+
+    @patch('Tennis.utils.routing_client.get')
+    def test_ask_MapBox_for_travel_time_matrix(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {'code': 'Ok', 'durations': [[600, None], [1200, 0]]}
+        mock_get.return_value = mock_response
+
+        matrix = ask_MapBox_for_travel_time_matrix(
+            [(52.2297, 21.0122), (52.2400, 21.0300), (52.2500, 21.0500)], [0, 1], [1, 2], 'mock-api-key')
+        logger.debug(f"Otrzymana macierz czasów dojazdu: {matrix}\n")
+        self.assertEqual(matrix, [[10, None], [20, 0]])
+        self.assertEqual(mock_get.call_args.kwargs['params']['sources'], '0;1')
+        self.assertEqual(mock_get.call_args.kwargs['params']['destinations'], '1;2')
+
+        mock_response.status_code = 422
+        mock_response.json.return_value = {'message': 'Too many coordinates'}
+        self.assertIsNone(ask_MapBox_for_travel_time_matrix([(52.2297, 21.0122)], [0], [0], 'mock-api-key'))
+
+    def test_chunk_court_pairs(self):
+        courts = [MagicMock(court_id=court_id) for court_id in range(6)]
+        pairs = [(courts[0], courts[1]), (courts[1], courts[2]), (courts[3], courts[4]), (courts[4], courts[5])]
+
+        chunks = chunk_court_pairs(pairs, 3)
+        self.assertEqual(chunks, [pairs[:2], pairs[2:]])
+        self.assertEqual(chunk_court_pairs(pairs, 10), [pairs])
+
+    @patch.object(travel_time_cache, '_db_set')
+    @patch.object(travel_time_cache, '_db_get', return_value=(None, None))
+    @patch('Tennis.utils.ask_MapBox_for_travel_time')
+    @patch('Tennis.utils.ask_MapBox_for_travel_time_matrix', return_value=[[10, 30], [15, 25]])
+    def test_prefetch_travel_times(self, mock_matrix, mock_travel_time, mock_db_get, mock_db_set):
+        court_a = MagicMock(court_id=1, latitude=52.2297, longitude=21.0122)
+        court_b = MagicMock(court_id=2, latitude=52.2400, longitude=21.0300)
+        court_c = MagicMock(court_id=3, latitude=52.2500, longitude=21.0500)
+        departure_time = datetime(2024, 9, 2, 10, 0)
+        trips = [
+            (court_a, court_b, departure_time),
+            (court_a, court_c, departure_time),
+            (court_b, court_b, departure_time),
+            (court_c, court_b, departure_time),
+            (court_c, court_b, departure_time),
+        ]
+
+        travel_times = prefetch_travel_times(trips)
+        logger.debug(f"Czasy dojazdu po jednym zapytaniu: {travel_times}\n")
+        self.assertEqual(mock_matrix.call_count, 1)
+        self.assertEqual(travel_times, {(1, 2, 10): 10, (1, 3, 10): 30, (3, 2, 10): 15})
+
+        self.assertEqual(get_travel_time(court_c, court_b, departure_time), 15)
+        mock_travel_time.assert_not_called()
+
+    def test_haversine_distance(self):
+        distance = haversine_distance(52.2297, 21.0122, 51.5074, -0.1278)
+        logger.debug(f"Odległość Warszawa - Londyn: {distance} km")
+        self.assertAlmostEqual(distance, 1447, delta=5)
+        self.assertEqual(haversine_distance(52.2297, 21.0122, 52.2297, 21.0122), 0)
+
+    @override_settings(TRAVEL_TIME_PREFILTER_ENABLED=True, TRAVEL_TIME_MIN_SPEED_KMH=10, TRAVEL_TIME_MAX_SPEED_KMH=100)
+    @patch('Tennis.utils.get_travel_time', return_value=25)
+    def test_check_if_enough_time_prefilter(self, mock_travel_time):
+        metrics.reset('prefilter.')
+        event_end_time = datetime.now()
+        warsaw_court = MagicMock(court_id=1, latitude=52.2297, longitude=21.0122)
+        nearby_court = MagicMock(court_id=2, latitude=52.2400, longitude=21.0300)
+        london_court = MagicMock(court_id=3, latitude=51.5074, longitude=-0.1278)
+
+        travel_time, time_available, alert = check_if_enough_time(
+            event_end_time, event_end_time + timedelta(hours=2), warsaw_court, nearby_court)
+        logger.debug(f"Wyraźnie wystarczająca przerwa: {travel_time}, {time_available}, {alert}")
+        self.assertFalse(alert)
+        self.assertIsNone(travel_time)
+
+        travel_time, time_available, alert = check_if_enough_time(
+            event_end_time, event_end_time + timedelta(hours=2), warsaw_court, london_court)
+        logger.debug(f"Wyraźnie za krótka przerwa: {travel_time}, {time_available}, {alert}")
+        self.assertTrue(alert)
+        self.assertIsNone(travel_time)
+        mock_travel_time.assert_not_called()
+
+        travel_time, time_available, alert = check_if_enough_time(
+            event_end_time, event_end_time + timedelta(minutes=10), warsaw_court, nearby_court)
+        self.assertEqual(travel_time, 25)
+        self.assertTrue(alert)
+        mock_travel_time.assert_called_once()
+
+        self.assertEqual(metrics.snapshot('prefilter.'), {
+            'prefilter.clearly_fine': 1,
+            'prefilter.clearly_impossible': 1,
+            'prefilter.ambiguous': 1,
+            'prefilter.hit_rate': 2 / 3,
+        })
+
+    @override_settings(TRAVEL_TIME_PREFILTER_ENABLED=True)
+    def test_prefilter_needs_coordinates_and_gap(self):
+        court = MagicMock(court_id=1, latitude=52.2297, longitude=21.0122)
+        court_without_coordinates = MagicMock(court_id=2, latitude=None, longitude=None)
+
+        self.assertIsNone(prefilter_enough_time(court, court_without_coordinates, 60))
+        self.assertIsNone(prefilter_enough_time(court, court, None))
+
+
+class AdjacentEventsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        category = Category.objects.create(name='Match', color='#ff0000')
+        court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.games = []
+        for start_hour, end_hour in [(8, 9), (9, 12), (10, 11), (13, 14), (15, 16)]:
+            game = Game.objects.create(
+                category=category, court=court, creator=self.user,
+                start_date_and_time=make_aware(datetime(2024, 9, 2, start_hour)),
+                end_date_and_time=make_aware(datetime(2024, 9, 2, end_hour)))
+            Participant.objects.create(user=self.user, game=game)
+            self.games.append(game)
+
+    def test_adjacent_events_use_single_queries(self):
+        user_games = Game.objects.filter(participant__user=self.user).order_by('start_date_and_time')
+        current_game = self.games[3]
+
+        with CaptureQueriesContext(connection) as queries:
+            preceding_event = get_previous_event(user_games, current_game.start_date_and_time)
+            following_event = get_following_event(user_games, current_game)
+        logger.debug(f"Poprzednie: {preceding_event}, następne: {following_event}, zapytania: {len(queries)}")
+        self.assertEqual(preceding_event, self.games[1])
+        self.assertEqual(following_event, self.games[4])
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 1', queries[0]['sql'])
+
+        self.assertIsNone(get_previous_event(user_games, self.games[0].start_date_and_time))
+        self.assertIsNone(get_following_event(user_games, self.games[4]))
+
+    def test_day_queries_use_ranges(self):
+        day_start, day_end = get_day_bounds(datetime(2024, 9, 2).date())
+        self.assertEqual(day_end - day_start, timedelta(days=1))
+        self.assertEqual(day_start, make_aware(datetime(2024, 9, 2)))
+
+        days = [datetime(2024, 9, day).date() for day in (2, 3, 4, 16)]
+        games = Game.objects.filter(get_days_filter('start_date_and_time', days))
+        sql = str(games.query)
+        logger.debug(f"Zapytanie dla dni {days}: {sql}")
+        self.assertEqual(sql.count('BETWEEN') + sql.count('>='), 2)
+        self.assertEqual(list(games), self.games)
+
+
+class TravelTimeCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.courts = [
+            Court.objects.create(name=f'Court {i}', building_number='1', street='Street', city='City',
+                                 postal_code='00-001', country='Poland')
+            for i in range(3)
+        ]
+
+    @override_settings(TRAVEL_TIME_CACHE_EVICT_EVERY=4)
+    def test_rows_are_trimmed_every_few_writes(self):
+        cache = TravelTimeCache(max_rows=2)
+        for hour in range(3):
+            cache.set((self.courts[0].pk, self.courts[1].pk, hour), 10)
+        self.assertEqual(CourtTravelTime.objects.count(), 3)
+
+        cache.set((self.courts[0].pk, self.courts[1].pk, 3), 10)
+        hours = sorted(CourtTravelTime.objects.values_list('departure_hour', flat=True))
+        logger.debug(f"Godziny po przycięciu tabeli: {hours}")
+        self.assertEqual(hours, [2, 3])
+
+    @override_settings(TRAVEL_TIME_CACHE_SYNC_INTERVAL=0)
+    def test_invalidation_reaches_other_processes(self):
+        key = (self.courts[0].pk, self.courts[1].pk, 10)
+        worker, server = TravelTimeCache(), TravelTimeCache()
+        worker.set(key, 15)
+        self.assertEqual(worker.get(key), 15)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            server.invalidate_court(self.courts[1].pk)
+        self.assertIsNone(worker.get(key))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,363 @@
+import pickle
+from datetime import datetime
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import make_aware
+from unittest.mock import patch
+import logging
+from Tennis.models import Category, Court, CustomUser, Game, Participant, RecurringGroup
+from Tennis.user_cache import user_cache
+from Tennis.utils import check_if_enough_time
+from Tennis.views import CustomLoginView
+from Tennis.authentication_backends import EMAIL_BACKEND
+
+logger = logging.getLogger('Tennis.tests')
+
+
+class EventsRangeViewTestCase(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        self.category = Category.objects.create(name='Match', color='#ff0000')
+        self.court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.client.force_login(self.user)
+
+    def _create_game(self, day, start_hour, end_hour):
+        game = Game.objects.create(
+            name=f'Game {day}', category=self.category, court=self.court, creator=self.user,
+            start_date_and_time=make_aware(datetime(2024, 9, day, start_hour)),
+            end_date_and_time=make_aware(datetime(2024, 9, day, end_hour)))
+        Participant.objects.create(user=self.user, game=game)
+        return game
+
+    def test_week_is_loaded_with_one_query_grouped_by_day(self):
+        self._create_game(2, 10, 11)
+        self._create_game(4, 9, 11)
+        self._create_game(4, 14, 15)
+        self._create_game(9, 10, 11)
+
+        with self.assertNumQueries(2):  # user, events; the session comes from the cache
+            response = self.client.get(reverse('events_range'), {'start': '2024-09-02', 'end': '2024-09-09'})
+
+        days = response.json()['days']
+        logger.debug(f"Wydarzenia tygodnia: {days}")
+        self.assertEqual(len(days), 7)
+        self.assertEqual(len(days['2024-09-02']), 1)
+        self.assertEqual([event['name'] for event in days['2024-09-04']], ['Game 4', 'Game 4'])
+        self.assertEqual(days['2024-09-03'], [])
+        self.assertNotIn('2024-09-09', days)
+
+        event = days['2024-09-04'][0]
+        self.assertEqual(event['margin_top'], 900)
+        self.assertEqual(event['height'], 200)
+        self.assertTrue(event['is_creator'])
+        self.assertIn('profile_picture_url', event)
+
+    def test_invalid_range_is_rejected(self):
+        url = reverse('events_range')
+        self.assertEqual(self.client.get(url, {'start': '2024-09-09', 'end': '2024-09-02'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2024-01-01', 'end': '2024-12-31'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'tomorrow'}).status_code, 400)
+
+
+class DayPollTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        self.category = Category.objects.create(name='Match', color='#ff0000')
+        self.court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.client.force_login(self.user)
+
+    def _create_game(self, name, start_hour, end_hour, day=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            game = Game.objects.create(
+                name=name, category=self.category, court=self.court, creator=self.user,
+                start_date_and_time=make_aware(datetime(2024, 9, day, start_hour)),
+                end_date_and_time=make_aware(datetime(2024, 9, day, end_hour)))
+            Participant.objects.create(user=self.user, game=game)
+        return game
+
+    def _poll(self, **params):
+        headers = {'X-Requested-With': 'XMLHttpRequest'}
+        if 'etag' in params:
+            headers['If-None-Match'] = params.pop('etag')
+        return self.client.get(reverse('day'), {'date': '2024-09-02', **params}, headers=headers)
+
+    def test_unchanged_day_is_not_modified(self):
+        self._create_game('First', 10, 11)
+        response = self._poll()
+        self.assertEqual(len(response.json()['events']), 1)
+
+        with self.assertNumQueries(0):  # the session, the user and the day come from the cache
+            not_modified = self._poll(etag=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('private', not_modified['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        self._create_game('Second', 12, 13)
+        self.assertEqual(self._poll(etag=response['ETag']).status_code, 200)
+
+    def test_cached_user_is_dropped_when_the_password_changes(self):
+        self._create_game('First', 10, 11)
+        self.assertEqual(self._poll().status_code, 200)
+
+        self.user.set_password('new password')
+        self.user.save()
+        response = self._poll()
+        logger.debug(f"Odpowiedź po zmianie hasła: {response.status_code}")
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_hash_is_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('secret pass')
+            self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self._poll().status_code, 200)
+
+        cached = cache.get(user_cache.make_key(self.user.pk))
+        self.assertIn('password', cached.get_deferred_fields())
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(cached))
+        with self.assertNumQueries(0):
+            self.assertEqual(self._poll().status_code, 200)
+        self.assertTrue(cached.check_password('secret pass'))
+
+    def test_since_returns_only_changes(self):
+        first_game = self._create_game('First', 10, 11)
+        self._create_game('Second', 12, 13)
+        cursor = self._poll().json()['cursor']
+
+        third_game = self._create_game('Third', 14, 15)
+        removed_game_id = first_game.game_id
+        with self.captureOnCommitCallbacks(execute=True):
+            first_game.delete()
+
+        data = self._poll(since=cursor).json()
+        logger.debug(f"Zmiany od kursora {cursor}: {data}")
+        self.assertNotIn('events', data)
+        self.assertEqual([event['game_id'] for event in data['changed']], [third_game.game_id])
+        self.assertEqual(data['removed'], [removed_game_id])
+        self.assertGreater(data['cursor'], cursor)
+
+        unchanged = self._poll(since=data['cursor']).json()
+        self.assertEqual((unchanged['changed'], unchanged['removed']), ([], []))
+
+    def test_cached_day_is_invalidated_only_by_its_changes(self):
+        game = self._create_game('First', 10, 11)
+        self._poll()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self._poll().json()['events']), 1)
+
+        self._create_game('Other day', 10, 11, day=3)
+        with self.assertNumQueries(0):
+            self._poll()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.color = '#00ff00'
+            self.category.save()
+        self.assertEqual(self._poll().json()['events'][0]['category__color'], '#00ff00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game.start_date_and_time = make_aware(datetime(2024, 9, 3, 12))
+            game.end_date_and_time = make_aware(datetime(2024, 9, 3, 13))
+            game.save()
+        self.assertEqual(self._poll().json()['events'], [])
+        self.assertEqual(len(self._poll(date='2024-09-03').json()['events']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile_picture = 'profile_pictures/me.png'
+            self.user.save()
+        events = self._poll(date='2024-09-03').json()['events']
+        logger.debug(f"Wydarzenia po zmianie zdjęcia: {events}")
+        self.assertTrue(events[0]['profile_picture_url'].endswith('profile_pictures/me.png'))
+
+
+class GameDetailsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='player@example.com', username='player')
+        self.partner = CustomUser.objects.create(email='partner@example.com', username='partner')
+        self.category = Category.objects.create(name='Match', color='#ff0000')
+        self.court = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.group = RecurringGroup.objects.create(
+            recurrence_type='weekly', start_date=make_aware(datetime(2024, 9, 2, 10)),
+            end_date=make_aware(datetime(2024, 9, 30, 10)))
+        self.game = Game.objects.create(
+            name='Doubles', category=self.category, court=self.court, creator=self.user, group=self.group,
+            start_date_and_time=make_aware(datetime(2024, 9, 2, 10)),
+            end_date_and_time=make_aware(datetime(2024, 9, 2, 11)))
+        Participant.objects.create(user=self.user, game=self.game)
+        Participant.objects.create(user=self.partner, game=self.game)
+        self.client.force_login(self.user)
+
+    def test_details_are_loaded_with_a_fixed_query_budget(self):
+        with self.assertNumQueries(3):  # user, game with joins, participants with users
+            response = self.client.get(
+                reverse('day'), {'game_id': self.game.game_id, 'fetch_game_details': 'true'},
+                headers={'X-Requested-With': 'XMLHttpRequest'})
+
+        data = response.json()
+        logger.debug(f"Szczegóły gry: {data}")
+        self.assertEqual(data['court_name'], 'A')
+        self.assertEqual(data['category_name'], 'Match')
+        self.assertEqual(data['participants'], [['player@example.com', 'player'], ['partner@example.com', 'partner']])
+        self.assertTrue(data['is_creator'])
+        self.assertEqual((data['group'], data['recurrence_type']), (self.group.group_id, 'weekly'))
+
+
+class GameSaveTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            CustomUser.objects.create(email=f'player{i}@example.com', username=f'player{i}') for i in range(4)
+        ]
+        self.category = Category.objects.create(name='Match', color='#ff0000')
+        self.court_a = Court.objects.create(
+            name='A', building_number='1', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2297, longitude=21.0122)
+        self.court_b = Court.objects.create(
+            name='B', building_number='2', street='Street', city='City', postal_code='00-001',
+            country='Poland', latitude=52.2400, longitude=21.0300)
+        for player in self.players:
+            game = Game.objects.create(
+                category=self.category, court=self.court_a, creator=player,
+                start_date_and_time=make_aware(datetime(2024, 9, 2, 9)),
+                end_date_and_time=make_aware(datetime(2024, 9, 2, 10)))
+            Participant.objects.create(user=player, game=game)
+        self.client.force_login(self.players[0])
+
+    def _post_game(self, start, end, **extra):
+        return self.client.post(reverse('day'), {
+            'submit_game': '1',
+            'name': 'Doubles',
+            'category': self.category.category_id,
+            'court': self.court_b.court_id,
+            'start_date_and_time': start,
+            'end_date_and_time': end,
+            'participants': [player.user_id for player in self.players],
+            **extra,
+        }, headers={'X-Requested-With': 'XMLHttpRequest'})
+
+    def test_doubles_game_is_checked_and_saved_in_a_handful_of_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_game('2024-09-02 11:00', '2024-09-02 12:00')
+
+        logger.debug(f"Liczba zapytań przy zapisie gry: {len(queries)}")
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 20)
+        rows = Participant.objects.filter(game__name='Doubles')
+        self.assertEqual(rows.count(), 4)
+        self.assertTrue(all(row.time_available == 60 for row in rows))
+
+    @patch('Tennis.conflicts.prefetch_travel_times')
+    @patch('Tennis.utils.get_travel_time', return_value=30)
+    def test_confirmed_save_reuses_the_dry_run_checks(self, mock_travel_time, mock_prefetch):
+        with patch('Tennis.conflicts.check_if_enough_time', wraps=check_if_enough_time) as mock_check:
+            response = self._post_game('2024-09-02 10:05', '2024-09-02 11:00')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(len(response.json()['conflicts']), 4)
+            self.assertNotIn('travel_time', self.client.session)
+            response = self._post_game('2024-09-02 10:05', '2024-09-02 11:00', confirm='true')
+            self.assertEqual(response.status_code, 200)
+
+        logger.debug(f"Wywołania sprawdzenia czasu: {mock_check.call_count}")
+        self.assertEqual(mock_check.call_count, 1)
+        self.assertTrue(all(row.alert for row in Participant.objects.filter(game__name='Doubles')))
+
+
+    @patch('Tennis.conflicts.prefetch_travel_times')
+    @patch('Tennis.utils.get_travel_time', return_value=30)
+    def test_moving_a_court_drops_the_remembered_checks(self, mock_travel_time, mock_prefetch):
+        with patch('Tennis.conflicts.check_if_enough_time', wraps=check_if_enough_time) as mock_check:
+            self.assertEqual(self._post_game('2024-09-02 10:05', '2024-09-02 11:00').status_code, 409)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.court_b.latitude, self.court_b.longitude = 52.2500, 21.0400
+                self.court_b.save()
+            response = self._post_game('2024-09-02 10:05', '2024-09-02 11:00', confirm='true')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_check.call_count, 2)
+
+    @override_settings(TIME_ZONE='Europe/Warsaw')
+    @patch('Tennis.views.recompute_conflicts')
+    def test_moved_games_update_the_local_days(self, mock_recompute):
+        self._post_game('2024-09-03 00:30', '2024-09-03 01:30')
+        game = Game.objects.get(name='Doubles')
+        self.assertEqual(game.start_date_and_time.day, 2)  # still 2 September in UTC
+
+        response = self._post_game('2024-09-05 10:00', '2024-09-05 11:00', update_game='1', game_id=game.game_id)
+
+        self.assertEqual(response.status_code, 200)
+        days = mock_recompute.call_args.args[1]
+        logger.debug(f"Dni do przeliczenia: {days}")
+        self.assertEqual(days, {datetime(2024, 9, 3).date(), datetime(2024, 9, 5).date()})
+
+@override_settings(LOGIN_THROTTLE_EMAIL_BURST=3, LOGIN_THROTTLE_IP_BURST=5, TRUSTED_PROXIES=['172.16.0.0/12'])
+class LoginThrottleTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser(email='player@example.com', username='player')
+        self.user.set_password('secret pass')
+        self.user.save()
+        # Only the status codes matter here, not the rendered login page
+        patcher = patch.object(CustomLoginView, 'render_to_response',
+                               lambda view, context, **kwargs: HttpResponse(status=kwargs.get('status', 200)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _login(self, email, password, ip='10.0.0.1', remote_addr='172.18.0.5'):
+        # Sent through the proxy by default, which passes the client address in X-Real-IP
+        return self.client.post(reverse('login'), {'username': email, 'password': password},
+                                REMOTE_ADDR=remote_addr, HTTP_X_REAL_IP=ip)
+
+    def test_attempts_over_the_limit_are_rejected_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self._login('player@example.com', 'wrong').status_code, 200)
+
+        with patch.object(CustomUser, 'check_password') as mock_check:
+            response = self._login('player@example.com', 'secret pass')
+        logger.debug(f"Odpowiedź po przekroczeniu limitu: {response.status_code} {response.headers.get('Retry-After')}")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        mock_check.assert_not_called()
+
+        # Other addresses from the same client share its IP bucket, which has two of its five attempts left
+        for _ in range(2):
+            self.assertEqual(self._login('other@example.com', 'wrong').status_code, 200)
+        self.assertEqual(self._login('other@example.com', 'wrong').status_code, 429)
+        self.assertEqual(self._login('player@example.com', 'secret pass', ip='10.0.0.2').status_code, 429)
+
+    def test_each_attempt_hashes_one_password(self):
+        for email, password in [('player@example.com', 'wrong'), ('nobody@example.com', 'wrong'),
+                                ('player@example.com', 'secret pass')]:
+            with patch.object(PBKDF2PasswordHasher, 'encode', autospec=True,
+                              side_effect=PBKDF2PasswordHasher.encode) as mock_encode:
+                self._login(email, password)
+            logger.debug(f"Hashowania dla {email}: {mock_encode.call_count}")
+            self.assertEqual(mock_encode.call_count, 1)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], EMAIL_BACKEND)
+
+    def test_client_ip_header_is_ignored_from_untrusted_addresses(self):
+        for attempt in range(5):
+            response = self._login(f'player{attempt}@example.com', 'wrong', ip=f'10.0.1.{attempt}',
+                                   remote_addr='203.0.113.9')
+            self.assertEqual(response.status_code, 200)
+        response = self._login('player9@example.com', 'wrong', ip='10.0.1.9', remote_addr='203.0.113.9')
+        logger.debug(f"Odpowiedź dla podrobionego nagłówka: {response.status_code}")
+        self.assertEqual(response.status_code, 429)
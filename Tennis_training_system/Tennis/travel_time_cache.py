@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils.timezone import now
+from .models import CourtTravelTime
+from .log import SAMPLED
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TravelTimeCache:
+    """
+    Two-level cache for court-to-court travel times.
+
+    The first level is an in-process LRU dictionary, so a warm pair never leaves the process.
+    The second level is the CourtTravelTime table, shared by all workers and kept across restarts.
+    Entries are keyed by (origin court, destination court, departure hour) and expire after a TTL.
+
+    Invalidating a court bumps a generation in the shared cache; every process compares it at most
+    once per TRAVEL_TIME_CACHE_SYNC_INTERVAL and empties its first level when it changed. The table
+    is trimmed to its TTL and size bound every TRAVEL_TIME_CACHE_EVICT_EVERY writes of a process.
+    """
+
+    GENERATION_KEY = 'travel_time_cache:generation'
+
+    def __init__(self, ttl=None, max_entries=None, max_rows=None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._next_sync = 0.0
+        self._writes = 0
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.TRAVEL_TIME_CACHE_TTL
+
+    @property
+    def max_entries(self):
+        return self._max_entries if self._max_entries is not None else settings.TRAVEL_TIME_CACHE_MAX_ENTRIES
+
+    @property
+    def max_rows(self):
+        return self._max_rows if self._max_rows is not None else settings.TRAVEL_TIME_CACHE_MAX_ROWS
+
+    @staticmethod
+    def make_key(origin_court_id, destination_court_id, departure_time):
+        """
+        Build the cache key for a trip between two courts.
+
+        :param origin_court_id: ID of the court the player leaves from.
+        :param destination_court_id: ID of the court the player travels to.
+        :param departure_time: The datetime at which the player leaves the origin court.
+        :return: A tuple (origin_court_id, destination_court_id, departure_hour).
+        """
+        return origin_court_id, destination_court_id, departure_time.hour
+
+    def get(self, key):
+        """
+        Return the cached travel time in minutes for the key, or None on a miss.
+        The in-process layer is checked first, the database second.
+        """
+        self._sync()
+        travel_time = self._memory_get(key)
+        if travel_time is not None:
+            return travel_time
+
+        travel_time, fetched_at = self._db_get(key)
+        if travel_time is not None:
+            remaining = self.ttl - (now() - fetched_at).total_seconds()
+            self._memory_set(key, travel_time, remaining)
+        return travel_time
+
+    def set(self, key, travel_time):
+        """
+        Store a travel time in both cache levels.
+        """
+        self._memory_set(key, travel_time, self.ttl)
+        self._db_set(key, travel_time)
+
+    def invalidate_court(self, court_id):
+        """
+        Drop every cached trip that starts or ends at the given court, e.g. after its address changed.
+        The other processes empty their first level when they see the new generation; it is set
+        again on commit, so they cannot keep trips read before the rows were deleted.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if court_id in key[:2]]:
+                del self._entries[key]
+        try:
+            with transaction.atomic():
+                CourtTravelTime.objects.filter(origin_court_id=court_id).delete()
+                CourtTravelTime.objects.filter(destination_court_id=court_id).delete()
+        except DatabaseError as e:
+            logger.warning(f"Could not invalidate travel times for court {court_id}: {e}")
+        self._bump_generation()
+        transaction.on_commit(self._bump_generation)
+
+    def _bump_generation(self):
+        generation = time.time_ns()
+        cache.set(self.GENERATION_KEY, generation, None)
+        with self._lock:
+            # This process already dropped the court's trips
+            self._generation = generation
+
+    def _sync(self):
+        current = time.monotonic()
+        if current < self._next_sync:
+            return
+        self._next_sync = current + settings.TRAVEL_TIME_CACHE_SYNC_INTERVAL
+        generation = cache.get(self.GENERATION_KEY)
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+
+    def clear(self):
+        """
+        Empty the in-process layer. The database layer is left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            travel_time, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return travel_time
+
+    def _memory_set(self, key, travel_time, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (travel_time, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _db_get(self, key):
+        origin_court_id, destination_court_id, departure_hour = key
+        try:
+            entry = CourtTravelTime.objects.filter(
+                origin_court_id=origin_court_id,
+                destination_court_id=destination_court_id,
+                departure_hour=departure_hour,
+                fetched_at__gte=now() - timedelta(seconds=self.ttl),
+            ).values_list('travel_time', 'fetched_at').first()
+        except DatabaseError as e:
+            logger.warning(f"Travel time cache lookup failed for {key}: {e}", extra=SAMPLED)
+            return None, None
+        return entry if entry else (None, None)
+
+    def _db_set(self, key, travel_time):
+        origin_court_id, destination_court_id, departure_hour = key
+        try:
+            with transaction.atomic():
+                CourtTravelTime.objects.update_or_create(
+                    origin_court_id=origin_court_id,
+                    destination_court_id=destination_court_id,
+                    departure_hour=departure_hour,
+                    defaults={'travel_time': travel_time, 'fetched_at': now()},
+                )
+        except DatabaseError as e:
+            logger.warning(f"Could not store travel time for {key}: {e}", extra=SAMPLED)
+            return
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % settings.TRAVEL_TIME_CACHE_EVICT_EVERY == 0
+        if evict:
+            self.evict_rows()
+
+    def evict_rows(self):
+        """
+        Remove expired rows and, if the table is still over its size bound, the oldest ones.
+        The bound is found with one row read at an offset of the fetched_at index.
+        """
+        try:
+            with transaction.atomic():
+                CourtTravelTime.objects.filter(fetched_at__lt=now() - timedelta(seconds=self.ttl)).delete()
+                cutoff = CourtTravelTime.objects.order_by('-fetched_at').values_list(
+                    'fetched_at', flat=True)[self.max_rows:self.max_rows + 1].first()
+                if cutoff is not None:
+                    CourtTravelTime.objects.filter(fetched_at__lte=cutoff).delete()
+        except DatabaseError as e:
+            logger.warning(f"Could not evict travel times: {e}")
+
+
+travel_time_cache = TravelTimeCache()
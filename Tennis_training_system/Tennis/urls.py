@@ -11,6 +11,9 @@ urlpatterns = [
     path('day/', views.DayView.as_view(), name='day'),
     path('profile/', views.UsersProfile.as_view(), name='users_profile'),
     path('courts', views.CourtsView.as_view(), name='courts'),
+    path('events/', views.EventsRangeView.as_view(), name='events_range'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('participants/search/', views.ParticipantSearchView.as_view(), name='participant_search'),
     path("select2/", include("django_select2.urls")),
     path('logout/', views.CustomLogoutView.as_view(), name='logout'),
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,68 @@
+import copy
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Cache of the users loaded for authenticated requests, together with their Role.
+
+    The session only stores the user's ID, so without it every request (including each poll)
+    reads the user row. Entries are deleted whenever the user is saved or their profile picture
+    is replaced, and expire after a timeout as a safety net.
+
+    The password hash is not cached: entries carry the session hash the authentication middleware
+    compares instead, and the password is loaded from the database only if it is used.
+    """
+
+    def __init__(self, timeout=None):
+        self._timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else settings.USER_CACHE_TIMEOUT
+
+    @staticmethod
+    def make_key(user_id):
+        return f'auth_user:{user_id}'
+
+    def get(self, user_id):
+        """
+        Return the cached user or None on a miss.
+        """
+        if not self.timeout:
+            return None
+        user = cache.get(self.make_key(user_id))
+        metrics.increment('user_cache.hits' if user is not None else 'user_cache.misses')
+        return user
+
+    def set(self, user):
+        """
+        Store a user loaded with its role.
+        """
+        if self.timeout:
+            cached = copy.copy(user)
+            cached._session_auth_hash = user.get_session_auth_hash()
+            # Deferred, so it is read from the database on access
+            del cached.password
+            cache.set(self.make_key(user.pk), cached, self.timeout)
+
+    def invalidate(self, user_id):
+        """
+        Delete the cached user now and again when the current transaction commits, so a request
+        reading the user before the commit cannot put the old version back for long.
+
+        :param user_id: The ID of the changed user.
+        """
+        key = self.make_key(user_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+        metrics.increment('user_cache.invalidations')
+
+
+user_cache = UserCache()
@@ -1,15 +1,41 @@
 import math
-import requests
+from datetime import datetime, time, timedelta
+from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from django.utils.timezone import now
-from Tennis_training_system import settings
+from django.utils.timezone import now, make_aware
+from django.conf import settings
 from .models import Game, Participant, CustomUser
+from .travel_time_cache import travel_time_cache
+from .routing_client import routing_client
+from . import metrics
+from .log import SAMPLED
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _read_MapBox_response(response):
+    """
+    Decode the JSON body of a MapBox response.
+    Returns None when the body is not a JSON object, e.g. an HTML error page of a proxy.
+    """
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        logger.warning(f"MapBox answered {response.status_code} without a JSON object", extra=SAMPLED)
+        return None
+    return data
 
 
 def ask_MapBox_for_travel_time(origin_lat, origin_lon, dest_lat, dest_lon, api_key):
     """
     Calculate travel time between two locations using the Mapbox Directions API.
+    Returns None when the travel time is unknown, e.g. MapBox failed or the routing circuit breaker is open.
     """
     url = f"https://api.mapbox.com/directions/v5/mapbox/driving-traffic/{origin_lon},{origin_lat};{dest_lon},{dest_lat}"
     params = {
@@ -18,75 +44,315 @@ def ask_MapBox_for_travel_time(origin_lat, origin_lon, dest_lat, dest_lon, api_k
         'overview': 'full',
         'steps': 'true',
     }
-    response = requests.get(url, params=params)
-    data = response.json()
+    response = routing_client.get(url, params=params)
+    if response is None:
+        return None
+    data = _read_MapBox_response(response)
+    if data is None:
+        return None
 
-    if response.status_code == 200 and data['routes']:
+    if response.status_code == 200 and data.get('routes'):
         travel_time_seconds = data['routes'][0]['duration']
         travel_time_minutes = travel_time_seconds / 60
         return travel_time_minutes
     else:
-        print("Error:", data.get('message', 'Unknown error, MapBox'))
+        logger.warning(f"MapBox request failed ({response.status_code}): {data.get('message', 'Unknown error')}",
+                       extra=SAMPLED)
+        return None
+
+
+def ask_MapBox_for_travel_time_matrix(coordinates, sources, destinations, api_key):
+    """
+    Calculate travel times between many locations with a single Mapbox Matrix API request.
+    :param coordinates: A list of (latitude, longitude) tuples.
+    :param sources: Indexes into coordinates used as starting points.
+    :param destinations: Indexes into coordinates used as destinations.
+    :param api_key: The MapBox access token.
+    :return: A matrix (list of rows, one per source) of travel times in minutes, None where no route
+             was found, or None if the request failed.
+    """
+    points = ';'.join(f"{lon},{lat}" for lat, lon in coordinates)
+    url = f"https://api.mapbox.com/directions-matrix/v1/mapbox/driving-traffic/{points}"
+    params = {
+        'access_token': api_key,
+        'sources': ';'.join(str(index) for index in sources),
+        'destinations': ';'.join(str(index) for index in destinations),
+        'annotations': 'duration',
+    }
+    response = routing_client.get(url, params=params)
+    if response is None:
+        return None
+    data = _read_MapBox_response(response)
+    if data is None:
+        return None
+
+    if response.status_code == 200 and data.get('durations'):
+        return [
+            [duration / 60 if duration is not None else None for duration in row]
+            for row in data['durations']
+        ]
+    else:
+        logger.warning(f"MapBox request failed ({response.status_code}): {data.get('message', 'Unknown error')}",
+                       extra=SAMPLED)
+        return None
+
+
+def chunk_court_pairs(court_pairs, max_coordinates):
+    """
+    Split court pairs into chunks whose courts fit into a single Matrix API request.
+    :param court_pairs: An iterable of (origin_court, destination_court) tuples.
+    :param max_coordinates: The maximum number of distinct courts in one request.
+    :return: A list of chunks, each a list of (origin_court, destination_court) tuples.
+    """
+    chunks = []
+    chunk, chunk_courts = [], set()
+    for origin_court, destination_court in court_pairs:
+        pair_courts = {origin_court.court_id, destination_court.court_id}
+        if chunk and len(chunk_courts | pair_courts) > max_coordinates:
+            chunks.append(chunk)
+            chunk, chunk_courts = [], set()
+        chunk.append((origin_court, destination_court))
+        chunk_courts |= pair_courts
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def prefetch_travel_times(trips):
+    """
+    Resolve every uncached trip with as few Matrix API requests as possible and store the results
+    in the travel time cache, so the following get_travel_time calls never leave the process.
+    :param trips: An iterable of (origin_court, destination_court, departure_time) tuples. A fourth
+                  element, the arrival deadline, lets trips the pre-filter can decide skip routing.
+    :return: A dictionary mapping cache keys to travel times in minutes.
+    """
+    travel_times = {}
+    missing = {}
+    for trip in trips:
+        origin_court, destination_court, departure_time = trip[:3]
+        if origin_court is None or destination_court is None:
+            continue
+        if origin_court.court_id == destination_court.court_id:
+            continue
+        if None in (origin_court.latitude, origin_court.longitude, destination_court.latitude, destination_court.longitude):
+            # Not geocoded yet
+            continue
+        if len(trip) > 3 and trip[3] > departure_time:
+            time_available = (trip[3] - departure_time).total_seconds() / 60
+            if prefilter_enough_time(origin_court, destination_court, time_available, count=False) is not None:
+                continue
+        key = travel_time_cache.make_key(origin_court.court_id, destination_court.court_id, departure_time)
+        if key in travel_times or key in missing:
+            continue
+        travel_time = travel_time_cache.get(key)
+        if travel_time is not None:
+            travel_times[key] = travel_time
+        else:
+            missing[key] = (origin_court, destination_court)
+
+    if not missing:
+        return travel_times
+
+    pairs = {(origin.court_id, destination.court_id): (origin, destination) for origin, destination in missing.values()}
+    for chunk in chunk_court_pairs(pairs.values(), settings.MAPBOX_MATRIX_MAX_COORDINATES):
+        courts = {}
+        for origin_court, destination_court in chunk:
+            courts.setdefault(origin_court.court_id, origin_court)
+            courts.setdefault(destination_court.court_id, destination_court)
+        court_ids = list(courts)
+        source_ids = list(dict.fromkeys(origin.court_id for origin, _ in chunk))
+        destination_ids = list(dict.fromkeys(destination.court_id for _, destination in chunk))
+
+        matrix = ask_MapBox_for_travel_time_matrix(
+            [(courts[court_id].latitude, courts[court_id].longitude) for court_id in court_ids],
+            [court_ids.index(court_id) for court_id in source_ids],
+            [court_ids.index(court_id) for court_id in destination_ids],
+            settings.MAPBOX_API_KEY
+        )
+        if matrix is None:
+            continue
+
+        for key in missing:
+            origin_court_id, destination_court_id, _ = key
+            if origin_court_id not in source_ids or destination_court_id not in destination_ids:
+                continue
+            travel_time = matrix[source_ids.index(origin_court_id)][destination_ids.index(destination_court_id)]
+            if travel_time is not None:
+                travel_time_cache.set(key, travel_time)
+                travel_times[key] = travel_time
+
+    return travel_times
+
+
+def haversine_distance(origin_lat, origin_lon, dest_lat, dest_lon):
+    """
+    Calculate the great-circle distance between two points.
+    :return: The distance in kilometres.
+    """
+    origin_lat, origin_lon, dest_lat, dest_lon = map(
+        math.radians, (float(origin_lat), float(origin_lon), float(dest_lat), float(dest_lon)))
+    a = (math.sin((dest_lat - origin_lat) / 2) ** 2
+         + math.cos(origin_lat) * math.cos(dest_lat) * math.sin((dest_lon - origin_lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def prefilter_enough_time(origin_court, destination_court, time_available, count=True):
+    """
+    Decide from the straight-line distance alone whether a trip obviously fits into the gap
+    or obviously does not, so routing is only needed for the ambiguous cases.
+
+    Travelling faster than TRAVEL_TIME_MAX_SPEED_KMH in a straight line is impossible, and
+    even slow city traffic averages at least TRAVEL_TIME_MIN_SPEED_KMH, so the real travel
+    time lies between distance / max speed and distance / min speed.
+
+    :param origin_court: The court the player leaves from.
+    :param destination_court: The court the player travels to.
+    :param time_available: Minutes between the two games.
+    :param count: Whether to record the decision in the pre-filter metrics.
+    :return: True if the gap is clearly sufficient, False if it is clearly too short, or None if
+             the trip has to be routed. The bounds only decide the question; they are not travel times.
+    """
+    if not settings.TRAVEL_TIME_PREFILTER_ENABLED or time_available is None:
+        return None
+    if None in (origin_court.latitude, origin_court.longitude, destination_court.latitude, destination_court.longitude):
+        return None
+
+    distance = haversine_distance(
+        origin_court.latitude, origin_court.longitude,
+        destination_court.latitude, destination_court.longitude
+    )
+    fastest = distance / settings.TRAVEL_TIME_MAX_SPEED_KMH * 60
+    slowest = distance / settings.TRAVEL_TIME_MIN_SPEED_KMH * 60
+
+    if slowest <= time_available:
+        decision, enough_time = 'clearly_fine', True
+    elif fastest > time_available:
+        decision, enough_time = 'clearly_impossible', False
+    else:
+        decision, enough_time = 'ambiguous', None
+
+    if count:
+        metrics.increment(f'prefilter.{decision}')
+    return enough_time
+
+
+def _prefilter_hit_rate():
+    decided = metrics.get('prefilter.clearly_fine') + metrics.get('prefilter.clearly_impossible')
+    total = decided + metrics.get('prefilter.ambiguous')
+    return decided / total if total else None
+
+
+metrics.register_gauge('prefilter.hit_rate', _prefilter_hit_rate)
+
+
+def get_travel_time(origin_court, destination_court, departure_time):
+    """
+    Get the travel time between two courts, asking MapBox only when the pair is not cached.
+    :param origin_court: The court the player leaves from.
+    :param destination_court: The court the player travels to.
+    :param departure_time: The datetime at which the player leaves the origin court.
+    :return: Travel time in minutes or None if it could not be determined.
+    """
+    key = travel_time_cache.make_key(origin_court.court_id, destination_court.court_id, departure_time)
+    travel_time = travel_time_cache.get(key)
+    if travel_time is not None:
+        return travel_time
+    if None in (origin_court.latitude, origin_court.longitude, destination_court.latitude, destination_court.longitude):
         return None
 
+    travel_time = ask_MapBox_for_travel_time(
+        origin_court.latitude, origin_court.longitude,
+        destination_court.latitude, destination_court.longitude,
+        settings.MAPBOX_API_KEY
+    )
+    if travel_time is not None:
+        travel_time_cache.set(key, travel_time)
+    return travel_time
 
-def check_if_enough_time(event_end_time, next_event_start_time, event_court, next_event_court, request=None):
+
+def check_if_enough_time(event_end_time, next_event_start_time, event_court, next_event_court):
     """
     Check if there is enough time between two events to travel from one court to another.
-    Returns travel_time, time_available, and alert status.
+    Returns travel_time, time_available, and alert status; travel_time is None when the
+    straight-line distance alone decided the alert.
     """
     alert = False
     travel_time = None
     time_available = None
-    MAPBOX_API_KEY = settings.MAPBOX_API_KEY
 
     if next_event_start_time > event_end_time:
         time_available = (next_event_start_time - event_end_time).total_seconds() / 60
 
     if event_court.court_id != next_event_court.court_id:
-        travel_time = ask_MapBox_for_travel_time(
-            event_court.latitude, event_court.longitude,
-            next_event_court.latitude, next_event_court.longitude,
-            MAPBOX_API_KEY
-        )
+        enough_time = prefilter_enough_time(event_court, next_event_court, time_available)
+        if enough_time is not None:
+            alert = not enough_time
+        else:
+            travel_time = get_travel_time(event_court, next_event_court, event_end_time)
 
         if travel_time is not None:
             if travel_time > time_available:
                 alert = True
-                if request:
-                    request.session['travel_time'] = travel_time
-                    request.session['time_available'] = time_available
-                    request.session['alert'] = alert
 
     return travel_time, time_available, alert
 
 
+def get_day_bounds(day):
+    """
+    Get the half-open datetime range [start, end) covering a day in the current time zone.
+    Filtering with a range instead of start_date_and_time__date keeps the column uncast,
+    so the database can use the index on start_date_and_time.
+    :param day: The date.
+    :return: A tuple of aware datetimes (midnight of the day, midnight of the next day).
+    """
+    start = make_aware(datetime.combine(day, time.min))
+    end = make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def get_days_filter(field, days):
+    """
+    Build a filter matching datetimes that fall on any of the given days.
+    Consecutive days are merged into a single range, so a daily series becomes one range.
+    :param field: The datetime field (or lookup path) to filter on, e.g. 'game__start_date_and_time'.
+    :param days: An iterable of dates.
+    :return: A Q object of OR-ed half-open ranges.
+    """
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+
+    condition = Q(pk__in=[])
+    for first_day, end_day in ranges:
+        condition |= Q(**{
+            f'{field}__gte': get_day_bounds(first_day)[0],
+            f'{field}__lt': get_day_bounds(end_day)[0],
+        })
+    return condition
+
+
 def get_previous_event(user_games, new_game_start):
     """
     Get the most recent event that ends before the new game starts.
+    Runs as a single ordered LIMIT 1 query backed by the index on end_date_and_time.
     :param user_games: A queryset of the user's games.
     :param new_game_start: The start time of the new game.
     :return: The preceding event or None if no such event exists.
     """
-    preceding_event = None
-    for game in user_games:
-        if game.end_date_and_time < new_game_start:
-            preceding_event = game
-        else:
-            break
-    return preceding_event
+    return user_games.filter(end_date_and_time__lt=new_game_start).order_by('-end_date_and_time').first()
 
 
 def get_following_event(user_games, current_game):
     """
     Get the next event that starts after the new game ends.
+    Runs as a single ordered LIMIT 1 query backed by the index on start_date_and_time.
     :param user_games: A queryset of the user's games.
-    :param new_game_end: The end time of the new game.
+    :param current_game: The game whose successor is looked up.
     :return: The following event or None if no such event exists.
     """
-    following_event = None
-    for game in user_games.exclude(game_id=current_game.game_id):
-        if game.start_date_and_time > current_game.end_date_and_time:
-            following_event = game
-            break
-    return following_event
\ No newline at end of file
+    return user_games.exclude(game_id=current_game.game_id).filter(
+        start_date_and_time__gt=current_game.end_date_and_time
+    ).order_by('start_date_and_time').first()
@@ -1,16 +1,26 @@
-import os
-from dateutil.relativedelta import relativedelta
-from django.contrib.auth import authenticate, login, update_session_auth_hash
+from django.contrib.auth import login, update_session_auth_hash
 from django.contrib import messages
 from django.shortcuts import render, redirect
-from django.utils.timezone import now, make_aware, is_naive
+from django.utils.timezone import now, make_aware, is_naive, localdate
 from Tennis_training_system import settings
-from django.db.models import F
+from django.db.models import F, Prefetch
 from django.conf import settings
 from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.utils.decorators import method_decorator
 import math
-from .utils import check_if_enough_time, get_previous_event, get_following_event
+from .utils import get_day_bounds
+from .tasks import enqueue_conflict_checks, enqueue_profile_picture
+from .profile_pictures import save_original, process_profile_picture
+from .conflicts import recompute_conflicts, detect_game_conflicts, LegMemo
+from .recurrence import create_recurring_games, update_recurring_games
+from .schedule_changes import record_changes, get_latest_change, get_changed_game_ids
+from .day_events_cache import day_events_cache
+from .middleware import skip_session_save
+from .login_throttle import login_throttle, get_client_ip
+from .authentication_backends import EMAIL_BACKEND
+from .participant_search import participant_search
 from .forms import CustomUserCreationForm
 from django.urls import reverse_lazy
 from django.contrib.auth.views import LogoutView
@@ -21,6 +31,7 @@ from .models import Game, Category, Participant, Court, CustomUser, RecurringGro
 from django.contrib.auth.mixins import LoginRequiredMixin
 from datetime import timedelta, datetime, timezone, time
 from django.http import JsonResponse, Http404
+from . import metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,7 +54,7 @@ class RegisterView(FormView):
         :return: Redirects to the success URL after the form is successfully submitted.
         """
         user = form.save()
-        login(self.request, user)
+        login(self.request, user, backend=EMAIL_BACKEND)
         return super().form_valid(form)
 
 
@@ -68,20 +79,37 @@ class CustomLoginView(FormView):
             return redirect(self.success_url)
         return super().dispatch(request, *args, **kwargs)
 
+    def post(self, request, *args, **kwargs):
+        """
+        Turn away login attempts over the per-IP or per-email limit before the form is validated,
+        as validating it hashes the password.
+
+        :param request: The HTTP request object.
+        :return: The login form with status 429 if the attempt is throttled, otherwise the normal response.
+        """
+        email = request.POST.get('username', '')
+        retry_after = login_throttle.attempt(get_client_ip(request), email)
+        if retry_after is not None:
+            messages.error(request, f'Too many login attempts. Please try again in {retry_after} seconds.')
+            response = self.render_to_response(
+                self.get_context_data(form=self.form_class(initial={'username': email})), status=429)
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        return super().post(request, *args, **kwargs)
+
     def form_valid(self, form):
         """
         Handle the form submission when valid data is provided.
-        Authenticates the user using their email and password.
+        The form has already authenticated the user with their email and password.
 
         :param form: The valid login form containing the user's email and password.
         :return: Redirects the authenticated user to the success URL, or reloads the form on failure.
         """
-        email = form.cleaned_data.get('username')
-        password = form.cleaned_data.get('password')
-        user = authenticate(username=email, password=password)
+        user = form.get_user()
 
         if user is not None:
             login(self.request, user)
+            login_throttle.reset_email(form.cleaned_data.get('username'))
             return redirect(self.get_success_url())
         else:
             messages.error(self.request, 'Invalid email or password.')
@@ -117,7 +145,73 @@ class CustomLogoutView(LogoutView):
         return super().dispatch(request, *args, **kwargs)
 
 
-class DayView(LoginRequiredMixin, TemplateView):
+class EventsMixin:
+    """
+    Mixin loading the current user's games together with the layout fields the calendar views need
+    to place them on the hour grid.
+    """
+
+    def get_events(self, start, end):
+        """
+        Retrieve the user's events starting within the half-open range [start, end) with a single query.
+
+        :param start: Aware datetime, the beginning of the range.
+        :param end: Aware datetime, the end of the range (exclusive).
+        :return: A list of event dictionaries ordered by start time.
+        """
+        user = self.request.user
+
+        events_query = Game.objects.filter(
+            start_date_and_time__gte=start,
+            start_date_and_time__lt=end,
+            participant__user=user
+        ).annotate(
+            alert_status=F('participant__alert')
+        ).values(
+            'game_id',
+            'name',
+            'category__name',
+            'category__color',
+            'start_date_and_time',
+            'end_date_and_time',
+            'creator',
+            'creator__profile_picture',
+            'creator__profile_picture_variants',
+            'alert_status',
+        ).order_by('start_date_and_time')
+
+        events = list(events_query)
+
+        for event in events:
+            event['start_date_and_time'] = event['start_date_and_time'].strftime('%Y-%m-%d %H:%M:%S')
+            event['end_date_and_time'] = event['end_date_and_time'].strftime('%Y-%m-%d %H:%M:%S')
+            start_time = event['start_date_and_time'].split(' ')[1]
+            end_time = event['end_date_and_time'].split(' ')[1]
+            start_time_minutes = self.convert_string_time_to_minutes(start_time)
+            end_time_minutes = self.convert_string_time_to_minutes(end_time)
+            duration = end_time_minutes - start_time_minutes
+            event['margin_top'] = (start_time_minutes / 60) * 100
+            event['height'] = (duration / 60) * 100
+
+            event['profile_picture_url'] = CustomUser.build_profile_picture_url(
+                event['creator__profile_picture'], event.pop('creator__profile_picture_variants'), 'small')
+
+            event['is_creator'] = (event['creator'] == user.user_id)
+
+        return events
+
+    def convert_string_time_to_minutes(self, time_str):
+        """
+        Convert a time string in 'HH:MM:SS' format into the total number of minutes.
+
+        :param time_str: A string representing time in 'HH:MM:SS' format.
+        :return: The total number of minutes as an integer.
+        """
+        hours, minutes, _ = map(int, time_str.split(':'))
+        return hours * 60 + minutes
+
+
+class DayView(LoginRequiredMixin, EventsMixin, TemplateView):
     """
     View for displaying and managing games on a daily basis. This view handles
     the display of games, their creation, update, and deletion, as well as
@@ -178,31 +272,13 @@ class DayView(LoginRequiredMixin, TemplateView):
         """
         if self.is_ajax(request):
             if 'fetch_game_details' in request.GET and 'game_id' in request.GET:
-                game_id = request.GET.get('game_id')
-                game = get_object_or_404(Game, game_id=game_id)
-                game_data = {
-                    'name': game.name,
-                    'start_date_and_time': game.start_date_and_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'end_date_and_time': game.end_date_and_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'category': game.category.category_id,
-                    'category_name': game.category.name,
-                    'court': game.court.court_id,
-                    'court_name': game.court.name,
-                    'participants': list(game.participant_set.values_list('user__email', 'user__username')),
-                    'is_creator': (game.creator == request.user),
-                    'group': game.group.group_id if game.group else None,
-                    'recurrence_type': game.group.recurrence_type if game.group else None,
-                    'end_date_of_recurrence': game.group.end_date if game.group else None,
-                }
-                return JsonResponse(game_data)
+                game = get_object_or_404(self.get_game_details_queryset(), game_id=request.GET.get('game_id'))
+                return JsonResponse(self.serialize_game_details(game))
 
             date_str = request.GET.get('date')
-            date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else now().date()
-            events, date_info = self.get_events_and_date_info(date)
-            return JsonResponse({
-                'events': events,
-                **date_info,
-            })
+            date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else localdate()
+            skip_session_save(request)
+            return self.get_events_response(request, date)
         else:
             return super().get(request, *args, **kwargs)
 
@@ -216,71 +292,122 @@ class DayView(LoginRequiredMixin, TemplateView):
         return request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'XMLHttpRequest' in request.headers.get(
             'X-Requested-With', '')
 
-    def get_events_and_date_info(self, date):
+    def get_game_details_queryset(self):
         """
-        Retrieve events and related date information for a specific date.
+        Get the queryset used to load a game with everything its detail view shows: category, court
+        and recurring group are joined, participants and their users are loaded in one extra query.
 
-        :param date: The date for which to retrieve events.
-        :return: A tuple containing a list of events and a dictionary with date information.
+        :return: A Game queryset.
         """
-        user = self.request.user
+        return Game.objects.select_related('category', 'court', 'group').prefetch_related(
+            Prefetch('participant_set', queryset=Participant.objects.select_related('user').order_by('participant_id'))
+        )
 
-        events_query = Game.objects.filter(
-            start_date_and_time__date=date,
-            participant__user=user
-        ).annotate(
-            alert_status=F('participant__alert')
-        ).values(
-            'game_id',
-            'name',
-            'category__name',
-            'category__color',
-            'start_date_and_time',
-            'end_date_and_time',
-            'creator',
-            'creator__profile_picture',
-            'alert_status',
-        ).order_by('start_date_and_time')
+    def serialize_game_details(self, game):
+        """
+        Serialise a game loaded with get_game_details_queryset() without further queries.
 
-        events = list(events_query)
+        :param game: The game to serialise.
+        :return: A dictionary with the game details.
+        """
+        group = game.group
+        return {
+            'name': game.name,
+            'start_date_and_time': game.start_date_and_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_date_and_time': game.end_date_and_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'category': game.category.category_id,
+            'category_name': game.category.name,
+            'court': game.court.court_id,
+            'court_name': game.court.name,
+            'participants': [
+                (participant.user.email, participant.user.username) for participant in game.participant_set.all()
+            ],
+            'is_creator': (game.creator_id == self.request.user.user_id),
+            'group': group.group_id if group else None,
+            'recurrence_type': group.recurrence_type if group else None,
+            'end_date_of_recurrence': group.end_date if group else None,
+        }
 
-        for event in events:
-            event['start_date_and_time'] = event['start_date_and_time'].strftime('%Y-%m-%d %H:%M:%S')
-            event['end_date_and_time'] = event['end_date_and_time'].strftime('%Y-%m-%d %H:%M:%S')
-            start_time = event['start_date_and_time'].split(' ')[1]
-            end_time = event['end_date_and_time'].split(' ')[1]
-            start_time_minutes = self.convert_string_time_to_minutes(start_time)
-            end_time_minutes = self.convert_string_time_to_minutes(end_time)
-            duration = end_time_minutes - start_time_minutes
-            event['margin_top'] = (start_time_minutes / 60) * 100
-            event['height'] = (duration / 60) * 100
+    def get_events_response(self, request, date):
+        """
+        Build the response to the day poll. The newest change of the user's schedule serves as
+        the version in the ETag, Last-Modified and cursor, so an unchanged schedule is answered with 304.
+        The events of the day are kept in the day events cache together with that version, which
+        makes repeated polls of an unchanged day free of queries. With a `since` cursor only the
+        events added or changed after it and the IDs of the removed ones are returned.
+
+        :param request: The HTTP request object.
+        :param date: The date for which to retrieve events.
+        :return: A JSON response, or 304 if the client's copy is up to date.
+        """
+        user_id = request.user.user_id
+        entry = day_events_cache.get(user_id, date)
+        if entry is not None:
+            cursor, last_modified = entry['cursor'], entry['last_modified']
+        else:
+            cursor, changed_at = get_latest_change(user_id)
+            last_modified = changed_at.timestamp() if changed_at else None
+        etag = f'"{user_id}-{date.isoformat()}-{cursor}"'
 
-            profile_picture = event.get('creator__profile_picture', '')
-            if profile_picture:
-                event['profile_picture_url'] = f"{settings.MEDIA_URL}{profile_picture}"
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            metrics.increment('day_poll.not_modified')
+        else:
+            if entry is not None:
+                events = entry['events']
             else:
-                event['profile_picture_url'] = settings.STATIC_URL + 'images/Ola.png'
+                events = self.get_events(*get_day_bounds(date))
+                day_events_cache.set(user_id, date, events, cursor, last_modified)
 
-            event['is_creator'] = (event['creator'] == self.request.user.user_id)
+            since = request.GET.get('since', '')
+            changed_game_ids = None
+            if since.isdigit() and int(since) <= cursor:
+                changed_game_ids = get_changed_game_ids(user_id, int(since))
 
-        date_info = {
-            'current_date': date.strftime('%d %B %Y'),
-            'current_day_of_week': date.strftime('%A'),
-            'prev_date': (date - timedelta(days=1)).strftime('%Y-%m-%d'),
-            'next_date': (date + timedelta(days=1)).strftime('%Y-%m-%d'),
-        }
+            if changed_game_ids is None:
+                metrics.increment('day_poll.full')
+                response = JsonResponse({'events': events, 'cursor': cursor, **self.get_date_info(date)})
+            else:
+                metrics.increment('day_poll.delta')
+                changed = [event for event in events if event['game_id'] in changed_game_ids]
+                removed = changed_game_ids - {event['game_id'] for event in changed}
+                response = JsonResponse({
+                    'changed': changed,
+                    'removed': sorted(removed),
+                    'cursor': cursor,
+                    **self.get_date_info(date),
+                })
+
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        # Revalidated on every poll and never kept by shared caches, as the events are the user's
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        return events, date_info
+    def get_events_and_date_info(self, date):
+        """
+        Retrieve events and related date information for a specific date.
 
-    def convert_string_time_to_minutes(self, time_str):
+        :param date: The date for which to retrieve events.
+        :return: A tuple containing a list of events and a dictionary with date information.
         """
-        Convert a time string in 'HH:MM:SS' format into the total number of minutes.
+        events = self.get_events(*get_day_bounds(date))
+        return events, self.get_date_info(date)
 
-        :param time_str: A string representing time in 'HH:MM:SS' format.
-        :return: The total number of minutes as an integer.
+    def get_date_info(self, date):
         """
-        hours, minutes, _ = map(int, time_str.split(':'))
-        return hours * 60 + minutes
+        Get the labels and navigation dates shown with the events of a day.
+
+        :param date: The displayed date.
+        :return: A dictionary with date information.
+        """
+        return {
+            'current_date': date.strftime('%d %B %Y'),
+            'current_day_of_week': date.strftime('%A'),
+            'prev_date': (date - timedelta(days=1)).strftime('%Y-%m-%d'),
+            'next_date': (date + timedelta(days=1)).strftime('%Y-%m-%d'),
+        }
 
     def post(self, request, *args, **kwargs):
         """
@@ -344,7 +471,10 @@ class DayView(LoginRequiredMixin, TemplateView):
         Core logic for handling both creation and update of a game.
         This method processes the game form, checks for scheduling conflicts
         for both the game creator and each participant, and handles recurrence logic.
+        With CONFLICT_CHECKS_ASYNC the game is saved right away and the conflict checks
+        are left to the background worker.
         """
+        previous_day = localdate(game_instance.start_date_and_time) if is_update else None
         game_form = GameForm(request.POST, instance=game_instance) if is_update else GameForm(request.POST)
 
         if not game_form.is_valid():
@@ -355,40 +485,62 @@ class DayView(LoginRequiredMixin, TemplateView):
         end_date_of_recurrence = game_form.cleaned_data.get('end_date_of_recurrence')
 
         game_instance = self._save_game_instance(game_form, game_instance, request, is_update, commit=False)
-
-        conflicts = self._handle_participants(request, game_instance, participants, is_update, dry_run=True)
-
-        if len(conflicts) > 0 and request.POST.get('confirm') != 'true':
-            logger.info(f'Sending conflicts response: {conflicts}')
-            return JsonResponse({
-                'success': False,
-                'message': f"There are conflicts for the following participants:\n" +
-                           "\n".join([
-                               f"{conflict['participant']}: (Travel: {math.ceil(conflict['travel_time'] or 0)} mins, Gap: {math.ceil(conflict['time_available'] or 0)} mins)"
-                               for conflict in conflicts]),
-                'confirm_needed': True
-            }, status=409)
+        check_conflicts = not settings.CONFLICT_CHECKS_ASYNC
+        # Shared by the dry run and the commit pass, and through the cache with the confirm re-post
+        conflict_memo = LegMemo()
+
+        if check_conflicts:
+            conflicts = detect_game_conflicts(game_instance, participants, memo=conflict_memo)
+
+            if len(conflicts) > 0 and request.POST.get('confirm') != 'true':
+                logger.info(f'Sending conflicts response: {conflicts}')
+                return JsonResponse({
+                    'success': False,
+                    'message': f"There are conflicts for the following participants:\n" +
+                               "\n".join([
+                                   f"{conflict['participant']}: (Travel: {self._format_travel_time(conflict['travel_time'])}, Gap: {math.ceil(conflict['time_available'] or 0)} mins)"
+                                   for conflict in conflicts]),
+                    'conflicts': conflicts,
+                    'confirm_needed': True
+                }, status=409)
 
         if not is_update:
             if recurrence_type not in [None, '', 'none', 'Null', 'null'] and end_date_of_recurrence:
                 recurring_group = RecurringGroup.objects.create(
                     recurrence_type=recurrence_type,
-                    start_date=game_instance.start_date_and_time.date(),
+                    start_date=localdate(game_instance.start_date_and_time),
                     end_date=end_date_of_recurrence
                 )
                 game_instance.group = recurring_group
 
         game_instance = self._save_game_instance(game_form, game_instance, request, is_update, commit=True)
-        self._handle_participants(request, game_instance, participants, is_update, dry_run=False)
+        affected_users = self._sync_participants(game_instance, participants)
 
         game_form.save_m2m()
 
+        affected_days = {localdate(game_instance.start_date_and_time)}
+        if previous_day:
+            affected_days.add(previous_day)
         if is_update and game_instance.group:
-            self._handle_recurrence_update(game_instance, participants)
+            affected_days.update(self._handle_recurrence_update(game_instance, participants))
         elif recurrence_type not in [None, '', 'none', 'Null', 'null'] and end_date_of_recurrence:
-            self._handle_recurrence(game_instance, participants, recurrence_type, end_date_of_recurrence)
+            affected_days.update(
+                self._handle_recurrence(game_instance, participants, recurrence_type, end_date_of_recurrence))
 
-        return JsonResponse({'success': True, 'message': 'Game added successfully'})
+        if not check_conflicts:
+            enqueue_conflict_checks(affected_users, affected_days)
+            return JsonResponse({'success': True, 'message': 'Game added successfully', 'conflicts_pending': True})
+
+        recompute_conflicts(affected_users, affected_days, memo=conflict_memo)
+        return JsonResponse({'success': True, 'message': 'Game added successfully', 'conflicts': conflicts})
+
+    @staticmethod
+    def _format_travel_time(travel_time):
+        """
+        Format a conflict's travel time; without one the straight-line distance already showed
+        that the trip takes longer than the gap.
+        """
+        return f"{math.ceil(travel_time)} mins" if travel_time is not None else "longer than the gap"
 
     def _save_game_instance(self, game_form, game_instance, request, is_update, commit=True):
         """
@@ -403,236 +555,52 @@ class DayView(LoginRequiredMixin, TemplateView):
             game_instance.save()  # Now commit to the database if commit is True
         return game_instance
 
-    def _handle_participants(self, request, game_instance, participants, is_update, dry_run=False):
-        conflicts = []
-        current_participants = set()
-
-        # Only retrieve current participants if it's an update and game_instance is saved
-        if game_instance.game_id and is_update:
-            current_participants = set(game_instance.participant_set.all().values_list('user', flat=True))
-
-        if is_update:
-            new_participants = set(participants.values_list('user_id', flat=True))
-            participants_to_remove = current_participants - new_participants
-            participants_to_add = new_participants - current_participants
-
-            if not dry_run:
-                for participant_id in participants_to_remove:
-                    Participant.objects.filter(user__user_id=participant_id, game=game_instance).delete()
-
-                for user_id in participants_to_add:
-                    user_instance = CustomUser.objects.get(user_id=user_id)
-                    Participant.objects.get_or_create(user=user_instance, game=game_instance)
-
-                simulated_participants = set(game_instance.participant_set.all().values_list('user', flat=True))
-            else:
-                simulated_participants = new_participants
-        else:
-            simulated_participants = set(participants.values_list('user_id', flat=True))
-
-            if not dry_run:
-                for user in participants:
-                    Participant.objects.get_or_create(user=user, game=game_instance)
-
-        for user_id in simulated_participants:
-            user_instance = CustomUser.objects.get(user_id=user_id)
-            print(f'looping through {user_instance}')
-            if not dry_run:
-                participant_instance, _ = Participant.objects.get_or_create(user=user_instance, game=game_instance)
-            else:
-                participant_instance = Participant(user=user_instance, game=game_instance)
-
-            participant_games = Game.objects.filter(
-                participant__user=user_instance,
-                start_date_and_time__date=game_instance.start_date_and_time.date()
-            ).order_by('start_date_and_time')
-
-            participant_preceding_event = get_previous_event(participant_games, game_instance.start_date_and_time)
-            if participant_preceding_event:
-                conflict = self._check_participant_conflict(
-                    request, participant_instance, participant_preceding_event, game_instance, dry_run
-                )
-                if conflict:
-                    conflicts.append(conflict)
-
-            participant_following_event = get_following_event(participant_games, game_instance)
-            if participant_following_event:
-                following_event_participants = participant_following_event.participant_set.all()
-                for following_participant in following_event_participants:
-                    conflict = self._check_participant_conflict(
-                        request, following_participant, game_instance, participant_following_event, dry_run
-                    )
-                    if conflict:
-                        conflicts.append(conflict)
-
-        return conflicts
-
-    def _check_participant_conflict(self, request, participant_instance, preceding_event, following_event, dry_run=False):
-        """
-        Helper function to handle participant conflict checks.
-        If dry_run is False, it also saves the calculated travel time, available time, and alert to the database.
-        """
-        if preceding_event is None:
-            participant_instance.alert = False
-            participant_instance.travel_time = None
-            participant_instance.time_available = None
-            participant_instance.save()
-            return None
-
-        event_end_time = preceding_event.end_date_and_time
-        new_game_start = following_event.start_date_and_time
-        event_court = preceding_event.court
-        new_game_court = following_event.court
-
-        if not event_court:
-            return
-
-        travel_time, time_available, alert = check_if_enough_time(
-            event_end_time,
-            new_game_start,
-            event_court,
-            new_game_court,
-            request
-        )
-
-        if not dry_run:
-            participant_instance.alert = alert
-            participant_instance.travel_time = travel_time
-            participant_instance.time_available = time_available
-            participant_instance.save()
+    def _sync_participants(self, game_instance, participants):
+        """
+        Make the Participant rows of a saved game match the selected users with one delete and one bulk insert.
 
-        if travel_time is not None and time_available is not None:
-            if travel_time > time_available:
-                return {
-                    'participant': participant_instance.user.username,
-                    'travel_time': travel_time,
-                    'time_available': time_available,
-                    'alert': alert
-                }
+        :param game_instance: The saved game.
+        :param participants: The selected users.
+        :return: IDs of all users whose schedule changed, including removed ones.
+        """
+        current_participants = set(game_instance.participant_set.values_list('user_id', flat=True))
+        new_participants = set(participants.values_list('user_id', flat=True))
 
-        return None
+        Participant.objects.filter(game=game_instance, user_id__in=current_participants - new_participants).delete()
+        Participant.objects.bulk_create([
+            Participant(user_id=user_id, game=game_instance)
+            for user_id in new_participants - current_participants
+        ])
+        game_day = localdate(game_instance.start_date_and_time)
+        record_changes((user_id, game_instance.game_id, game_day) for user_id in new_participants - current_participants)
+        return current_participants | new_participants
 
     def _handle_recurrence_update(self, game, participants):
-        print("handling reccurence update!!!!!!")
-        current_start = game.start_date_and_time
-        current_end = game.end_date_and_time
-        idx = 0
-
-        if game.group_id:
-            games_in_group = Game.objects.filter(group_id=game.group.group_id).order_by('start_date_and_time')
-
-            for idx, game_instance in enumerate(games_in_group):
-                if idx == 0:
-                    game_instance.start_date_and_time = current_start
-                    game_instance.end_date_and_time = current_end
-                else:
-                    delta = self._get_delta_by_recurrence_type(game.group.recurrence_type, idx)
-                    game_instance.start_date_and_time = current_start + delta
-                    game_instance.end_date_and_time = current_end + delta
-
-                game_instance.court = game.court
-                game_instance.name = game.name
-                game_instance.save()
-
-                game_instance.participant_set.all().delete()
-                for user in participants:
-                    Participant.objects.create(user=user, game=game_instance)
-
-                for participant in participants:
-                    print(f"Processing participant: {participant.username}")
-
-                    participant_games = Game.objects.filter(
-                        participant__user=participant,
-                        start_date_and_time__date=game.start_date_and_time.date()
-                    ).order_by('start_date_and_time')
-
-                    participant_preceding_event = get_previous_event(participant_games, game.start_date_and_time)
-                    if participant_preceding_event:
-                        self._check_participant_conflict(
-                            None, participant, participant_preceding_event, game, dry_run=False
-                        )
-
-                    participant_following_event = get_following_event(participant_games, game)
-                    if participant_following_event:
-                        following_event_participants = participant_following_event.participant_set.all()
-                        for following_participant in following_event_participants:
-                            self._check_participant_conflict(
-                                None, following_participant, game, participant_following_event, dry_run=False)
+        """
+        Apply the changes of a recurring game to every game of its group.
+
+        :param game: The updated game instance.
+        :param participants: List of participants for the games.
+        :return: The dates of the group's games before and after the update.
+        """
+        games, previous_days = update_recurring_games(game, participants)
+        logger.debug(f"Updated {len(games)} game(s) of recurring group {game.group_id}")
+        return previous_days | {localdate(group_game.start_date_and_time) for group_game in games}
 
     def _handle_recurrence(self, game, participants, recurrence_type, end_date_of_recurrence):
         """
         Handles the creation of recurring game events based on recurrence type and end date.
+        All occurrences are created in bulk; their conflicts are evaluated together with the first game.
 
         :param game: The original game instance.
         :param participants: List of participants for the game.
         :param recurrence_type: The type of recurrence (e.g., daily, weekly).
         :param end_date_of_recurrence: The end date for the recurrence.
+        :return: The dates of the created games.
         """
-        print("Handling recurrence creation")
-        end_date_of_recurrence = make_aware(datetime.combine(end_date_of_recurrence, time(23, 59)))
-        current_start = game.start_date_and_time
-        current_end = game.end_date_and_time
-        idx = 1
-
-        while current_start <= end_date_of_recurrence:
-            if current_start != game.start_date_and_time:
-                print(f"Creating game for date: {current_start}")
-                new_game = Game.objects.create(
-                    name=game.name,
-                    category=game.category,
-                    court=game.court,
-                    creator=game.creator,
-                    start_date_and_time=current_start,
-                    end_date_and_time=current_end,
-                    group=game.group
-                )
-                for user in participants:
-                    Participant.objects.create(user=user, game=new_game)
-
-                # Check for adjacent games (preceding and following) for each participant
-                for participant in participants:
-                    print(f"Processing participant: {participant.username}")
-
-                    participant_games = Game.objects.filter(
-                        participant__user=participant,
-                        start_date_and_time__date=game.start_date_and_time.date()
-                    ).order_by('start_date_and_time')
-
-                    participant_preceding_event = get_previous_event(participant_games, game.start_date_and_time)
-                    if participant_preceding_event:
-                        self._check_participant_conflict(
-                            None, participant, participant_preceding_event, game, dry_run=False
-                        )
-
-                    participant_following_event = get_following_event(participant_games, game)
-                    if participant_following_event:
-                        following_event_participants = participant_following_event.participant_set.all()
-                        for following_participant in following_event_participants:
-                            self._check_participant_conflict(
-                                None, following_participant, game, participant_following_event, dry_run=False)
-
-            delta = self._get_delta_by_recurrence_type(recurrence_type, idx)
-
-            print(f"Before applying delta: Start={current_start}, End={current_end}, Delta={delta}")
-            current_start += delta
-            current_end += delta
-            print(f"After applying delta: Start={current_start}, End={current_end}")
-
-            idx = 1
-
-    def _get_delta_by_recurrence_type(self, recurrence_type, idx):
-        """
-        Return the appropriate time delta based on recurrence type and index.
-        """
-        if recurrence_type == 'daily':
-            return timedelta(days=idx)
-        elif recurrence_type == 'weekly':
-            return timedelta(weeks=idx)
-        elif recurrence_type == 'biweekly':
-            return timedelta(weeks=2 * idx)
-        elif recurrence_type == 'monthly':
-            return relativedelta(months=idx)
-        return timedelta(0)
+        games = create_recurring_games(game, participants, recurrence_type, end_date_of_recurrence)
+        logger.info(f"Created {len(games)} {recurrence_type} recurring game(s) of game {game.game_id}")
+        return {localdate(new_game.start_date_and_time) for new_game in games}
 
     def handle_game_delete(self, request):
         """
@@ -650,76 +618,19 @@ class DayView(LoginRequiredMixin, TemplateView):
             return JsonResponse({'success': False, 'message': 'You do not have permission to delete this game'},
                                 status=403)
 
-        # Identify participants of the game to be deleted
-        participants = game.participant_set.all()
-
-        adjacent_games = {}
-        for participant in participants:
-            preceding_game, following_game = self._get_adjacent_games(participant.user, game)
-            if preceding_game or following_game:
-                adjacent_games[participant.user] = (preceding_game, following_game)
-
-        # Delete the game (either group or single occurrence)
-        if game.group not in [None, '', 'none', 'Null', 'null']:
-            Game.objects.filter(group=game.group).delete()
-        else:
-            Game.objects.filter(game_id=game_id).delete()
+        games_to_delete = Game.objects.filter(group=game.group) if game.group else Game.objects.filter(game_id=game_id)
+        affected_users = set(Participant.objects.filter(game__in=games_to_delete).values_list('user_id', flat=True))
+        affected_days = {localdate(start) for start in games_to_delete.values_list('start_date_and_time', flat=True)}
+        games_to_delete.delete()
 
-        # After deletion, update travel time, time available, and alert for adjacent games
-        for user, (preceding_game, following_game) in adjacent_games.items():
-            self._update_conflicts_after_deletion(user, preceding_game, following_game)
+        # The remaining games of the participants on those days get their travel times recalculated
+        if settings.CONFLICT_CHECKS_ASYNC:
+            enqueue_conflict_checks(affected_users, affected_days)
+            return JsonResponse({'success': True, 'message': 'Game(s) deleted successfully', 'conflicts_pending': True})
 
+        recompute_conflicts(affected_users, affected_days)
         return JsonResponse({'success': True, 'message': 'Game(s) deleted successfully'})
 
-    def _get_adjacent_games(self, user, game):
-        """
-        Get the preceding and following games for a participant on the same day as the given game.
-        """
-        games_on_same_day = Game.objects.filter(
-            participant__user=user,
-            start_date_and_time__date=game.start_date_and_time.date()
-        ).exclude(game_id=game.game_id).order_by('start_date_and_time')
-
-        preceding_game = get_previous_event(games_on_same_day, game.start_date_and_time)
-        following_game = get_following_event(games_on_same_day, game)
-
-        return preceding_game, following_game
-
-    def _update_conflicts_after_deletion(self, user, preceding_game, following_game):
-        """
-        Updates travel time, available time, and alert between adjacent games.
-        Handles cases where either preceding or following game is None.
-        """
-        if preceding_game and following_game:
-            # Both games exist, handle conflicts between them
-            participant_instance = Participant.objects.get(user=user, game=following_game)
-            self._check_participant_conflict(
-                request=None,
-                participant_instance=participant_instance,
-                preceding_event=preceding_game,
-                following_event=following_game,
-                dry_run=False
-            )
-        elif preceding_game:
-            participant_instance = Participant.objects.get(user=user, game=preceding_game)
-            pre_preceding_current = self._get_adjacent_games(participant_instance.user, preceding_game)
-            pre_preceding = pre_preceding_current[0]
-            self._check_participant_conflict(
-                request=None,
-                participant_instance=participant_instance,
-                preceding_event=pre_preceding,
-                following_event=preceding_game,
-                dry_run=False
-            )
-        elif following_game:
-            # Only the following game exists, no preceding game
-            participant_instance = Participant.objects.get(user=user, game=following_game)
-            # Reset the alert, travel_time, and available_time for this game
-            participant_instance.alert = False
-            participant_instance.travel_time = None
-            participant_instance.time_available = None
-            participant_instance.save()
-
     def handle_category_form(self, request):
         """
         Handle the submission of a new category form. Validates and saves the category data.
@@ -763,21 +674,21 @@ class UsersProfile(LoginRequiredMixin, View):
 
     def save_profile_picture(self, profile_picture):
         """
-        Save the uploaded profile picture to the media directory.
+        Store the uploaded profile picture under a content-addressed name and schedule creation
+        of its resized variants, which replace the original on the pages once they are ready.
 
         :param profile_picture: The uploaded profile picture file.
         :return: The file path where the profile picture is saved.
         """
-        file_name = profile_picture.name
-        file_path = os.path.join('profile_pictures', file_name)
-        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-        with open(full_path, 'wb+') as destination:
-            for chunk in profile_picture.chunks():
-                destination.write(chunk)
+        file_path = save_original(profile_picture)
+        self.request.user.profile_picture = file_path
+        self.request.user.profile_picture_variants = {}
+        self.request.user.save()
 
+        if settings.PROFILE_PICTURES_ASYNC:
+            enqueue_profile_picture(self.request.user.user_id)
+        else:
+            process_profile_picture(self.request.user.user_id)
         return file_path
 
     def post(self, request):
@@ -793,9 +704,7 @@ class UsersProfile(LoginRequiredMixin, View):
             profile_form = ProfilePictureUpdateForm(request.POST, request.FILES)
             if profile_form.is_valid():
                 profile_picture = profile_form.cleaned_data['profile_picture']
-                file_path = self.save_profile_picture(profile_picture)
-                request.user.profile_picture = file_path
-                request.user.save()
+                self.save_profile_picture(profile_picture)
                 messages.success(request, 'Your profile picture has been updated.')
             else:
                 messages.error(request, 'There has been an error while updating the profile picture.')
@@ -904,4 +813,74 @@ class CourtsView(LoginRequiredMixin, TemplateView):
         :return: True if the request is an AJAX request, False otherwise.
         """
         return request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'XMLHttpRequest' in request.headers.get(
-            'X-Requested-With', '')
\ No newline at end of file
+            'X-Requested-With', '')
+
+
+class EventsRangeView(LoginRequiredMixin, EventsMixin, View):
+    """
+    View returning the user's events for a range of days (a week or a month) in one response,
+    so the calendar does not have to request every day separately.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests with `start` and `end` parameters (YYYY-MM-DD) describing the
+        half-open range of days [start, end).
+
+        :param request: The HTTP request object.
+        :return: A JSON response with the events grouped by day, or 400 for an invalid range.
+        """
+        skip_session_save(request)
+        try:
+            start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+            end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'start and end dates in YYYY-MM-DD format are required'}, status=400)
+
+        days_count = (end - start).days
+        if days_count <= 0 or days_count > settings.EVENTS_RANGE_MAX_DAYS:
+            return JsonResponse(
+                {'error': f'The range must cover between 1 and {settings.EVENTS_RANGE_MAX_DAYS} days'}, status=400)
+
+        days = {(start + timedelta(days=i)).strftime('%Y-%m-%d'): [] for i in range(days_count)}
+        range_start, _ = get_day_bounds(start)
+        range_end, _ = get_day_bounds(end)
+        for event in self.get_events(range_start, range_end):
+            days.setdefault(event['start_date_and_time'][:10], []).append(event)
+
+        return JsonResponse({'days': days})
+
+
+class ParticipantSearchView(LoginRequiredMixin, View):
+    """
+    View answering the participants autocomplete of the game form.
+    """
+
+    @method_decorator(cache_control(private=True, max_age=settings.PARTICIPANT_SEARCH_MAX_AGE))
+    def get(self, request):
+        """
+        Handle GET requests with the typed `term`, in the response format of django_select2.
+
+        :param request: The HTTP request object.
+        :return: A JSON response with the matching users, the user's co-players first.
+        """
+        skip_session_save(request)
+        results = participant_search.search(request.GET.get('term', ''), request.user.pk)
+        return JsonResponse({'results': results, 'more': False})
+
+
+class MetricsView(LoginRequiredMixin, View):
+    """
+    View exposing the process-wide performance counters (routing client, caches) to admins.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests by returning a snapshot of all counters as JSON.
+
+        :param request: The HTTP request object.
+        :return: A JSON response with the counters, or 403 for non-admin users.
+        """
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'You do not have permission to perform this action'}, status=403)
+        return JsonResponse(metrics.snapshot(request.GET.get('prefix', '')))
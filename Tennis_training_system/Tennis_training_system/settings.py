@@ -42,6 +42,7 @@ AUTH_USER_MODEL = 'Tennis.CustomUser'
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'Tennis.apps.TennisConfig',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -52,11 +53,12 @@ INSTALLED_APPS = [
     'widget_tweaks',
     'fontawesomefree',
     'django_select2',
+    'channels',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'Tennis.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -84,19 +86,54 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Tennis_training_system.wsgi.application'
+ASGI_APPLICATION = 'Tennis_training_system.asgi.application'
+
+# Channel layer delivering schedule changes to the users' WebSocket connections.
+# The in-memory layer only reaches sockets of the same process; with several processes
+# (or the background job worker) point CHANNEL_LAYER_BACKEND at a shared layer, as compose.yaml
+# does with Redis. Check Tennis.W001 warns about the in-memory layer when jobs run in the worker.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': env.str('CHANNEL_LAYER_BACKEND', default='channels.layers.InMemoryChannelLayer'),
+        'CONFIG': env.json('CHANNEL_LAYER_CONFIG', default={}),
+    },
+}
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Seconds a connection stays open for the following requests of the same thread (0 closes it after
+# every request); with health checks a reused connection is tested before the request uses it
+DB_CONN_MAX_AGE = env.int('DB_CONN_MAX_AGE', default=60)
+DB_CONN_HEALTH_CHECKS = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+
+# Optional pool shared by the threads of a process: DB_POOL_SIZE connections are kept open,
+# DB_POOL_MAX_OVERFLOW more may be opened under load, and a request waits up to DB_POOL_TIMEOUT
+# seconds for a free one. Connections idle longer than DB_POOL_RECYCLE seconds are replaced.
+# With the pool, connections are handed back after every request instead of using DB_CONN_MAX_AGE
+DB_POOL_ENABLED = env.bool('DB_POOL_ENABLED', default=False)
+DB_POOL_SIZE = env.int('DB_POOL_SIZE', default=10)
+DB_POOL_MAX_OVERFLOW = env.int('DB_POOL_MAX_OVERFLOW', default=5)
+DB_POOL_TIMEOUT = env.float('DB_POOL_TIMEOUT', default=10.0)
+DB_POOL_RECYCLE = env.float('DB_POOL_RECYCLE', default=1800.0)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'Tennis.pooled_postgresql' if DB_POOL_ENABLED else 'django.db.backends.postgresql',
         'NAME': env('DB_NAME'),
         'USER': env('DB_USER'),
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'MAX_OVERFLOW': DB_POOL_MAX_OVERFLOW,
+            'TIMEOUT': DB_POOL_TIMEOUT,
+            'RECYCLE': DB_POOL_RECYCLE,
+        },
     }
 }
 
@@ -118,7 +155,10 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# EmailBackend checks the credentials and loads session users through the user cache;
+# ModelBackend is only listed so sessions created with it keep working
 AUTHENTICATION_BACKENDS = [
+    'Tennis.authentication_backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
 
@@ -134,6 +174,115 @@ USE_I18N = True
 USE_TZ = True
 
 MAPBOX_API_KEY = os.getenv('MAPBOX_ACCESS_TOKEN')
+
+# Travel time cache (seconds / number of court pairs)
+TRAVEL_TIME_CACHE_TTL = env.int('TRAVEL_TIME_CACHE_TTL', default=7 * 24 * 60 * 60)
+TRAVEL_TIME_CACHE_MAX_ENTRIES = env.int('TRAVEL_TIME_CACHE_MAX_ENTRIES', default=2048)
+TRAVEL_TIME_CACHE_MAX_ROWS = env.int('TRAVEL_TIME_CACHE_MAX_ROWS', default=50000)
+# Stored travel times between two trims of the table (per process), and seconds between two checks
+# for courts invalidated by another process
+TRAVEL_TIME_CACHE_EVICT_EVERY = env.int('TRAVEL_TIME_CACHE_EVICT_EVERY', default=500)
+TRAVEL_TIME_CACHE_SYNC_INTERVAL = env.float('TRAVEL_TIME_CACHE_SYNC_INTERVAL', default=5.0)
+# The driving-traffic Matrix API accepts up to 10 coordinates per request
+MAPBOX_MATRIX_MAX_COORDINATES = env.int('MAPBOX_MATRIX_MAX_COORDINATES', default=10)
+
+# Straight-line speed bounds (km/h) used to skip routing when a gap is clearly long or short enough
+TRAVEL_TIME_PREFILTER_ENABLED = env.bool('TRAVEL_TIME_PREFILTER_ENABLED', default=True)
+TRAVEL_TIME_MIN_SPEED_KMH = env.float('TRAVEL_TIME_MIN_SPEED_KMH', default=10.0)
+TRAVEL_TIME_MAX_SPEED_KMH = env.float('TRAVEL_TIME_MAX_SPEED_KMH', default=100.0)
+
+# Routing HTTP client (timeouts and backoff in seconds)
+ROUTING_POOL_SIZE = env.int('ROUTING_POOL_SIZE', default=10)
+ROUTING_CONNECT_TIMEOUT = env.float('ROUTING_CONNECT_TIMEOUT', default=3.05)
+ROUTING_READ_TIMEOUT = env.float('ROUTING_READ_TIMEOUT', default=5.0)
+ROUTING_MAX_RETRIES = env.int('ROUTING_MAX_RETRIES', default=2)
+ROUTING_BACKOFF = env.float('ROUTING_BACKOFF', default=0.2)
+ROUTING_BACKOFF_MAX = env.float('ROUTING_BACKOFF_MAX', default=2.0)
+ROUTING_BREAKER_THRESHOLD = env.int('ROUTING_BREAKER_THRESHOLD', default=5)
+ROUTING_BREAKER_RESET_TIMEOUT = env.float('ROUTING_BREAKER_RESET_TIMEOUT', default=30.0)
+
+# Background jobs; with CONFLICT_CHECKS_ASYNC games are saved at once and
+# travel time conflicts are computed by `manage.py run_background_jobs`
+CONFLICT_CHECKS_ASYNC = env.bool('CONFLICT_CHECKS_ASYNC', default=False)
+BACKGROUND_JOBS_MAX_ATTEMPTS = env.int('BACKGROUND_JOBS_MAX_ATTEMPTS', default=5)
+# Seconds a worker holds the jobs it claimed; jobs of a worker that died are run again afterwards,
+# so it must be longer than a batch takes to run
+BACKGROUND_JOBS_LEASE = env.int('BACKGROUND_JOBS_LEASE', default=600)
+
+# Cache shared by the processes of a deployment (e.g. CACHE_URL=pymemcache://memcached:11211);
+# the default local-memory cache is private to each process (check Tennis.W002 warns about it when jobs
+# run in the worker)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Session storage: 'cached_db' reads sessions from the cache and writes them through to the database,
+# 'cache' keeps them in the cache only (needs a shared and persistent CACHE_URL), 'db' only uses the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + env.str('SESSION_BACKEND', default='cached_db')
+
+# Seconds the user of an authenticated session stays cached; saving the user invalidates it (0 disables)
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=300)
+
+# Login attempts allowed per client IP and per email address: a burst, then a steady rate per minute.
+# Throttled attempts are rejected before the password is hashed
+LOGIN_THROTTLE_ENABLED = env.bool('LOGIN_THROTTLE_ENABLED', default=True)
+LOGIN_THROTTLE_IP_BURST = env.int('LOGIN_THROTTLE_IP_BURST', default=20)
+LOGIN_THROTTLE_IP_PER_MINUTE = env.float('LOGIN_THROTTLE_IP_PER_MINUTE', default=10.0)
+LOGIN_THROTTLE_EMAIL_BURST = env.int('LOGIN_THROTTLE_EMAIL_BURST', default=5)
+LOGIN_THROTTLE_EMAIL_PER_MINUTE = env.float('LOGIN_THROTTLE_EMAIL_PER_MINUTE', default=1.0)
+# request.META key holding the client address set by the reverse proxy (the bundled nginx sets X-Real-IP).
+# It is only read on connections from TRUSTED_PROXIES (addresses or networks, e.g. 172.16.0.0/12);
+# from anywhere else REMOTE_ADDR is used, as a client could send the header itself
+CLIENT_IP_HEADER = env.str('CLIENT_IP_HEADER', default='HTTP_X_REAL_IP')
+TRUSTED_PROXIES = env.list('TRUSTED_PROXIES', default=[])
+
+# Seconds a user's day of events stays cached; changes invalidate the affected days immediately,
+# the timeout only bounds how long an entry can outlive a missed invalidation
+DAY_EVENTS_CACHE_TIMEOUT = env.int('DAY_EVENTS_CACHE_TIMEOUT', default=300)
+
+# Seconds the result of a travel time check between two games is remembered across requests,
+# so the confirm re-post of a conflicting save does not check it again (0 disables)
+CONFLICT_MEMO_TIMEOUT = env.int('CONFLICT_MEMO_TIMEOUT', default=120)
+
+# Court geocoding: 'nominatim' (OpenStreetMap) or 'gazetteer', a local JSON file of
+# {"address": [latitude, longitude]} for tests and deployments without network access
+GEOCODING_PROVIDER = env.str('GEOCODING_PROVIDER', default='nominatim')
+GEOCODING_GAZETTEER_PATH = env.str('GEOCODING_GAZETTEER_PATH', default=str(BASE_DIR / 'gazetteer.json'))
+GEOCODING_USER_AGENT = env.str('GEOCODING_USER_AGENT', default='Tennis')
+GEOCODING_TIMEOUT = env.float('GEOCODING_TIMEOUT', default=5.0)
+# Provider requests per second and process; the Nominatim usage policy allows at most one (0 disables)
+GEOCODING_RATE_LIMIT = env.float('GEOCODING_RATE_LIMIT', default=1.0)
+# Seconds an address the provider did not find is remembered before it is looked up again
+GEOCODING_NOT_FOUND_TTL = env.int('GEOCODING_NOT_FOUND_TTL', default=24 * 60 * 60)
+# With GEOCODING_ASYNC court saves only apply cached locations; new addresses are
+# geocoded by `manage.py run_background_jobs`
+GEOCODING_ASYNC = env.bool('GEOCODING_ASYNC', default=False)
+
+# Square sizes (px) profile pictures are resized to: event tiles show them at 30px, the avatars at 100px,
+# both doubled for high-density screens. With PROFILE_PICTURES_ASYNC resizing is left to
+# `manage.py run_background_jobs` (the compose worker); until it is done the original is shown
+PROFILE_PICTURE_SIZES = env.json('PROFILE_PICTURE_SIZES', default={'small': 60, 'medium': 200})
+PROFILE_PICTURE_QUALITY = env.int('PROFILE_PICTURE_QUALITY', default=80)
+PROFILE_PICTURES_ASYNC = env.bool('PROFILE_PICTURES_ASYNC', default=False)
+
+# Participants autocomplete: characters typed before searching, results returned, users matching one
+# prefix that are cached (a longer prefix is then filtered from them) and co-players ranked first
+PARTICIPANT_SEARCH_MIN_LENGTH = env.int('PARTICIPANT_SEARCH_MIN_LENGTH', default=2)
+PARTICIPANT_SEARCH_RESULTS = env.int('PARTICIPANT_SEARCH_RESULTS', default=20)
+PARTICIPANT_SEARCH_CANDIDATES = env.int('PARTICIPANT_SEARCH_CANDIDATES', default=200)
+PARTICIPANT_SEARCH_COPLAYERS = env.int('PARTICIPANT_SEARCH_COPLAYERS', default=100)
+# Seconds searched prefixes and co-players stay cached; adding, removing or renaming a user clears them
+PARTICIPANT_SEARCH_CACHE_TIMEOUT = env.int('PARTICIPANT_SEARCH_CACHE_TIMEOUT', default=600)
+# Seconds the browser may reuse a search response
+PARTICIPANT_SEARCH_MAX_AGE = env.int('PARTICIPANT_SEARCH_MAX_AGE', default=60)
+
+# Longest range of days the week/month events endpoint serves in one request (six weeks of a month view)
+EVENTS_RANGE_MAX_DAYS = env.int('EVENTS_RANGE_MAX_DAYS', default=42)
+
+# How long `manage.py prune_schedule_changes` keeps the change log behind the day-view poll cursors;
+# clients with an older cursor simply receive the whole day again
+SCHEDULE_CHANGES_RETENTION_HOURS = env.int('SCHEDULE_CHANGES_RETENTION_HOURS', default=24)
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -141,10 +290,16 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static/Tennis',]
 STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # Content-hashed names plus precompressed .gz (and, with the brotli package, .br) copies
     "staticfiles": {
-        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        "BACKEND": "Tennis.storage.CompressedManifestStaticFilesStorage",
     },
 }
+# A compressed copy is only kept if it is smaller than this fraction of the original
+STATIC_COMPRESSION_MIN_RATIO = env.float('STATIC_COMPRESSION_MIN_RATIO', default=0.95)
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'mediafiles'
@@ -158,17 +313,46 @@ LOGOUT_REDIRECT_URL = env('LOGOUT_REDIRECT_URL')
 LOGIN_URL = env('LOGIN_URL')
 LOGIN_REDIRECT_URL = env('LOGIN_REDIRECT_URL')
 
+# Logging: records are queued by the calling thread and written by a background thread.
+# LOG_FORMAT is 'json' (one object per line) or 'text'; LOG_LEVELS sets the level of single loggers
+LOG_LEVEL = env.str('LOG_LEVEL', default='INFO')
+LOG_LEVELS = env.json('LOG_LEVELS', default={'django': 'INFO', 'django.db.backends': 'INFO', 'Tennis': 'INFO'})
+LOG_FORMAT = env.str('LOG_FORMAT', default='json')
+# Records waiting for the writer thread; further records are dropped until it catches up
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+# Only every n-th record of a call site logging with extra=SAMPLED (messages inside loops) is kept
+LOG_SAMPLE_EVERY = env.int('LOG_SAMPLE_EVERY', default=100)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'Tennis.log.StructuredFormatter',
+        },
+        'text': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'Tennis.log.SamplingFilter',
+            'every': LOG_SAMPLE_EVERY,
+        },
+    },
     'handlers': {
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
+        'queue': {
+            '()': 'Tennis.log.BackgroundHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'formatter': LOG_FORMAT,
+            'filters': ['sampling'],
         },
     },
     'root': {
-        'handlers': ['console'],
-        'level': 'DEBUG',
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
     },
+    # Configuring a logger replaces its handlers, so Django's own console handler is dropped
+    # and its records reach the queue through the root logger
+    'loggers': {name: {'level': level} for name, level in LOG_LEVELS.items()},
 }
@@ -4,7 +4,6 @@ echo "----------- Collect static files -----------"
 python manage.py collectstatic --no-input
 
 echo "----------- Apply migration -----------"
-python manage.py makemigrations
 python manage.py migrate
 
 echo "----------- Run django local server --------- "
@@ -9,7 +9,10 @@ let selectedDate;
 
 document.addEventListener("DOMContentLoaded", function() {
     let selectedDate = new Date().toISOString().split('T')[0];
-    const intervalTime = 10000;
+    const intervalTime = 10000,
+        // Changes pushed by another process are lost if the channel layer is not shared, so
+        // the day is still refreshed now and then while the socket is open
+        safetyNetIntervalTime = 60000;
     const checkboxes = document.querySelectorAll('.checkbox-event');
 
     loadEvents(selectedDate);
@@ -58,9 +61,52 @@ document.addEventListener("DOMContentLoaded", function() {
             checkbox.dispatchEvent(new Event('change'));
         });
 
-    setInterval(function() {
-        loadEvents(selectedDate);
-    }, intervalTime);
+    // Changes are pushed over a WebSocket; frequent polling is the fallback while it is unavailable
+    let pollTimer = null,
+        pollInterval = null,
+        reconnectDelay = 1000;
+
+    function startPolling(interval) {
+        if (interval === pollInterval) {
+            return;  // keep the running timer, e.g. across failed reconnection attempts
+        }
+        clearInterval(pollTimer);
+        pollInterval = interval;
+        pollTimer = setInterval(function() {
+            loadEvents(selectedDate);
+        }, interval);
+    }
+
+    function connectScheduleSocket() {
+        if (!('WebSocket' in window)) {
+            startPolling(intervalTime);
+            return;
+        }
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}/ws/schedule/`);
+
+        socket.onopen = function() {
+            startPolling(safetyNetIntervalTime);
+            reconnectDelay = 1000;
+            // Catch up on changes made while the socket was down
+            loadEvents(selectedDate);
+        };
+
+        socket.onmessage = function(message) {
+            const data = JSON.parse(message.data);
+            if (data.type === 'schedule.changed' && (loadedCursor === null || data.cursor > loadedCursor)) {
+                loadEvents(selectedDate);
+            }
+        };
+
+        socket.onclose = function() {
+            startPolling(intervalTime);
+            setTimeout(connectScheduleSocket, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, 60000);
+        };
+    }
+
+    connectScheduleSocket();
 });
 
 function resetForm(form) {
@@ -93,15 +139,50 @@ function handleOutsideClick(form, button) {
     });
 }
 
+// State of the displayed day, so a poll only asks the server for what changed since the last one
+let loadedDate = null,
+    loadedEtag = null,
+    loadedCursor = null,
+    loadedEvents = new Map();
+
 function loadEvents(date) {
+    const headers = {
+        'x-requested-with': 'XMLHttpRequest'
+    };
+    const params = { date: date };
+
+    if (date === loadedDate) {
+        if (loadedEtag) {
+            headers['If-None-Match'] = loadedEtag;
+        }
+        if (loadedCursor !== null) {
+            params.since = loadedCursor;
+        }
+    }
+
     $.ajax({
         url: "/day/",
-        data: { date: date },
-        headers: {
-            'x-requested-with': 'XMLHttpRequest'
-        },
-        success: function(data) {
-            updateEvents(data);
+        data: params,
+        headers: headers,
+        success: function(data, textStatus, jqXHR) {
+            if (jqXHR.status === 304) {
+                return;
+            }
+
+            if (Array.isArray(data.events)) {
+                loadedEvents = new Map(data.events.map(event => [event.game_id, event]));
+            } else {
+                data.removed.forEach(gameId => loadedEvents.delete(gameId));
+                data.changed.forEach(event => loadedEvents.set(event.game_id, event));
+            }
+            loadedDate = date;
+            loadedEtag = jqXHR.getResponseHeader('ETag');
+            loadedCursor = data.cursor;
+
+            const events = Array.from(loadedEvents.values()).sort(
+                (a, b) => a.start_date_and_time.localeCompare(b.start_date_and_time)
+            );
+            updateEvents({...data, events: events});
         },
         error: function(jqXHR, textStatus, errorThrown) {
                     console.error('Failed to fetch events', textStatus, errorThrown);
@@ -39,10 +39,21 @@ let firstDay = currentDate - date.getDay();
 let lastDay = firstDay + 6;
 
 
+const dayContainers = [
+    daysForTheWeekContainerSunday,
+    daysForTheWeekContainerMonday,
+    daysForTheWeekContainerTuesday,
+    daysForTheWeekContainerWednesday,
+    daysForTheWeekContainerThursday,
+    daysForTheWeekContainerFriday,
+    daysForTheWeekContainerSaturday,
+];
+
+
 function renderWeek() {
     week.innerHTML = `${firstDay}  ${months[currentMonth]}  ${currentYear} - ${lastDay}  ${months[lastDayMonth]}  ${currentYear}`;
+    loadWeekEvents();
 }
-renderWeek();
 
 function isLeapYear(year) {
     return (year % 100 === 0) ? (year % 400 === 0) : (year % 4 === 0);
@@ -198,12 +209,10 @@ function prevWeek(){
 
 prevWeekBtn.addEventListener ("click", () => {
     prevWeek();
-    renderWeek();
 });
 
 nextWeekBtn.addEventListener ("click", () => {
     nextWeek(currentDate, 1);
-    renderWeek();
 });
 
 function generateTimeline() {
@@ -235,4 +244,63 @@ function generateDaysForWeek() {
 
 }
 
-generateDaysForWeek();
\ No newline at end of file
+generateDaysForWeek();
+
+function formatISODate(day) {
+    const month = String(day.getMonth() + 1).padStart(2, '0');
+    const dayOfMonth = String(day.getDate()).padStart(2, '0');
+    return `${day.getFullYear()}-${month}-${dayOfMonth}`;
+}
+
+function loadWeekEvents() {
+    // The whole week is fetched with a single request to the range endpoint
+    const weekStart = new Date(currentYear, currentMonth, firstDay);
+    const weekEnd = new Date(currentYear, currentMonth, firstDay + 7);
+
+    $.ajax({
+        url: `/events/`,
+        method: 'GET',
+        data: {
+            'start': formatISODate(weekStart),
+            'end': formatISODate(weekEnd)
+        },
+        success: function(data) {
+            dayContainers.forEach(container => {
+                container.querySelectorAll('.event-tile').forEach(tile => tile.remove());
+            });
+
+            Object.entries(data.days).forEach(([day, events]) => {
+                const container = dayContainers[new Date(`${day}T00:00:00`).getDay()];
+                events.forEach(event => appendWeekEvent(container, event));
+            });
+        },
+        error: function(jqXHR, textStatus, errorThrown) {
+            console.error('Failed to load events for the week:', textStatus, errorThrown);
+        }
+    });
+}
+
+function appendWeekEvent(container, event) {
+    const eventDiv = document.createElement('div');
+    const categoryColor = event.category__color || '#ddd';
+
+    eventDiv.className = `event-tile event-tile-${event.category__name}`;
+    eventDiv.style.marginTop = `${event.margin_top}px`;
+    eventDiv.style.height = `${event.height}px`;
+    eventDiv.style.borderLeft = `4px solid ${categoryColor}`;
+
+    const warningIcon = event.alert_status ? `<i class="fa-solid fa-road-circle-exclamation" style="color: crimson; margin-right: 5px;"></i>` : '';
+
+    eventDiv.innerHTML = `
+        <div class="picture-for-event">
+            <img src="${event.profile_picture_url}" alt="User's Profile Picture">
+        </div>
+        <div class="event-desc">
+            <div class="event-name">${warningIcon}${event.name}</div>
+        </div>
+    `;
+
+    container.appendChild(eventDiv);
+}
+
+renderWeek();
\ No newline at end of file